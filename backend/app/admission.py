@@ -0,0 +1,274 @@
+import asyncio
+import contextvars
+import ipaddress
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Mapping, Optional
+
+import sys
+import os
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import (
+    INFERENCE_WORKERS,
+    INFERENCE_QUEUE_DEPTH,
+    INFERENCE_DEADLINE_SECONDS,
+    ADMISSION_TRUSTED_PROXIES,
+)
+from app import metrics
+from app.profiling import request_profiler
+
+logger = logging.getLogger(__name__)
+
+
+def parse_trusted_proxies(value: str) -> List:
+    """Converte "10.0.0.1,172.16.0.0/12" em redes; entradas inválidas são ignoradas"""
+    networks = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            logger.warning("Proxy confiável inválido ignorado: %s", entry)
+    return networks
+
+
+def _is_trusted(address: str, trusted: List) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def client_address(
+    peer: Optional[str], headers: Mapping[str, str], trusted: Optional[List] = None
+) -> str:
+    """IP do cliente para o controle de admissão
+
+    Os cabeçalhos X-Real-IP / X-Forwarded-For só são considerados quando a
+    conexão vem de um proxy confiável (senão qualquer cliente poderia forjá-los).
+    No X-Forwarded-For vale o endereço mais à direita que não é de um proxy.
+    """
+    if trusted is None:
+        trusted = _trusted_proxies
+    if not peer:
+        return "unknown"
+    if not _is_trusted(peer, trusted):
+        return peer
+
+    real_ip = headers.get("x-real-ip", "").strip()
+    if real_ip:
+        return real_ip
+    forwarded = [
+        part.strip() for part in headers.get("x-forwarded-for", "").split(",")
+    ]
+    forwarded = [address for address in forwarded if address]
+    for address in reversed(forwarded):
+        if not _is_trusted(address, trusted):
+            return address
+    return forwarded[0] if forwarded else peer
+
+
+_trusted_proxies = parse_trusted_proxies(ADMISSION_TRUSTED_PROXIES)
+
+
+class AdmissionRejected(Exception):
+    """Requisição recusada pelo controle de admissão"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int, reason: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Job:
+    __slots__ = ("client_key", "func", "args", "context", "future", "enqueued_at")
+
+    def __init__(self, client_key, func, args):
+        self.client_key = client_key
+        self.func = func
+        self.args = args
+        # Contexto da requisição (ex.: coleta de Server-Timing) vai junto para o worker
+        self.context = contextvars.copy_context()
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class InferenceQueue:
+    """Fila limitada de inferência com prazo por requisição
+
+    - Fila cheia: recusa imediata (503 + Retry-After), sem esperar.
+    - Prazo: frames que esperaram mais que ``deadline`` na fila são descartados
+      antes de rodar (503), mantendo a latência de cauda limitada.
+    - Último frame vence: um novo frame do mesmo cliente substitui o que ainda
+      aguarda na fila, ocupando o mesmo lugar; o antigo recebe 429.
+
+    A inferência roda em threads próprios, fora do event loop do uvicorn.
+    """
+
+    def __init__(
+        self,
+        workers: int = INFERENCE_WORKERS,
+        max_depth: int = INFERENCE_QUEUE_DEPTH,
+        deadline: float = INFERENCE_DEADLINE_SECONDS,
+    ):
+        self.workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.deadline = deadline
+        self._pending = OrderedDict()  # client_key -> _Job (ordem de chegada)
+        self._condition = threading.Condition()
+        self._threads = []
+        self._running = 0
+        self._stopping = False
+        # Média móvel do tempo de execução, para estimar o Retry-After
+        self._service_time = 0.1
+        self._stats = {
+            "completed": 0,
+            "rejected_full": 0,
+            "expired": 0,
+            "superseded": 0,
+        }
+
+    def start(self):
+        """Inicia os threads de inferência (idempotente)"""
+        with self._condition:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"inference-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Encerra os threads; frames ainda na fila são recusados"""
+        with self._condition:
+            self._stopping = True
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._condition.notify_all()
+        for job in pending:
+            self._reject(job, 503, "Serviço encerrando", "shutdown")
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._update_depth()
+
+    async def submit(self, client_key: str, func: Callable, *args):
+        """Enfileira ``func(*args)`` e aguarda o resultado
+
+        Lança AdmissionRejected se a fila estiver cheia, se o prazo expirar
+        antes da execução ou se o frame for substituído por um mais novo.
+        """
+        if not self._threads:
+            self.start()
+
+        job = _Job(client_key, func, args)
+        superseded = None
+        with self._condition:
+            # Atribuir a uma chave existente do OrderedDict mantém a posição
+            superseded = self._pending.get(client_key)
+            if superseded is not None:
+                self._stats["superseded"] += 1
+            if superseded is None and len(self._pending) >= self.max_depth:
+                self._stats["rejected_full"] += 1
+                rejection = self._rejection(503, "Servidor sobrecarregado", "queue_full")
+            else:
+                rejection = None
+                self._pending[client_key] = job
+                self._condition.notify()
+
+        if superseded is not None:
+            self._reject(
+                superseded, 429, "Frame substituído por um mais recente", "superseded"
+            )
+        self._update_depth()
+        if rejection is not None:
+            metrics.admission_rejected(rejection.reason)
+            raise rejection
+
+        return await asyncio.wrap_future(job.future)
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                _, job = self._pending.popitem(last=False)
+                self._running += 1
+            self._update_depth()
+
+            outcome = None
+            try:
+                if time.monotonic() - job.enqueued_at > self.deadline:
+                    outcome = "expired"
+                    self._reject(
+                        job, 503, "Prazo de processamento excedido na fila", "deadline"
+                    )
+                    continue
+
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+
+                started = time.monotonic()
+                try:
+                    # Perfilado aqui se a requisição estiver em profiling
+                    result = job.context.run(request_profiler.run, job.func, *job.args)
+                except BaseException as e:
+                    job.future.set_exception(e)
+                else:
+                    job.future.set_result(result)
+                elapsed = time.monotonic() - started
+                outcome = "completed"
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    if outcome is not None:
+                        self._stats[outcome] += 1
+                    if outcome == "completed":
+                        self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+                self._update_depth()
+
+    def _rejection(self, status_code: int, detail: str, reason: str) -> AdmissionRejected:
+        # Tempo estimado para esvaziar a fila atual
+        backlog = len(self._pending) + self._running
+        retry_after = max(1, math.ceil(backlog * self._service_time / self.workers))
+        return AdmissionRejected(status_code, detail, retry_after, reason)
+
+    def _reject(self, job: _Job, status_code: int, detail: str, reason: str):
+        with self._condition:
+            rejection = self._rejection(status_code, detail, reason)
+        metrics.admission_rejected(reason)
+        if job.future.set_running_or_notify_cancel():
+            job.future.set_exception(rejection)
+
+    def _update_depth(self):
+        metrics.set_queue_depth(len(self._pending) + self._running)
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {
+                "workers": self.workers,
+                "max_depth": self.max_depth,
+                "deadline_seconds": self.deadline,
+                "queued": len(self._pending),
+                "running": self._running,
+                "avg_service_ms": round(self._service_time * 1000, 1),
+                **self._stats,
+            }
+
+
+# Instância global da fila de inferência
+inference_queue = InferenceQueue()
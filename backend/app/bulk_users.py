@@ -0,0 +1,144 @@
+"""Operações administrativas em lote sobre usuários
+
+Desativar, reativar e excluir N usuários aplica todas as mudanças em memória
+e grava o índice FAISS uma única vez por operação (em vez de uma gravação
+completa do índice por usuário).
+"""
+
+import logging
+import os
+import sys
+import time
+from typing import Iterable, Iterator, List
+
+from sqlalchemy import update
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from app.groups import group_galleries
+from app.index_rebuild import decode_chunk
+from app.models import User
+from app.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+# Tamanho dos blocos de "IN (...)" (limite de parâmetros do SQLite)
+_IN_CHUNK = 500
+
+
+def _chunks(ids: List[int]) -> Iterator[List[int]]:
+    for start in range(0, len(ids), _IN_CHUNK):
+        yield ids[start : start + _IN_CHUNK]
+
+
+def _select_ids(db, user_ids: List[int], *criteria) -> List[int]:
+    """IDs dados que existem no banco e atendem aos critérios"""
+    found = []
+    for chunk in _chunks(user_ids):
+        rows = db.query(User.id).filter(User.id.in_(chunk), *criteria).all()
+        found.extend(row[0] for row in rows)
+    return sorted(found)
+
+
+def _report(requested: List[int], done: List[int], started: float, **extra) -> dict:
+    return {
+        "requested": len(requested),
+        "skipped_user_ids": sorted(set(requested) - set(done)),
+        **extra,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def deactivate_users(db, face_recognition, user_ids: Iterable[int]) -> dict:
+    """Desativa usuários ativos: saem da galeria, o cadastro fica no banco"""
+    started = time.perf_counter()
+    requested = sorted(set(user_ids))
+    found = _select_ids(db, requested, User.is_active == True)
+
+    for chunk in _chunks(found):
+        db.query(User).filter(User.id.in_(chunk)).update(
+            {User.is_active: False}, synchronize_session=False
+        )
+    db.commit()
+    removed = face_recognition.remove_users(found)
+    for user_id in found:
+        user_cache.set_active(user_id, False)
+
+    logger.info("%s usuários desativados (%s embeddings)", len(found), removed)
+    return _report(
+        requested, found, started, deactivated=len(found), removed_embeddings=removed
+    )
+
+
+def reactivate_users(db, face_recognition, user_ids: Iterable[int]) -> dict:
+    """Reativa usuários inativos, devolvendo à galeria o embedding guardado no
+    banco (o ``faiss_id`` de cada um é atualizado)
+
+    Se o commit falhar, os embeddings recém-adicionados saem da galeria.
+    """
+    started = time.perf_counter()
+    requested = sorted(set(user_ids))
+    ids, blobs = [], []
+    for chunk in _chunks(requested):
+        rows = (
+            db.query(User.id, User.embedding_hash)
+            .filter(User.id.in_(chunk), User.is_active == False)
+            .all()
+        )
+        ids.extend(row[0] for row in rows)
+        blobs.extend(row[1] for row in rows)
+
+    valid_ids, vectors, failed_ids = decode_chunk((ids, blobs))
+    faiss_ids = face_recognition.add_user_embeddings(vectors, valid_ids)
+    if valid_ids:
+        try:
+            # UPDATE em massa por chave, como em index_rebuild.update_faiss_ids
+            db.execute(
+                update(User),
+                [
+                    {"id": user_id, "faiss_id": faiss_id, "is_active": True}
+                    for user_id, faiss_id in zip(valid_ids, faiss_ids)
+                ],
+            )
+            db.commit()
+        except Exception:
+            # Sem o commit os usuários seguem inativos: tirá-los da galeria
+            db.rollback()
+            face_recognition.remove_users(valid_ids)
+            raise
+    for user_id in valid_ids:
+        user_cache.set_active(user_id, True)
+
+    logger.info("%s usuários reativados (%s falhas)", len(valid_ids), len(failed_ids))
+    return _report(
+        requested,
+        valid_ids,
+        started,
+        reactivated=len(valid_ids),
+        failed_user_ids=failed_ids,
+    )
+
+
+def delete_users(db, face_recognition, user_ids: Iterable[int]) -> dict:
+    """Exclui usuários do banco, dos grupos e da galeria
+
+    Os logs de acesso são mantidos (``user_id`` continua apontando para o
+    usuário excluído).
+    """
+    started = time.perf_counter()
+    requested = sorted(set(user_ids))
+    found = _select_ids(db, requested)
+
+    group_galleries.forget_users(db, face_recognition, found)
+    for chunk in _chunks(found):
+        db.query(User).filter(User.id.in_(chunk)).delete(synchronize_session=False)
+    db.commit()
+    removed = face_recognition.remove_users(found)
+    for user_id in found:
+        user_cache.invalidate(user_id)
+
+    logger.info("%s usuários excluídos (%s embeddings)", len(found), removed)
+    return _report(
+        requested, found, started, deleted=len(found), removed_embeddings=removed
+    )
@@ -1,5 +1,7 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, func, update
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Optional, Tuple
+import logging
 import sys
 import os
 
@@ -7,7 +9,10 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 from config import DATABASE_URL
-from app.models import Base, create_tables
+from app.models import Base, User, AccessLog, create_tables
+from app.encryption import encryption_manager
+
+logger = logging.getLogger(__name__)
 
 # Criar engine do banco de dados
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
@@ -30,20 +35,125 @@ def init_database():
             columns = [row[1] for row in result.fetchall()]
 
             if "passage_count" not in columns:
-                print("🔄 Adicionando coluna passage_count à tabela users...")
+                logger.info("🔄 Adicionando coluna passage_count à tabela users...")
                 conn.execute(
                     text("ALTER TABLE users ADD COLUMN passage_count INTEGER DEFAULT 0")
                 )
                 conn.commit()
-                print("✅ Coluna passage_count adicionada com sucesso!")
+                logger.info("✅ Coluna passage_count adicionada com sucesso!")
+
+        migrate_embeddings()
+
+        # Criar índices de logs em bancos existentes (create_all só cria índices
+        # junto com tabelas novas)
+        for index in AccessLog.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
 
-        print("Banco de dados inicializado com sucesso!")
+        logger.info("Banco de dados inicializado com sucesso!")
         return True
     except Exception as e:
-        print(f"Erro ao inicializar banco de dados: {e}")
+        logger.error("Erro ao inicializar banco de dados: %s", e)
         return False
 
 
+def migrate_embeddings(batch_size: int = 500, bind=None) -> int:
+    """Converte embeddings no formato antigo (texto AES-CBC) para BLOB AES-GCM"""
+    from sqlalchemy import text
+
+    bind = bind if bind is not None else engine
+    # No SQLite só as linhas legadas (guardadas como texto) são lidas; nos
+    # demais bancos typeof() não existe, então todas são lidas e o formato é
+    # conferido em Python
+    legacy_only = (
+        "typeof(embedding_hash) = 'text' AND " if bind.dialect.name == "sqlite" else ""
+    )
+    migrated = 0
+    last_id = 0
+    with bind.connect() as conn:
+        while True:
+            rows = conn.execute(
+                text(
+                    "SELECT id, embedding_hash FROM users "
+                    f"WHERE {legacy_only}id > :last_id "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            ).fetchall()
+            if not rows:
+                break
+
+            updates = []
+            for user_id, legacy in rows:
+                if not encryption_manager.is_legacy_embedding(legacy):
+                    continue
+                try:
+                    embedding = encryption_manager.decrypt_legacy_embedding(legacy)
+                    updates.append(
+                        {
+                            "id": user_id,
+                            "embedding": encryption_manager.encrypt_embedding(embedding),
+                        }
+                    )
+                except Exception as e:
+                    logger.warning(
+                        "⚠️  Embedding do usuário %s não pôde ser migrado: %s",
+                        user_id,
+                        e,
+                    )
+            last_id = rows[-1][0]
+
+            if updates:
+                conn.execute(
+                    text("UPDATE users SET embedding_hash = :embedding WHERE id = :id"),
+                    updates,
+                )
+                conn.commit()
+                migrated += len(updates)
+
+    if migrated:
+        logger.info(
+            "✅ %s embeddings migrados para o formato binário (AES-GCM)", migrated
+        )
+    return migrated
+
+
+def increment_passage_count(db: Session, user_id: int) -> Optional[Tuple[str, int]]:
+    """Incrementa atomicamente o contador de passagens de um usuário ativo.
+
+    Executa um único ``UPDATE ... SET passage_count = passage_count + 1
+    RETURNING name, passage_count``, sem carregar a linha do usuário. Retorna
+    ``(name, passage_count)`` ou ``None`` se o usuário não existe ou está inativo.
+    """
+    stmt = (
+        update(User)
+        .where(User.id == user_id, User.is_active == True)
+        .values(passage_count=func.coalesce(User.passage_count, 0) + 1)
+    )
+
+    if engine.dialect.update_returning:
+        row = db.execute(
+            stmt.returning(User.name, User.passage_count),
+            execution_options={"synchronize_session": False},
+        ).first()
+    else:
+        # SQLite < 3.35 não suporta RETURNING: o UPDATE continua atômico e a
+        # leitura acontece na mesma transação
+        result = db.execute(stmt, execution_options={"synchronize_session": False})
+        row = None
+        if result.rowcount:
+            row = (
+                db.query(User.name, User.passage_count)
+                .filter(User.id == user_id)
+                .first()
+            )
+
+    db.commit()
+
+    if row is None:
+        return None
+    return row[0], row[1]
+
+
 def get_db():
     """Dependency para obter sessão do banco de dados"""
     db = SessionLocal()
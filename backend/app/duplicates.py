@@ -0,0 +1,198 @@
+"""Detecção de cadastros duplicados (mesma pessoa com mais de um usuário)
+
+Uso (a partir do diretório backend):
+    python -m app.duplicates [--min-similarity 0.6] [--batch-size 2048]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import DUPLICATE_SIMILARITY_THRESHOLD, DUPLICATE_BATCH_SIZE
+
+# Também "app.duplicates" quando rodado como script (__name__ seria "__main__")
+logger = logging.getLogger("app.duplicates")
+
+
+class UnionFind:
+    """Conjuntos disjuntos para agrupar pares duplicados em clusters"""
+
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+        self.size: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        self.parent.setdefault(item, item)
+        self.size.setdefault(item, 1)
+        while self.parent[item] != item:
+            # Compressão de caminho pela metade
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+
+    def groups(self) -> List[List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
+def find_enrollment_duplicate(
+    face_recognition,
+    embedding: np.ndarray,
+    min_similarity: float = DUPLICATE_SIMILARITY_THRESHOLD,
+) -> Optional[Tuple[int, float]]:
+    """Usuário já cadastrado com a mesma face, se houver: (user_id, similaridade)"""
+    candidates = face_recognition.search_candidates([embedding], k=1)[0]
+    if candidates and candidates[0][1] >= min_similarity:
+        return candidates[0]
+    return None
+
+
+def find_duplicate_clusters(
+    face_recognition,
+    min_similarity: float = DUPLICATE_SIMILARITY_THRESHOLD,
+    batch_size: int = DUPLICATE_BATCH_SIZE,
+) -> dict:
+    """Auto-junção da galeria em blocos, agrupando prováveis duplicados
+
+    A matriz de similaridades é calculada por blocos (``batch_size`` x
+    ``batch_size``) só acima da diagonal, já que a junção é simétrica. Pares
+    de usuários distintos com similaridade >= ``min_similarity`` são unidos
+    por union-find; cada componente com dois ou mais usuários vira um
+    cluster.
+    """
+    started = time.perf_counter()
+    snapshot = face_recognition.snapshot
+    id_to_user = snapshot.id_to_user
+    faiss_ids = np.array(sorted(id_to_user), dtype=np.int64)
+    user_ids = np.array([id_to_user[i] for i in faiss_ids], dtype=np.int64)
+    vectors = np.ascontiguousarray(
+        face_recognition.get_vectors(faiss_ids, snapshot), dtype=np.float32
+    )
+
+    clusters = UnionFind()
+    best_pair: Dict[Tuple[int, int], float] = {}
+
+    for row_start in range(0, len(vectors), batch_size):
+        rows = vectors[row_start : row_start + batch_size]
+        for col_start in range(row_start, len(vectors), batch_size):
+            similarities = rows @ vectors[col_start : col_start + batch_size].T
+            if col_start == row_start:
+                # Bloco da diagonal: só pares i < j
+                similarities[np.tril_indices_from(similarities)] = -np.inf
+
+            for row, col in zip(*np.nonzero(similarities >= min_similarity)):
+                user_a = int(user_ids[row_start + row])
+                user_b = int(user_ids[col_start + col])
+                if user_a == user_b:
+                    continue
+                pair = (min(user_a, user_b), max(user_a, user_b))
+                similarity = float(similarities[row, col])
+                if similarity > best_pair.get(pair, -1.0):
+                    best_pair[pair] = similarity
+                clusters.union(user_a, user_b)
+
+        logger.debug(
+            "Auto-junção: %s/%s vetores",
+            min(row_start + batch_size, len(vectors)),
+            len(vectors),
+        )
+
+    pairs_by_root: Dict[int, list] = {}
+    for pair, similarity in best_pair.items():
+        pairs_by_root.setdefault(clusters.find(pair[0]), []).append(
+            {"user_ids": list(pair), "similarity": round(similarity, 4)}
+        )
+
+    groups = []
+    for members in clusters.groups():
+        pairs = sorted(
+            pairs_by_root[clusters.find(members[0])],
+            key=lambda p: p["similarity"],
+            reverse=True,
+        )
+        groups.append(
+            {
+                "user_ids": sorted(members),
+                "max_similarity": pairs[0]["similarity"],
+                "pairs": pairs,
+            }
+        )
+    groups.sort(key=lambda g: g["max_similarity"], reverse=True)
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Auto-junção concluída: %s vetores, %s pares, %s clusters em %.1fs",
+        len(faiss_ids),
+        len(best_pair),
+        len(groups),
+        elapsed,
+    )
+    return {
+        "gallery_size": len(faiss_ids),
+        "min_similarity": min_similarity,
+        "duplicate_pairs": len(best_pair),
+        "clusters": groups,
+        "elapsed_seconds": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Procura usuários cadastrados mais de uma vez na galeria"
+    )
+    parser.add_argument(
+        "--min-similarity", type=float, default=DUPLICATE_SIMILARITY_THRESHOLD
+    )
+    parser.add_argument("--batch-size", type=int, default=DUPLICATE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from app.logging_setup import setup_logging
+
+    setup_logging()
+
+    from app.database import SessionLocal
+    from app.face_recognition import face_recognition
+    from app.user_cache import user_cache
+
+    report = find_duplicate_clusters(
+        face_recognition,
+        min_similarity=args.min_similarity,
+        batch_size=args.batch_size,
+    )
+
+    db = SessionLocal()
+    try:
+        names = user_cache.get_names(
+            db, [user_id for c in report["clusters"] for user_id in c["user_ids"]]
+        )
+    finally:
+        db.close()
+    for cluster in report["clusters"]:
+        cluster["user_names"] = [names.get(i) for i in cluster["user_ids"]]
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(1 if report["clusters"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,29 @@ from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
 import base64
 import hashlib
+import numpy as np
 import sys
 import os
+from typing import List, Sequence, Union
 
 sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
-from config import ENCRYPTION_KEY, AES_KEY_LENGTH
+from config import (
+    ENCRYPTION_KEY,
+    AES_KEY_LENGTH,
+    EMBEDDING_DIMENSION,
+    EMBEDDING_STORAGE_DTYPE,
+)
+
+# Formato binário de embedding criptografado:
+#   versão (1 byte) | dtype (1 byte) | nonce (12 bytes) | ciphertext | tag (16 bytes)
+# O cabeçalho (versão + dtype) é autenticado como dado associado do AES-GCM.
+EMBEDDING_FORMAT_VERSION = 1
+EMBEDDING_DTYPES = {b"f": np.dtype("<f4"), b"e": np.dtype("<f2")}
+GCM_NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+HEADER_SIZE = 2
 
 
 class EncryptionManager:
@@ -62,23 +78,118 @@ class EncryptionManager:
         except Exception as e:
             raise Exception(f"Erro na descriptografia: {str(e)}")
 
-    def encrypt_embedding(self, embedding) -> str:
-        """Criptografa embedding numpy array"""
-        import numpy as np
-
-        # Converter numpy array para string
-        embedding_str = np.array2string(embedding, separator=",")
-        return self.encrypt_data(embedding_str)
-
-    def decrypt_embedding(self, encrypted_embedding: str):
-        """Descriptografa embedding e converte de volta para numpy array"""
-        import numpy as np
-
+    def encrypt_embedding(self, embedding: np.ndarray) -> bytes:
+        """Criptografa embedding em formato binário compacto com AES-256-GCM"""
+        dtype_code = b"e" if EMBEDDING_STORAGE_DTYPE == "float16" else b"f"
+        raw = np.ascontiguousarray(
+            np.asarray(embedding).ravel(), dtype=EMBEDDING_DTYPES[dtype_code]
+        ).tobytes()
+
+        header = bytes([EMBEDDING_FORMAT_VERSION]) + dtype_code
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=get_random_bytes(GCM_NONCE_SIZE))
+        cipher.update(header)
+        ciphertext, tag = cipher.encrypt_and_digest(raw)
+
+        return header + cipher.nonce + ciphertext + tag
+
+    def _decrypt_embedding_bytes(self, blob: bytes):
+        """Descriptografa e autentica um embedding binário, retornando (bytes, dtype)"""
+        blob = bytes(blob)
+        if len(blob) < HEADER_SIZE + GCM_NONCE_SIZE + GCM_TAG_SIZE:
+            raise ValueError("Embedding criptografado truncado")
+
+        header = blob[:HEADER_SIZE]
+        if header[0] != EMBEDDING_FORMAT_VERSION:
+            raise ValueError(f"Versão de embedding não suportada: {header[0]}")
+        dtype = EMBEDDING_DTYPES.get(header[1:2])
+        if dtype is None:
+            raise ValueError("Tipo de embedding não suportado")
+
+        nonce = blob[HEADER_SIZE : HEADER_SIZE + GCM_NONCE_SIZE]
+        ciphertext = blob[HEADER_SIZE + GCM_NONCE_SIZE : -GCM_TAG_SIZE]
+        tag = blob[-GCM_TAG_SIZE:]
+
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(header)
+        raw = cipher.decrypt_and_verify(ciphertext, tag)
+        # Conferido por blob: o caminho rápido de decrypt_embeddings concatena
+        # os plaintexts e um tamanho errado deslocaria vetores entre usuários
+        if len(raw) != EMBEDDING_DIMENSION * dtype.itemsize:
+            raise ValueError(
+                f"Embedding com tamanho inválido: {len(raw) // dtype.itemsize}"
+            )
+        return raw, dtype
+
+    def decrypt_embedding(self, encrypted_embedding: Union[bytes, str]) -> np.ndarray:
+        """Descriptografa embedding e converte de volta para numpy array (float32)"""
+        if isinstance(encrypted_embedding, str):
+            return self.decrypt_legacy_embedding(encrypted_embedding)
+
+        raw, dtype = self._decrypt_embedding_bytes(encrypted_embedding)
+        return np.frombuffer(raw, dtype=dtype).astype(np.float32)
+
+    def decrypt_embeddings(
+        self, encrypted_embeddings: Sequence[Union[bytes, str]]
+    ) -> np.ndarray:
+        """Descriptografa N embeddings em um único array contíguo (N, dimensão)"""
+        count = len(encrypted_embeddings)
+        if count == 0:
+            return np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32)
+
+        plaintexts: List[bytes] = []
+        dtypes = []
+        legacy_rows = {}
+        for i, encrypted in enumerate(encrypted_embeddings):
+            if isinstance(encrypted, str):
+                legacy_rows[i] = self.decrypt_legacy_embedding(encrypted)
+                plaintexts.append(b"")
+                dtypes.append(None)
+                continue
+            raw, dtype = self._decrypt_embedding_bytes(encrypted)
+            plaintexts.append(raw)
+            dtypes.append(dtype)
+
+        if not legacy_rows and len(set(dtypes)) == 1:
+            # Caso comum: uma única conversão para todo o bloco
+            return (
+                np.frombuffer(b"".join(plaintexts), dtype=dtypes[0])
+                .reshape(count, -1)
+                .astype(np.float32)
+            )
+
+        output = np.empty((count, EMBEDDING_DIMENSION), dtype=np.float32)
+        for i, (raw, dtype) in enumerate(zip(plaintexts, dtypes)):
+            if i in legacy_rows:
+                output[i] = legacy_rows[i]
+            else:
+                output[i] = np.frombuffer(raw, dtype=dtype)
+        return output
+
+    def is_legacy_embedding(self, stored: Union[bytes, str]) -> bool:
+        """Formato antigo: texto base64 (str, ou bytes em bancos que não guardam
+        texto em coluna binária); o formato binário começa com o byte de versão"""
+        if isinstance(stored, str):
+            return True
+        return bytes(stored[:1]) != bytes([EMBEDDING_FORMAT_VERSION])
+
+    def decrypt_legacy_embedding(self, encrypted_embedding: str) -> np.ndarray:
+        """Descriptografa embedding no formato antigo (texto AES-CBC em base64)"""
+        if not isinstance(encrypted_embedding, str):
+            encrypted_embedding = bytes(encrypted_embedding).decode("ascii")
         decrypted_str = self.decrypt_data(encrypted_embedding)
-        # Converter string de volta para numpy array
-        # Remove colchetes e converte
-        clean_str = decrypted_str.strip("[]")
-        return np.fromstring(clean_str, sep=",")
+        clean_str = decrypted_str.strip().strip("[]")
+        if "..." in clean_str:
+            raise ValueError("Embedding legado resumido ('...'), valores perdidos")
+
+        values = np.array(
+            [float(value) for value in clean_str.split(",")],
+            dtype=np.float32,
+        )
+        if values.shape[0] != EMBEDDING_DIMENSION:
+            raise ValueError(
+                f"Embedding legado com dimensão inválida: {values.shape[0]}"
+            )
+        return values
 
 
 # Instância global do gerenciador de criptografia
@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+import logging
+import sys
+import os
+
+# Adicionar o diretório raiz do projeto ao path
+project_root = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+sys.path.insert(0, project_root)
+from config import MIN_FACE_SIZE, MAX_FACE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def is_face_quality_good(bbox: np.ndarray, image: np.ndarray) -> bool:
+    """Verifica se a qualidade da face detectada é adequada"""
+    try:
+        x1, y1, x2, y2 = bbox.astype(int)
+
+        # Verificar tamanho da face
+        face_width = x2 - x1
+        face_height = y2 - y1
+
+        if face_width < MIN_FACE_SIZE or face_height < MIN_FACE_SIZE:
+            return False
+
+        if face_width > MAX_FACE_SIZE or face_height > MAX_FACE_SIZE:
+            return False
+
+        # Verificar se a face está dentro dos limites da imagem
+        img_height, img_width = image.shape[:2]
+        if x1 < 0 or y1 < 0 or x2 > img_width or y2 > img_height:
+            return False
+
+        # Verificar proporção da face (não muito alongada)
+        aspect_ratio = face_width / face_height
+        if aspect_ratio < 0.5 or aspect_ratio > 2.0:
+            return False
+
+        return True
+
+    except Exception as e:
+        logger.error("Erro na verificação de qualidade: %s", e)
+        return False
+
+
+def calculate_face_quality(bbox: np.ndarray, image: np.ndarray) -> float:
+    """Calcula score de qualidade da face"""
+    try:
+        x1, y1, x2, y2 = bbox.astype(int)
+
+        # Extrair região da face
+        face_roi = image[y1:y2, x1:x2]
+
+        if face_roi.size == 0:
+            return 0.0
+
+        # Converter para escala de cinza
+        gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
+
+        # Calcular nitidez usando Laplacian
+        laplacian_var = cv2.Laplacian(gray_face, cv2.CV_64F).var()
+
+        # Calcular brilho médio
+        brightness = np.mean(gray_face)
+
+        # Calcular contraste
+        contrast = np.std(gray_face)
+
+        # Normalizar scores (valores empíricos)
+        sharpness_score = min(laplacian_var / 1000.0, 1.0)  # Normalizar para 0-1
+        brightness_score = 1.0 - abs(brightness - 128) / 128.0  # Ideal é 128
+        contrast_score = min(contrast / 64.0, 1.0)  # Normalizar para 0-1
+
+        # Score combinado
+        quality_score = (
+            sharpness_score * 0.4 + brightness_score * 0.3 + contrast_score * 0.3
+        )
+
+        return max(0.0, min(1.0, quality_score))
+
+    except Exception as e:
+        logger.error("Erro no cálculo de qualidade: %s", e)
+        return 0.0
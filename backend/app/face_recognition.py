@@ -2,10 +2,13 @@ import cv2
 import numpy as np
 import insightface
 from insightface.app import FaceAnalysis
+from insightface.app.common import Face
 import faiss
+import logging
 import os
 import pickle
-from typing import List, Tuple, Optional
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple, Optional
 import sys
 
 # Adicionar o diretório raiz do projeto ao path
@@ -23,30 +26,121 @@ from config import (
     FACE_DETECTION_CONFIDENCE_HIGH,
     FACE_RECOGNITION_THRESHOLD_STRICT,
     FACE_RECOGNITION_THRESHOLD_RELAXED,
-    MIN_FACE_SIZE,
-    MAX_FACE_SIZE,
+    FAISS_INDEX_TYPE,
 )
 from app.encryption import encryption_manager
+from app.face_quality import is_face_quality_good, calculate_face_quality
+from app.metrics import stage
+from app.gallery_index import (
+    FullPrecisionStore,
+    create_index,
+    index_type_of,
+    range_search_index,
+    search_index,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class GalleryReplacedError(RuntimeError):
+    """A galeria foi trocada (nova ``generation``) durante uma reconstrução"""
+
+
+class GallerySnapshot(NamedTuple):
+    """Versão imutável da galeria: índice, vetores completos e mapeamentos
+
+    Nunca é alterada depois de publicada; escritas montam a próxima versão e a
+    publicam com uma única atribuição. ``generation`` só muda quando os IDs do
+    FAISS são renumerados (índice novo, carregado ou reconstruído).
+    """
+
+    index: Optional[faiss.Index]
+    # Vetores float32 completos para re-ordenação (índices comprimidos)
+    store: Optional[FullPrecisionStore]
+    id_to_user: Dict[int, int]  # ID do FAISS -> usuário
+    user_to_faiss: Dict[int, Tuple[int, ...]]  # Inverso (verificação 1:1)
+    generation: int
 
 
 class FaceRecognitionSystem:
     def __init__(self):
         self.face_app = None
-        self.faiss_index = None
-        self.id_to_user = {}  # Mapear ID do FAISS para usuário
-        self.next_faiss_id = 0
+        self.active_providers = []
+        # Galeria publicada (read-copy-update): buscas leem sem lock, escritas
+        # são serializadas pelo lock e publicam uma versão nova
+        self._snapshot = GallerySnapshot(None, None, {}, {}, 0)
+        self._write_lock = threading.RLock()
+        # Galeria particionada em processos (app/sharding.py), se habilitada
+        self.shards = None
+        # Erro que desligou os shards (as buscas seguem no índice local)
+        self.shards_error = None
+        # Galeria quente (app/hot_tier.py) buscada antes da completa, se habilitada
+        self.hot_tier = None
+        # Sub-índices por grupo de usuários (app/groups.py)
+        self.groups = None
         try:
             self.load_models()
         except Exception as e:
-            print(f"⚠️  Erro ao carregar modelos: {e}")
+            logger.warning("⚠️  Erro ao carregar modelos: %s", e)
             # Continuar mesmo se os modelos não carregarem
         try:
             self.load_faiss_index()
         except Exception as e:
-            print(f"⚠️  Erro ao carregar índice FAISS: {e}")
+            logger.warning("⚠️  Erro ao carregar índice FAISS: %s", e)
             # Criar índice vazio se não conseguir carregar
             self._create_new_index()
 
+    @property
+    def snapshot(self) -> GallerySnapshot:
+        """Versão atual da galeria; use uma só por operação de leitura"""
+        return self._snapshot
+
+    @property
+    def faiss_index(self):
+        return self._snapshot.index
+
+    @property
+    def gallery_vectors(self) -> Optional[FullPrecisionStore]:
+        return self._snapshot.store
+
+    @property
+    def id_to_user(self) -> Dict[int, int]:
+        return self._snapshot.id_to_user
+
+    @property
+    def user_to_faiss(self) -> Dict[int, Tuple[int, ...]]:
+        return self._snapshot.user_to_faiss
+
+    @property
+    def next_faiss_id(self) -> int:
+        """IDs do IndexFlat são posições: o próximo é sempre ntotal (mesmo com
+        remoções no fim)"""
+        index = self._snapshot.index
+        return index.ntotal if index is not None else 0
+
+    def _publish(
+        self,
+        index,
+        store: Optional[FullPrecisionStore],
+        id_to_user: Dict[int, int],
+        user_to_faiss: Optional[Dict[int, Tuple[int, ...]]] = None,
+        renumbered: bool = False,
+    ):
+        """Publica a próxima versão da galeria (com o lock de escrita)
+
+        Os objetos passados não podem mais ser alterados: buscas em andamento
+        podem estar lendo a versão publicada.
+        """
+        if user_to_faiss is None:
+            templates: Dict[int, list] = {}
+            for faiss_id, user_id in id_to_user.items():
+                templates.setdefault(user_id, []).append(faiss_id)
+            user_to_faiss = {user: tuple(ids) for user, ids in templates.items()}
+        generation = self._snapshot.generation + (1 if renumbered else 0)
+        self._snapshot = GallerySnapshot(
+            index, store, id_to_user, user_to_faiss, generation
+        )
+
     def load_models(self):
         """Carrega modelos InsightFace - Suporta GPU e CPU"""
         try:
@@ -55,16 +149,18 @@ class FaceRecognitionSystem:
 
             # Determinar providers baseado no dispositivo disponível
             if DEVICE == "cuda" and torch.cuda.is_available():
-                print("🚀 Configurando InsightFace para GPU...")
+                logger.info("🚀 Configurando InsightFace para GPU...")
                 
                 # Verificar providers disponíveis no ONNX Runtime
                 available_providers = ort.get_available_providers()
                 
                 if "CUDAExecutionProvider" in available_providers:
                     providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
-                    print("✅ ONNX Runtime GPU disponível")
+                    logger.info("✅ ONNX Runtime GPU disponível")
                 else:
-                    print("⚠️  CUDAExecutionProvider não disponível, usando CPU")
+                    logger.warning(
+                        "⚠️  CUDAExecutionProvider não disponível, usando CPU"
+                    )
                     providers = ["CPUExecutionProvider"]
                 
                 # Configurar InsightFace com GPU (com fallback para CPU)
@@ -78,16 +174,17 @@ class FaceRecognitionSystem:
                 
                 # Verificar providers ativos
                 active_providers = self.face_app.models["detection"].session.get_providers()
-                print(f"✅ Modelos InsightFace carregados!")
-                print(f"   Providers ativos: {active_providers}")
+                self.active_providers = active_providers
+                logger.info("✅ Modelos InsightFace carregados!")
+                logger.info("   Providers ativos: %s", active_providers)
                 
                 if "CUDAExecutionProvider" in active_providers:
-                    print("   🎯 Usando GPU para processamento")
+                    logger.info("   🎯 Usando GPU para processamento")
                 else:
-                    print("   💻 Usando CPU para processamento")
+                    logger.info("   💻 Usando CPU para processamento")
                     
             else:
-                print("💻 Configurando InsightFace para CPU...")
+                logger.info("💻 Configurando InsightFace para CPU...")
                 
                 # Configurar InsightFace apenas com CPU
                 self.face_app = FaceAnalysis(
@@ -99,11 +196,12 @@ class FaceRecognitionSystem:
                 self.face_app.prepare(ctx_id=-1, det_size=(640, 640))  # ctx_id=-1 para CPU
                 
                 active_providers = self.face_app.models["detection"].session.get_providers()
-                print(f"✅ Modelos InsightFace carregados em CPU!")
-                print(f"   Providers ativos: {active_providers}")
+                self.active_providers = active_providers
+                logger.info("✅ Modelos InsightFace carregados em CPU!")
+                logger.info("   Providers ativos: %s", active_providers)
 
         except Exception as e:
-            print(f"❌ Erro ao carregar modelos: {e}")
+            logger.error("❌ Erro ao carregar modelos: %s", e)
             raise
 
     def load_faiss_index(self):
@@ -114,72 +212,189 @@ class FaceRecognitionSystem:
         if index_path.exists() and id_map_path.exists():
             try:
                 # Carregar índice existente
-                self.faiss_index = faiss.read_index(str(index_path))
+                loaded_index = faiss.read_index(str(index_path))
 
                 # Carregar mapeamento de IDs
                 with open(id_map_path, "rb") as f:
-                    self.id_to_user = pickle.load(f)
-
-                # Definir próximo ID disponível
-                if self.id_to_user:
-                    self.next_faiss_id = max(self.id_to_user.keys()) + 1
-                else:
-                    self.next_faiss_id = 0
-
-                print(f"Índice FAISS carregado: {self.faiss_index.ntotal} embeddings")
+                    id_to_user = pickle.load(f)
+
+                with self._write_lock:
+                    index, store = self._use_loaded_index(loaded_index)
+                    self._publish(index, store, id_to_user, renumbered=True)
+                    if index is not loaded_index:
+                        # Convertido para FAISS_INDEX_TYPE
+                        self.save_faiss_index()
+
+                logger.info(
+                    "Índice FAISS carregado: %s embeddings (%s)",
+                    self.faiss_index.ntotal,
+                    FAISS_INDEX_TYPE,
+                )
 
             except Exception as e:
-                print(f"Erro ao carregar índice FAISS: {e}")
+                logger.error("Erro ao carregar índice FAISS: %s", e)
                 self._create_new_index()
         else:
             self._create_new_index()
 
+    def _use_loaded_index(self, loaded_index) -> tuple:
+        """Índice lido do disco (e vetores completos), convertido para
+        FAISS_INDEX_TYPE se preciso: (índice, store)"""
+        loaded_type = index_type_of(loaded_index)
+        store = FullPrecisionStore(FAISS_INDEX_DIR / "gallery_vectors.f32")
+        ntotal = loaded_index.ntotal
+
+        if loaded_type == FAISS_INDEX_TYPE:
+            if FAISS_INDEX_TYPE != "flat":
+                if len(store) < ntotal:
+                    raise RuntimeError(
+                        "Vetores completos ausentes para re-ordenação, reconstrua o índice"
+                    )
+                if len(store) > ntotal:
+                    store.truncate(ntotal)
+            return loaded_index, store if FAISS_INDEX_TYPE != "flat" else None
+
+        # Tipo mudou na configuração: converter a partir dos vetores completos
+        if loaded_type == "flat":
+            vectors = loaded_index.reconstruct_n(0, ntotal)
+        elif len(store) >= ntotal:
+            vectors = store.get(np.arange(ntotal))
+        else:
+            raise RuntimeError(
+                f"Não é possível converter índice {loaded_type} sem vetores completos"
+            )
+
+        logger.info(
+            "🔄 Convertendo índice FAISS de %s para %s...", loaded_type, FAISS_INDEX_TYPE
+        )
+        return self._index_from_vectors(vectors)
+
+    def _index_from_vectors(self, vectors: np.ndarray) -> tuple:
+        """Monta índice do tipo configurado (e vetores completos) a partir de
+        vetores: (índice, store)"""
+        index = create_index(FAISS_INDEX_TYPE, EMBEDDING_DIMENSION)
+        if len(vectors):
+            index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+
+        if FAISS_INDEX_TYPE == "flat":
+            return index, None
+        # Arquivo novo (os.replace): versões antigas seguem lendo o mapeamento
+        # do arquivo anterior
+        store = FullPrecisionStore(FAISS_INDEX_DIR / "gallery_vectors.f32")
+        store.reset(vectors)
+        return index, store
+
     def _create_new_index(self):
         """Cria novo índice FAISS"""
         try:
-            # Criar índice FlatIP (Inner Product) para similaridade de cosseno
-            self.faiss_index = faiss.IndexFlatIP(EMBEDDING_DIMENSION)
-            self.id_to_user = {}
-            self.next_faiss_id = 0
-            print("Novo índice FAISS criado")
+            # Índice de produto interno (similaridade de cosseno) do tipo configurado
+            with self._write_lock:
+                index, store = self._index_from_vectors(
+                    np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32)
+                )
+                self._publish(index, store, {}, renumbered=True)
+                self._reload_shards()
+                self._reload_subindexes()
+            logger.info("Novo índice FAISS criado (%s)", FAISS_INDEX_TYPE)
         except Exception as e:
-            print(f"❌ Erro ao criar índice FAISS: {e}")
-            # Criar índice vazio como fallback
-            import numpy as np
+            logger.error("❌ Erro ao criar índice FAISS: %s", e)
             # Criar um índice mínimo mesmo se houver erro
             try:
-                self.faiss_index = faiss.IndexFlatIP(EMBEDDING_DIMENSION)
+                index = faiss.IndexFlatIP(EMBEDDING_DIMENSION)
             except:
                 # Se ainda falhar, criar um índice dummy
-                self.faiss_index = None
-            self.id_to_user = {}
-            self.next_faiss_id = 0
+                index = None
+            with self._write_lock:
+                self._publish(index, None, {}, renumbered=True)
 
     def save_faiss_index(self):
-        """Salva índice FAISS e mapeamento"""
+        """Salva índice FAISS e mapeamento (da mesma versão publicada)"""
         try:
+            snapshot = self._snapshot
+
             # Salvar índice
-            faiss.write_index(
-                self.faiss_index, str(FAISS_INDEX_DIR / "face_index.faiss")
-            )
+            faiss.write_index(snapshot.index, str(FAISS_INDEX_DIR / "face_index.faiss"))
 
             # Salvar mapeamento
             with open(FAISS_INDEX_DIR / "id_mapping.pkl", "wb") as f:
-                pickle.dump(self.id_to_user, f)
+                pickle.dump(snapshot.id_to_user, f)
 
-            print("Índice FAISS salvo com sucesso!")
+            logger.info("Índice FAISS salvo com sucesso!")
 
         except Exception as e:
-            print(f"Erro ao salvar índice FAISS: {e}")
+            logger.error("Erro ao salvar índice FAISS: %s", e)
+
+    def replace_index(
+        self, index, id_to_user: dict, since: Optional[GallerySnapshot] = None
+    ) -> GallerySnapshot:
+        """Substitui índice e mapeamento (ex.: após reconstrução) e persiste
+
+        Com ``since`` (versão lida antes de montar ``index``), cadastros e
+        remoções publicados depois dela são reaplicados sobre o índice novo em
+        vez de perdidos. Sub-índices montados sobre a versão anterior deixam de
+        ser usados (``generation``) até serem remontados logo em seguida.
+        Retorna a versão publicada.
+        """
+        with self._write_lock:
+            id_to_user = dict(id_to_user)
+            if since is not None:
+                index, id_to_user = self._replay_since(since, index, id_to_user)
+            if index_type_of(index) == FAISS_INDEX_TYPE and FAISS_INDEX_TYPE == "flat":
+                store = None
+            else:
+                index, store = self._index_from_vectors(
+                    index.reconstruct_n(0, index.ntotal)
+                )
+            self._publish(index, store, id_to_user, renumbered=True)
+            published = self._snapshot
+            self._reload_shards()
+            self._reload_subindexes()
+            self.save_faiss_index()
+            return published
+
+    def _replay_since(self, since: GallerySnapshot, index, id_to_user: dict):
+        """Leva para ``index`` (montado a partir de ``since``) os templates dos
+        usuários alterados depois de ``since`` (com o lock de escrita)
+
+        As entradas montadas desses usuários viram tombstones e os templates
+        da versão atual são anexados ao fim do índice novo.
+        """
+        current = self._snapshot
+        if current.generation != since.generation:
+            raise GalleryReplacedError("Galeria substituída durante a reconstrução")
+
+        # Adições são sempre anexadas: IDs a partir do ntotal de ``since``
+        start_total = since.index.ntotal if since.index is not None else 0
+        changed = {u for f, u in current.id_to_user.items() if f >= start_total}
+        changed.update(
+            u for f, u in since.id_to_user.items() if f not in current.id_to_user
+        )
+        if not changed:
+            return index, id_to_user
+
+        id_to_user = {f: u for f, u in id_to_user.items() if u not in changed}
+        live = sorted(f for f, u in current.id_to_user.items() if u in changed)
+        if live:
+            start = index.ntotal
+            index.add(np.ascontiguousarray(self.get_vectors(live, current)))
+            for offset, faiss_id in enumerate(live):
+                id_to_user[start + offset] = current.id_to_user[faiss_id]
+        logger.info(
+            "%s usuários alterados durante a reconstrução reaplicados", len(changed)
+        )
+        return index, id_to_user
 
     def detect_faces(
         self, image: np.ndarray, high_precision: bool = False
     ) -> List[dict]:
         """Detecta faces na imagem com opção de alta precisão"""
         try:
-            print(f"DEBUG DETECT: Processando imagem - Shape: {image.shape}")
-            faces = self.face_app.get(image)
-            print(f"DEBUG DETECT: Faces detectadas: {len(faces)}")
+            logger.debug("Processando imagem - Shape: %s", image.shape)
+            with stage("detection"):
+                bboxes, kpss = self.face_app.det_model.detect(
+                    image, max_num=0, metric="default"
+                )
+            logger.debug("Faces detectadas: %s", bboxes.shape[0])
 
             # Escolher threshold baseado na precisão desejada
             confidence_threshold = (
@@ -188,28 +403,44 @@ class FaceRecognitionSystem:
                 else FACE_DETECTION_CONFIDENCE
             )
 
-            # Filtrar faces por confiança e qualidade
-            valid_faces = []
+            # Filtrar faces por confiança e qualidade antes de extrair
+            # embeddings: faces descartadas não passam pelos demais modelos
+            candidates = []
+            with stage("quality"):
+                for i in range(bboxes.shape[0]):
+                    bbox = bboxes[i, 0:4]
+                    det_score = bboxes[i, 4]
+                    if det_score < confidence_threshold:
+                        continue
+                    if not is_face_quality_good(bbox, image):
+                        continue
+                    face = Face(
+                        bbox=bbox,
+                        kps=kpss[i] if kpss is not None else None,
+                        det_score=det_score,
+                    )
+                    candidates.append((face, calculate_face_quality(bbox, image)))
 
-            for i, face in enumerate(faces):
-                if face.det_score >= confidence_threshold:
-                    # Verificar qualidade da face detectada
-                    quality_ok = self._is_face_quality_good(face, image)
-
-                    if quality_ok:
-                        valid_faces.append(
-                            {
-                                "bbox": face.bbox.astype(int),
-                                "embedding": face.embedding,
-                                "det_score": face.det_score,
-                                "landmarks": face.kps if hasattr(face, "kps") else None,
-                                "quality_score": self._calculate_face_quality(
-                                    face, image
-                                ),
-                            }
-                        )
-
-            print(f"DEBUG DETECT: Faces válidas finais: {len(valid_faces)}")
+            valid_faces = []
+            with stage("embedding"):
+                for face, quality_score in candidates:
+                    # Mesmos modelos que FaceAnalysis.get executa por face
+                    for taskname, model in self.face_app.models.items():
+                        if taskname == "detection":
+                            continue
+                        model.get(image, face)
+
+                    valid_faces.append(
+                        {
+                            "bbox": face.bbox.astype(int),
+                            "embedding": face.embedding,
+                            "det_score": face.det_score,
+                            "landmarks": face.kps,
+                            "quality_score": quality_score,
+                        }
+                    )
+
+            logger.debug("Faces válidas finais: %s", len(valid_faces))
 
             # Ordenar por qualidade combinada (det_score + quality_score)
             valid_faces.sort(
@@ -219,81 +450,9 @@ class FaceRecognitionSystem:
             return valid_faces
 
         except Exception as e:
-            print(f"Erro na detecção de faces: {e}")
+            logger.error("Erro na detecção de faces: %s", e)
             return []
 
-    def _is_face_quality_good(self, face, image: np.ndarray) -> bool:
-        """Verifica se a qualidade da face detectada é adequada"""
-        try:
-            bbox = face.bbox.astype(int)
-            x1, y1, x2, y2 = bbox
-
-            # Verificar tamanho da face
-            face_width = x2 - x1
-            face_height = y2 - y1
-
-            if face_width < MIN_FACE_SIZE or face_height < MIN_FACE_SIZE:
-                return False
-
-            if face_width > MAX_FACE_SIZE or face_height > MAX_FACE_SIZE:
-                return False
-
-            # Verificar se a face está dentro dos limites da imagem
-            img_height, img_width = image.shape[:2]
-            if x1 < 0 or y1 < 0 or x2 > img_width or y2 > img_height:
-                return False
-
-            # Verificar proporção da face (não muito alongada)
-            aspect_ratio = face_width / face_height
-            if aspect_ratio < 0.5 or aspect_ratio > 2.0:
-                return False
-
-            return True
-
-        except Exception as e:
-            print(f"Erro na verificação de qualidade: {e}")
-            return False
-
-    def _calculate_face_quality(self, face, image: np.ndarray) -> float:
-        """Calcula score de qualidade da face"""
-        try:
-            bbox = face.bbox.astype(int)
-            x1, y1, x2, y2 = bbox
-
-            # Extrair região da face
-            face_roi = image[y1:y2, x1:x2]
-
-            if face_roi.size == 0:
-                return 0.0
-
-            # Converter para escala de cinza
-            gray_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
-
-            # Calcular nitidez usando Laplacian
-            laplacian_var = cv2.Laplacian(gray_face, cv2.CV_64F).var()
-
-            # Calcular brilho médio
-            brightness = np.mean(gray_face)
-
-            # Calcular contraste
-            contrast = np.std(gray_face)
-
-            # Normalizar scores (valores empíricos)
-            sharpness_score = min(laplacian_var / 1000.0, 1.0)  # Normalizar para 0-1
-            brightness_score = 1.0 - abs(brightness - 128) / 128.0  # Ideal é 128
-            contrast_score = min(contrast / 64.0, 1.0)  # Normalizar para 0-1
-
-            # Score combinado
-            quality_score = (
-                sharpness_score * 0.4 + brightness_score * 0.3 + contrast_score * 0.3
-            )
-
-            return max(0.0, min(1.0, quality_score))
-
-        except Exception as e:
-            print(f"Erro no cálculo de qualidade: {e}")
-            return 0.0
-
     def extract_embedding(self, image: np.ndarray) -> Optional[np.ndarray]:
         """Extrai embedding de uma face na imagem"""
         faces = self.detect_faces(image)
@@ -306,78 +465,410 @@ class FaceRecognitionSystem:
         return best_face["embedding"]
 
     def add_user_embedding(self, embedding: np.ndarray, user_id: int) -> int:
-        """Adiciona embedding de usuário ao índice FAISS"""
+        """Adiciona embedding de usuário ao índice FAISS
+
+        O índice é copiado antes do ``add`` (que pode realocar a memória lida
+        pelas buscas em andamento) e a cópia é publicada como nova versão.
+        """
         try:
-            print(f"DEBUG FAISS: Adicionando embedding para user_id: {user_id}")
-            print(f"DEBUG FAISS: Embedding shape: {embedding.shape}")
+            logger.debug("Adicionando embedding para user_id: %s", user_id)
+            logger.debug("Embedding shape: %s", embedding.shape)
 
             # Normalizar embedding para similaridade de cosseno
             embedding_normalized = embedding / np.linalg.norm(embedding)
-            print(f"DEBUG FAISS: Embedding normalizado")
-
-            # Adicionar ao índice FAISS
-            faiss_id = self.next_faiss_id
-            print(f"DEBUG FAISS: Usando faiss_id: {faiss_id}")
-
-            self.faiss_index.add(embedding_normalized.reshape(1, -1))
-            print(f"DEBUG FAISS: Embedding adicionado ao índice")
-
-            # Mapear ID do FAISS para ID do usuário
-            self.id_to_user[faiss_id] = user_id
-            print(f"DEBUG FAISS: Mapeamento criado: {faiss_id} -> {user_id}")
-
-            self.next_faiss_id += 1
-
-            # Salvar índice atualizado
-            print("DEBUG FAISS: Salvando índice...")
-            self.save_faiss_index()
-            print("DEBUG FAISS: Índice salvo com sucesso")
+            logger.debug("Embedding normalizado")
+            embedding_normalized = embedding_normalized.astype(np.float32).reshape(1, -1)
+
+            with self._write_lock:
+                current = self._snapshot
+
+                # Adicionar ao índice FAISS
+                faiss_id = self.next_faiss_id
+                logger.debug("Usando faiss_id: %s", faiss_id)
+
+                index = faiss.clone_index(current.index)
+                if current.store is not None:
+                    # Somente-anexo: versões anteriores não leem além do seu ntotal
+                    current.store.append(embedding_normalized)
+                index.add(embedding_normalized)
+                logger.debug("Embedding adicionado ao índice")
+
+                # Mapear ID do FAISS para ID do usuário
+                id_to_user = dict(current.id_to_user)
+                id_to_user[faiss_id] = user_id
+                user_to_faiss = dict(current.user_to_faiss)
+                user_to_faiss[user_id] = user_to_faiss.get(user_id, ()) + (faiss_id,)
+                logger.debug("Mapeamento criado: %s -> %s", faiss_id, user_id)
+
+                self._publish(index, current.store, id_to_user, user_to_faiss)
+
+                if self.shards is not None:
+                    try:
+                        self.shards.add(faiss_id, user_id, embedding_normalized)
+                    except Exception as e:
+                        self._shards_failed(e)
+                if self.groups is not None:
+                    self.groups.refresh_user(self, user_id)
+
+                # Salvar índice atualizado
+                logger.debug("Salvando índice...")
+                self.save_faiss_index()
+                logger.debug("Índice salvo com sucesso")
 
             return faiss_id
 
         except Exception as e:
-            print(f"Erro ao adicionar embedding: {e}")
+            logger.error("Erro ao adicionar embedding: %s", e)
             raise
 
+    def add_user_embeddings(
+        self, embeddings: np.ndarray, user_ids: Sequence[int]
+    ) -> List[int]:
+        """Adiciona vários embeddings (um por usuário, na ordem dada) com uma
+        única cópia do índice, uma publicação e uma gravação em disco
+
+        Retorna o ID do FAISS de cada embedding.
+        """
+        user_ids = [int(user_id) for user_id in user_ids]
+        if len(user_ids) != len(embeddings):
+            raise ValueError("Número de embeddings difere do número de usuários")
+        if not user_ids:
+            return []
+        vectors = self._normalize_queries(embeddings)
+
+        with self._write_lock:
+            current = self._snapshot
+            start = self.next_faiss_id
+            faiss_ids = list(range(start, start + len(user_ids)))
+
+            index = faiss.clone_index(current.index)
+            if current.store is not None:
+                current.store.append(vectors)
+            index.add(vectors)
+
+            id_to_user = dict(current.id_to_user)
+            user_to_faiss = dict(current.user_to_faiss)
+            for faiss_id, user_id in zip(faiss_ids, user_ids):
+                id_to_user[faiss_id] = user_id
+                user_to_faiss[user_id] = user_to_faiss.get(user_id, ()) + (faiss_id,)
+            self._publish(index, current.store, id_to_user, user_to_faiss)
+
+            if self.shards is not None:
+                try:
+                    self.shards.add_many(faiss_ids, user_ids, vectors)
+                except Exception as e:
+                    self._shards_failed(e)
+            if self.groups is not None:
+                self.groups.refresh_users(self, user_ids)
+            self.save_faiss_index()
+
+        logger.info("%s embeddings adicionados ao índice FAISS", len(faiss_ids))
+        return faiss_ids
+
     def recognize_face(
         self, embedding: np.ndarray, k: int = 5, adaptive_threshold: bool = True
     ) -> Tuple[Optional[int], float]:
         """Reconhece face comparando com embeddings conhecidos com threshold adaptativo"""
+        return self.recognize_faces([embedding], k, adaptive_threshold)[0]
+
+    def recognize_faces(
+        self,
+        embeddings: List[np.ndarray],
+        k: int = 5,
+        adaptive_threshold: bool = True,
+        group: Optional[str] = None,
+    ) -> List[Tuple[Optional[int], float]]:
+        """Reconhece várias faces com uma única busca no índice
+
+        Os embeddings são empilhados em uma matriz (n, 512) e enviados em uma
+        só chamada de busca; a decisão de cada face é a mesma de
+        ``recognize_face``. Retorna (user_id ou None, distância) por face.
+
+        Com ``group``, a busca é feita só no sub-índice do grupo (grupo sem
+        sub-índice não reconhece ninguém). Sem grupo e com a galeria quente
+        ligada, acertos confiantes nela são aceitos direto e só as demais
+        faces vão à galeria completa.
+        """
+        if len(embeddings) == 0:
+            return []
         try:
-            if self.faiss_index.ntotal == 0:
-                return None, 1.0
+            # Uma versão da galeria para a requisição inteira
+            snapshot = self._snapshot
+            if snapshot.index.ntotal == 0:
+                return [(None, 1.0)] * len(embeddings)
 
-            # Normalizar embedding
-            embedding_normalized = embedding / np.linalg.norm(embedding)
+            # Normalizar embeddings (uma linha por face)
+            queries = self._normalize_queries(embeddings)
 
-            # Buscar k vizinhos mais próximos
-            similarities, indices = self.faiss_index.search(
-                embedding_normalized.reshape(1, -1), min(k, self.faiss_index.ntotal)
-            )
+            if group is not None:
+                return self._recognize_in_group(
+                    snapshot, queries, group, k, adaptive_threshold
+                )
 
-            # Pegar melhor resultado
-            best_similarity = similarities[0][0]
-            best_index = indices[0][0]
+            decisions = [None] * len(queries)
+            if self.hot_tier is not None:
+                with stage("hot_search"):
+                    decisions = self.hot_tier.identify(queries, snapshot, k)
+            pending = [i for i, decision in enumerate(decisions) if decision is None]
+            if not pending:
+                return decisions
+
+            # Buscar k vizinhos mais próximos (com re-ordenação exata se o
+            # índice for comprimido)
+            with stage("search"):
+                similarities, indices = self._search(snapshot, queries[pending], k)
+
+            for row, i in enumerate(pending):
+                decisions[i] = self._match(
+                    snapshot, similarities[row], indices[row], adaptive_threshold
+                )
+            return decisions
 
-            # Converter similaridade para distância (1 - similaridade)
-            distance = 1.0 - best_similarity
+        except Exception as e:
+            logger.error("Erro no reconhecimento: %s", e)
+            return [(None, 1.0)] * len(embeddings)
+
+    def _recognize_in_group(
+        self,
+        snapshot: GallerySnapshot,
+        queries: np.ndarray,
+        group: str,
+        k: int,
+        adaptive_threshold: bool,
+    ) -> List[Tuple[Optional[int], float]]:
+        if self.groups is None:
+            return [(None, 1.0)] * len(queries)
+        with stage("search"):
+            similarities, indices = self.groups.search(
+                group, queries, k, snapshot.generation
+            )
+        if similarities.shape[1] == 0:
+            return [(None, 1.0)] * len(queries)
+        return [
+            self._match(snapshot, similarities[i], indices[i], adaptive_threshold)
+            for i in range(len(queries))
+        ]
+
+    def search_candidates(
+        self, embeddings: List[np.ndarray], k: int = 5
+    ) -> List[List[Tuple[int, float]]]:
+        """Top-k candidatos (user_id, similaridade) de cada embedding
+
+        Uma única busca para todas as consultas. Posições removidas do índice
+        são descartadas e cada usuário aparece uma vez (melhor similaridade).
+        A busca pede no máximo 2k vizinhos; só as consultas que ficarem com
+        menos de k candidatos (tombstones ou vários templates do mesmo
+        usuário no topo) são repetidas, dobrando o k até cobrir o índice.
+        """
+        snapshot = self._snapshot
+        total = snapshot.index.ntotal
+        if len(embeddings) == 0 or total == 0 or k <= 0:
+            return [[] for _ in embeddings]
+
+        queries = self._normalize_queries(embeddings)
+        results = [[] for _ in embeddings]
+        pending = np.arange(len(embeddings))
+        # Os shards só guardam vetores ativos; o índice local tem tombstones
+        tombstones = max(0, total - len(snapshot.id_to_user))
+        fetch_k = min(total, k if self.shards is not None else k + min(tombstones, k))
+        while True:
+            with stage("search"):
+                similarities, indices = self._search(
+                    snapshot, queries[pending], fetch_k
+                )
+            short = []
+            for row, query in enumerate(pending):
+                results[query] = self._to_candidates(
+                    snapshot, indices[row], similarities[row], k
+                )
+                if len(results[query]) < k:
+                    short.append(query)
+            if not short or fetch_k >= total:
+                return results
+            pending = np.array(short)
+            fetch_k = min(total, fetch_k * 2)
+
+    def search_radius(
+        self, embeddings: List[np.ndarray], min_similarity: float
+    ) -> List[List[Tuple[int, float]]]:
+        """Todos os usuários com similaridade >= ``min_similarity`` (busca por raio)"""
+        if len(embeddings) == 0:
+            return []
 
-            # Threshold adaptativo baseado na qualidade dos resultados
-            if adaptive_threshold:
-                threshold = self._get_adaptive_threshold(similarities[0])
-            else:
-                threshold = FACE_RECOGNITION_THRESHOLD
+        snapshot = self._snapshot
+        queries = self._normalize_queries(embeddings)
+        with stage("search"):
+            hits = None
+            if self.shards is not None:
+                try:
+                    hits = self.shards.range_search(queries, min_similarity)
+                except Exception as e:
+                    self._shards_failed(e)
+            if hits is None:
+                hits = range_search_index(
+                    snapshot.index,
+                    queries,
+                    min_similarity,
+                    store=snapshot.store,
+                )
+        return [self._to_candidates(snapshot, ids, sims) for ids, sims in hits]
 
-            # Verificar se está dentro do threshold
-            if distance <= threshold:
-                user_id = self.id_to_user.get(best_index)
-                return user_id, distance
-            else:
-                return None, distance
+    def _search(
+        self, snapshot: GallerySnapshot, queries: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Busca top-k nos shards, se houver, ou no índice local
 
+        O índice local continua completo, então uma falha nos shards só
+        desliga a partição; as buscas seguem no processo da API.
+        """
+        if self.shards is not None:
+            try:
+                return self.shards.search(queries, k)
+            except Exception as e:
+                self._shards_failed(e)
+        return search_index(snapshot.index, queries, k, store=snapshot.store)
+
+    def get_vectors(
+        self, faiss_ids: np.ndarray, snapshot: Optional[GallerySnapshot] = None
+    ) -> np.ndarray:
+        """Vetores das posições pedidas (float32 completos se houver store)"""
+        snapshot = snapshot or self._snapshot
+        ids = np.asarray(faiss_ids, dtype=np.int64)
+        if snapshot.store is not None:
+            return snapshot.store.get(ids)
+        return snapshot.index.reconstruct_batch(ids)
+
+    def attach_shards(self, shards):
+        """Passa a buscar na galeria particionada, carregada com o índice atual"""
+        self.shards = shards
+        self.shards_error = None
+        self._reload_shards()
+        logger.info(
+            "Galeria distribuída em %s shards: %s", shards.num_shards, shards.sizes()
+        )
+
+    def detach_shards(self):
+        shards, self.shards = self.shards, None
+        if shards is not None:
+            shards.close()
+
+    def _reload_shards(self):
+        if self.shards is None:
+            return
+        snapshot = self._snapshot
+        faiss_ids = np.array(sorted(snapshot.id_to_user), dtype=np.int64)
+        user_ids = np.array(
+            [snapshot.id_to_user[i] for i in faiss_ids], dtype=np.int64
+        )
+        vectors = (
+            self.get_vectors(faiss_ids, snapshot)
+            if len(faiss_ids)
+            else np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        )
+        try:
+            self.shards.load(faiss_ids, user_ids, vectors)
         except Exception as e:
-            print(f"Erro no reconhecimento: {e}")
-            return None, 1.0
+            self._shards_failed(e)
+
+    def _shards_failed(self, error: Exception):
+        logger.error("❌ Falha na galeria particionada, usando índice local: %s", error)
+        self.shards_error = f"{type(error).__name__}: {error}"
+        shards, self.shards = self.shards, None
+        if shards is not None:
+            try:
+                shards.close()
+            except Exception:
+                pass
+
+    def attach_hot_tier(self, hot_tier):
+        """Passa a consultar a galeria quente antes da completa"""
+        self.hot_tier = hot_tier
+        self.hot_tier.build(self)
+
+    def detach_hot_tier(self):
+        self.hot_tier = None
+
+    def attach_groups(self, groups):
+        """Passa a manter os sub-índices por grupo junto com a galeria global"""
+        self.groups = groups
+
+    def _reload_subindexes(self):
+        if self.hot_tier is not None:
+            self.hot_tier.build(self)
+        if self.groups is not None:
+            self.groups.rebuild(self)
+
+    def verify_face(self, embedding: np.ndarray, user_id: int) -> Optional[float]:
+        """Verificação 1:1: maior similaridade entre a face e os templates do usuário
+
+        Compara só com os vetores do usuário (custo proporcional ao número de
+        templates dele, independente do tamanho da galeria). Retorna None se o
+        usuário não tiver template no índice.
+        """
+        snapshot = self._snapshot
+        faiss_ids = snapshot.user_to_faiss.get(user_id)
+        if not faiss_ids:
+            return None
+
+        with stage("verify"):
+            templates = self.get_vectors(faiss_ids, snapshot)
+            query = self._normalize_queries([embedding])[0]
+            return float(np.max(templates @ query))
+
+    def _normalize_queries(self, embeddings: List[np.ndarray]) -> np.ndarray:
+        """Empilha os embeddings em uma matriz (n, d) de linhas unitárias"""
+        queries = np.vstack(
+            [np.asarray(e, dtype=np.float32).reshape(1, -1) for e in embeddings]
+        )
+        return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    def _to_candidates(
+        self,
+        snapshot: GallerySnapshot,
+        ids: np.ndarray,
+        similarities: np.ndarray,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """Converte IDs do FAISS em (user_id, similaridade), um por usuário"""
+        candidates = []
+        seen = set()
+        for faiss_id, similarity in zip(ids, similarities):
+            user_id = snapshot.id_to_user.get(int(faiss_id))
+            if user_id is None or user_id in seen:
+                continue
+            seen.add(user_id)
+            candidates.append((user_id, float(similarity)))
+            if limit is not None and len(candidates) >= limit:
+                break
+        return candidates
+
+    def _match(
+        self,
+        snapshot: GallerySnapshot,
+        similarities: np.ndarray,
+        indices: np.ndarray,
+        adaptive_threshold: bool,
+    ) -> Tuple[Optional[int], float]:
+        """Decide a identidade a partir dos k vizinhos de uma consulta"""
+        # Pegar melhor resultado
+        best_similarity = similarities[0]
+        best_index = indices[0]
+
+        # Converter similaridade para distância (1 - similaridade)
+        distance = 1.0 - best_similarity
+
+        # Threshold adaptativo baseado na qualidade dos resultados
+        if adaptive_threshold:
+            threshold = self._get_adaptive_threshold(similarities)
+        else:
+            threshold = FACE_RECOGNITION_THRESHOLD
+
+        # Verificar se está dentro do threshold
+        if distance <= threshold:
+            user_id = snapshot.id_to_user.get(best_index)
+            return user_id, distance
+        else:
+            return None, distance
 
     def _get_adaptive_threshold(self, similarities: np.ndarray) -> float:
         """Calcula threshold adaptativo baseado na distribuição de similaridades"""
@@ -401,15 +892,57 @@ class FaceRecognitionSystem:
                 return FACE_RECOGNITION_THRESHOLD
 
         except Exception as e:
-            print(f"Erro no cálculo de threshold adaptativo: {e}")
+            logger.error("Erro no cálculo de threshold adaptativo: %s", e)
             return FACE_RECOGNITION_THRESHOLD
 
     def remove_user_embedding(self, faiss_id: int):
         """Remove embedding do usuário (implementação simplificada)"""
+        self._remove_faiss_ids([faiss_id])
+
+    def remove_users(self, user_ids: Iterable[int]) -> int:
+        """Remove todos os embeddings dos usuários dados com uma única
+        publicação e uma gravação em disco; retorna quantos saíram"""
+        with self._write_lock:
+            templates = self._snapshot.user_to_faiss
+            faiss_ids = [
+                faiss_id
+                for user_id in set(user_ids)
+                for faiss_id in templates.get(user_id, ())
+            ]
+            return self._remove_faiss_ids(faiss_ids)
+
+    def _remove_faiss_ids(self, faiss_ids: List[int]) -> int:
         # FAISS não suporta remoção eficiente, então marcamos como removido
-        if faiss_id in self.id_to_user:
-            del self.id_to_user[faiss_id]
+        # (só os mapeamentos mudam; o índice é compartilhado com a versão nova)
+        with self._write_lock:
+            current = self._snapshot
+            faiss_ids = [i for i in set(faiss_ids) if i in current.id_to_user]
+            if not faiss_ids:
+                return 0
+            id_to_user = dict(current.id_to_user)
+            user_to_faiss = dict(current.user_to_faiss)
+            removed = {}
+            for faiss_id in faiss_ids:
+                removed.setdefault(id_to_user.pop(faiss_id), set()).add(faiss_id)
+            for user_id, ids in removed.items():
+                templates = tuple(
+                    i for i in user_to_faiss.get(user_id, ()) if i not in ids
+                )
+                if templates:
+                    user_to_faiss[user_id] = templates
+                else:
+                    user_to_faiss.pop(user_id, None)
+            self._publish(current.index, current.store, id_to_user, user_to_faiss)
+
+            if self.shards is not None:
+                try:
+                    self.shards.remove(faiss_ids)
+                except Exception as e:
+                    self._shards_failed(e)
+            if self.groups is not None:
+                self.groups.refresh_users(self, removed)
             self.save_faiss_index()
+            return len(faiss_ids)
 
     def clear_index(self):
         """Limpa completamente o índice FAISS"""
@@ -420,10 +953,10 @@ class FaceRecognitionSystem:
             # Salvar índice limpo
             self.save_faiss_index()
 
-            print("Índice FAISS limpo com sucesso!")
+            logger.info("Índice FAISS limpo com sucesso!")
 
         except Exception as e:
-            print(f"Erro ao limpar índice FAISS: {e}")
+            logger.error("Erro ao limpar índice FAISS: %s", e)
             raise
 
     def get_stats(self) -> dict:
@@ -432,15 +965,22 @@ class FaceRecognitionSystem:
             # Garantir que o índice existe
             if self.faiss_index is None:
                 self.load_faiss_index()
-            
+
+            snapshot = self._snapshot
             return {
-                "total_embeddings": self.faiss_index.ntotal if self.faiss_index else 0,
-                "registered_users": len(self.id_to_user),
+                "total_embeddings": snapshot.index.ntotal if snapshot.index else 0,
+                "registered_users": len(snapshot.id_to_user),
+                "index_type": FAISS_INDEX_TYPE,
+                "shard_sizes": self.shards.sizes() if self.shards else None,
+                # Shards desligados após falha: só voltam com reinício
+                "shards_error": self.shards_error,
+                "hot_tier": self.hot_tier.stats() if self.hot_tier else None,
+                "groups": self.groups.stats() if self.groups else None,
                 "device": DEVICE,
                 "threshold": FACE_RECOGNITION_THRESHOLD,
             }
         except Exception as e:
-            print(f"Erro ao obter estatísticas: {e}")
+            logger.error("Erro ao obter estatísticas: %s", e)
             return {
                 "total_embeddings": 0,
                 "registered_users": 0,
@@ -454,18 +994,19 @@ class FaceRecognitionSystem:
 # Inicialização com tratamento de erro para evitar falhas silenciosas
 try:
     face_recognition = FaceRecognitionSystem()
-    print("✅ Sistema de reconhecimento facial inicializado com sucesso")
+    logger.info("✅ Sistema de reconhecimento facial inicializado com sucesso")
 except Exception as e:
-    print(f"❌ Erro ao inicializar sistema de reconhecimento facial: {e}")
-    import traceback
-    traceback.print_exc()
+    logger.exception("❌ Erro ao inicializar sistema de reconhecimento facial: %s", e)
     # Criar instância vazia para evitar erros de importação
     class DummyFaceRecognitionSystem:
         def __init__(self):
             self.face_app = None
+            self.active_providers = []
             self.faiss_index = None
             self.id_to_user = {}
+            self.user_to_faiss = {}
             self.next_faiss_id = 0
+            self.snapshot = GallerySnapshot(None, None, {}, {}, 0)
         
         def get_stats(self):
             return {
@@ -484,8 +1025,44 @@ except Exception as e:
         
         def recognize_face(self, embedding, k=5, adaptive_threshold=True):
             return None, 1.0
+
+        def recognize_faces(self, embeddings, k=5, adaptive_threshold=True, group=None):
+            return [(None, 1.0)] * len(embeddings)
+
+        def search_candidates(self, embeddings, k=5):
+            return [[] for _ in embeddings]
+
+        def search_radius(self, embeddings, min_similarity):
+            return [[] for _ in embeddings]
+
+        def verify_face(self, embedding, user_id):
+            return None
+
+        def attach_shards(self, shards):
+            shards.close()
+
+        def detach_shards(self):
+            pass
+
+        def attach_hot_tier(self, hot_tier):
+            pass
+
+        def detach_hot_tier(self):
+            pass
+
+        def attach_groups(self, groups):
+            pass
         
         def add_user_embedding(self, embedding, user_id):
             raise RuntimeError("Sistema de reconhecimento não inicializado")
+
+        def add_user_embeddings(self, embeddings, user_ids):
+            raise RuntimeError("Sistema de reconhecimento não inicializado")
+
+        def remove_user_embedding(self, faiss_id):
+            pass
+
+        def remove_users(self, user_ids):
+            return 0
     
     face_recognition = DummyFaceRecognitionSystem()
@@ -0,0 +1,199 @@
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+import sys
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import (
+    EMBEDDING_DIMENSION,
+    FAISS_SQ8_RANGE,
+    FAISS_RERANK_FACTOR,
+    FAISS_RANGE_MARGIN,
+)
+
+# Tipos de índice suportados para a primeira etapa da busca
+INDEX_TYPES = ("flat", "sq8", "fp16")
+
+
+def create_index(index_type: str = "flat", dim: int = EMBEDDING_DIMENSION):
+    """Cria índice FAISS vazio (produto interno) do tipo pedido
+
+    ``sq8`` usa quantização escalar uniforme de 8 bits treinada no intervalo
+    fixo [-FAISS_SQ8_RANGE, FAISS_SQ8_RANGE], adequado a vetores normalizados,
+    para que o índice possa ser usado vazio sem etapa de treino.
+    """
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dim)
+
+    if index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_8bit_uniform, faiss.METRIC_INNER_PRODUCT
+        )
+        bounds = np.vstack(
+            [np.full(dim, -FAISS_SQ8_RANGE), np.full(dim, FAISS_SQ8_RANGE)]
+        ).astype(np.float32)
+        index.train(bounds)
+        return index
+
+    if index_type == "fp16":
+        return faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+        )
+
+    raise ValueError(f"Tipo de índice FAISS desconhecido: {index_type}")
+
+
+def index_type_of(index) -> str:
+    """Identifica o tipo (flat/sq8/fp16) de um índice FAISS carregado"""
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16:
+            return "fp16"
+        return "sq8"
+    return type(index).__name__
+
+
+class FullPrecisionStore:
+    """Vetores float32 completos em arquivo somente-anexo, lidos via memmap
+
+    A linha ``i`` do arquivo corresponde ao ID ``i`` do índice FAISS. As páginas
+    mapeadas são compartilhadas pelo cache do sistema operacional entre workers e
+    só são lidas para os candidatos da re-ordenação.
+    """
+
+    def __init__(self, path: Path, dim: int = EMBEDDING_DIMENSION):
+        self.path = Path(path)
+        self.dim = dim
+        self._row_bytes = dim * np.dtype(np.float32).itemsize
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._open()
+
+    def _open(self):
+        rows = self.path.stat().st_size // self._row_bytes if self.path.exists() else 0
+        if rows:
+            self._vectors = np.memmap(
+                self.path, dtype=np.float32, mode="r", shape=(rows, self.dim)
+            )
+        else:
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._vectors.shape[0]
+
+    def append(self, vectors: np.ndarray):
+        """Anexa vetores ao final do arquivo"""
+        data = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with open(self.path, "ab") as f:
+            f.write(data.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._open()
+
+    def reset(self, vectors: Optional[np.ndarray] = None):
+        """Reescreve o arquivo com os vetores dados (ou vazio)"""
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            if vectors is not None and len(vectors):
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._open()
+
+    def truncate(self, rows: int):
+        """Descarta linhas além de ``rows`` (ex.: após falha entre gravações)"""
+        with open(self.path, "r+b") as f:
+            f.truncate(rows * self._row_bytes)
+        self._open()
+
+    def get(self, ids: np.ndarray) -> np.ndarray:
+        """Retorna cópia em memória dos vetores dos IDs pedidos"""
+        return np.asarray(self._vectors[np.asarray(ids, dtype=np.int64)])
+
+
+def search_index(
+    index,
+    queries: np.ndarray,
+    k: int,
+    store: Optional[FullPrecisionStore] = None,
+    rerank_factor: int = FAISS_RERANK_FACTOR,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Busca os k vizinhos de cada consulta, com re-ordenação exata opcional
+
+    Sem ``store`` é uma busca direta no índice. Com ``store``, o índice
+    comprimido seleciona ``k * rerank_factor`` candidatos e as similaridades são
+    recalculadas com os vetores float32 completos, retornando os k melhores.
+    Posições sem resultado têm ID -1 e similaridade -inf.
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, index.d)
+    k = min(k, index.ntotal)
+    if k <= 0:
+        empty = np.empty((queries.shape[0], 0))
+        return empty.astype(np.float32), empty.astype(np.int64)
+
+    if store is None:
+        return index.search(queries, k)
+
+    candidates_k = min(index.ntotal, k * max(rerank_factor, 1))
+    _, candidates = index.search(queries, candidates_k)
+
+    valid = candidates >= 0
+    vectors = store.get(np.where(valid, candidates, 0).ravel()).reshape(
+        queries.shape[0], candidates_k, index.d
+    )
+    similarities = np.einsum("nkd,nd->nk", vectors, queries)
+    similarities[~valid] = -np.inf
+
+    order = np.argsort(-similarities, axis=1, kind="stable")[:, :k]
+    return (
+        np.take_along_axis(similarities, order, axis=1).astype(np.float32),
+        np.take_along_axis(candidates, order, axis=1),
+    )
+
+
+def range_search_index(
+    index,
+    queries: np.ndarray,
+    min_similarity: float,
+    store: Optional[FullPrecisionStore] = None,
+    margin: float = FAISS_RANGE_MARGIN,
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Busca por raio: todos os vetores com similaridade >= ``min_similarity``
+
+    Uma única chamada de ``range_search`` atende todas as consultas. Com
+    ``store``, o índice comprimido busca com o raio reduzido em ``margin``
+    (erro de quantização) e as similaridades são recalculadas com os vetores
+    float32 completos antes do corte. Retorna (ids, similaridades) por
+    consulta, em ordem decrescente de similaridade.
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, index.d)
+    if index.ntotal == 0:
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        return [empty] * queries.shape[0]
+
+    radius = min_similarity - margin if store is not None else min_similarity
+    # range_search devolve resultados com produto interno estritamente > raio
+    lims, similarities, ids = index.range_search(
+        queries, float(np.nextafter(np.float32(radius), np.float32(-np.inf)))
+    )
+
+    results = []
+    for i in range(queries.shape[0]):
+        hit_ids = ids[lims[i] : lims[i + 1]]
+        hit_similarities = similarities[lims[i] : lims[i + 1]]
+        if store is not None and len(hit_ids):
+            hit_similarities = store.get(hit_ids) @ queries[i]
+            keep = hit_similarities >= min_similarity
+            hit_ids, hit_similarities = hit_ids[keep], hit_similarities[keep]
+        order = np.argsort(-hit_similarities, kind="stable")
+        results.append(
+            (hit_ids[order], hit_similarities[order].astype(np.float32))
+        )
+    return results
@@ -0,0 +1,214 @@
+"""Galerias por grupo de usuários (site, prédio, turno)
+
+Cada grupo tem um sub-índice (IndexFlatIP) só com os vetores dos seus
+membros, de modo que um portão busca entre as pessoas que pode admitir: o
+custo da busca e o risco de falso positivo acompanham o tamanho do site, não
+o da empresa. Um usuário pode estar em vários grupos (o vetor é copiado em
+cada sub-índice). A galeria global continua existindo para buscas sem grupo.
+"""
+
+import logging
+import os
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import EMBEDDING_DIMENSION, GATE_GROUPS
+from app.models import UserGroup
+from app.sharding import GalleryPartition
+
+logger = logging.getLogger(__name__)
+
+
+def parse_gate_groups(value: str) -> Dict[str, str]:
+    """Lê GATE_GROUPS no formato "portao=grupo,portao2=grupo2" """
+    gates = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        gate, _, group = entry.partition("=")
+        if gate and group:
+            gates[gate.strip()] = group.strip()
+    return gates
+
+
+def normalize_groups(groups: Iterable[str]) -> List[str]:
+    """Nomes de grupo sem espaços nas pontas, sem vazios e sem repetições"""
+    return list(dict.fromkeys(g.strip() for g in groups if g and g.strip()))
+
+
+class UnknownGateError(KeyError):
+    """Portão sem grupo configurado em GATE_GROUPS"""
+
+
+class GroupGalleries:
+    """Membros e sub-índice de cada grupo
+
+    Sub-índices são remontados por inteiro (são pequenos) e publicados só
+    depois de prontos, então buscas nunca veem um índice pela metade. São
+    publicados junto com a ``generation`` da galeria de onde vieram os
+    vetores; depois de uma renumeração dos IDs, ficam fora de uso até serem
+    remontados.
+    """
+
+    def __init__(self, gates: Optional[Dict[str, str]] = None):
+        self.gates = gates if gates is not None else parse_gate_groups(GATE_GROUPS)
+        self.members: Dict[str, Set[int]] = {}
+        # (generation da galeria, sub-índice de cada grupo)
+        self._published: Tuple[int, Dict[str, GalleryPartition]] = (-1, {})
+        self._lock = threading.Lock()
+
+    def resolve(self, gate: Optional[str] = None, group: Optional[str] = None):
+        """Grupo a buscar: o informado, o do portão, ou None (galeria global)"""
+        if group:
+            return group
+        if gate:
+            if gate not in self.gates:
+                raise UnknownGateError(gate)
+            return self.gates[gate]
+        return None
+
+    def load(self, db, face_recognition):
+        """Lê os grupos do banco e monta todos os sub-índices"""
+        members: Dict[str, Set[int]] = {}
+        for user_id, group_name in db.query(UserGroup.user_id, UserGroup.group_name):
+            members.setdefault(group_name, set()).add(user_id)
+        with self._lock:
+            self.members = members
+        self.rebuild(face_recognition)
+        logger.info("Galerias por grupo carregadas: %s grupos", len(members))
+
+    def user_groups(self, user_id: int) -> List[str]:
+        members = list(self.members.items())
+        return sorted(group for group, users in members if user_id in users)
+
+    def set_user_groups(self, db, face_recognition, user_id: int, groups: List[str]):
+        """Substitui os grupos de um usuário (banco e sub-índices)"""
+        groups = normalize_groups(groups)
+        db.query(UserGroup).filter(UserGroup.user_id == user_id).delete(
+            synchronize_session=False
+        )
+        db.add_all(UserGroup(user_id=user_id, group_name=g) for g in groups)
+        db.commit()
+
+        with self._lock:
+            previous = set(self.user_groups(user_id))
+            for group in previous - set(groups):
+                self.members[group].discard(user_id)
+                if not self.members[group]:
+                    del self.members[group]
+            for group in groups:
+                self.members.setdefault(group, set()).add(user_id)
+        self.rebuild(face_recognition, previous | set(groups))
+        return groups
+
+    def clear(self, db=None):
+        """Remove todos os grupos (ex.: banco limpo)"""
+        if db is not None:
+            db.query(UserGroup).delete(synchronize_session=False)
+            db.commit()
+        with self._lock:
+            self.members = {}
+            self._published = (-1, {})
+
+    def refresh_user(self, face_recognition, user_id: int):
+        """Remonta os grupos de um usuário cujos templates mudaram"""
+        self.refresh_users(face_recognition, [user_id])
+
+    def refresh_users(self, face_recognition, user_ids: Iterable[int]):
+        """Remonta uma vez cada grupo com algum dos usuários dados"""
+        user_ids = set(user_ids)
+        groups = [
+            group
+            for group, users in list(self.members.items())
+            if not users.isdisjoint(user_ids)
+        ]
+        if groups:
+            self.rebuild(face_recognition, groups)
+
+    def forget_users(self, db, face_recognition, user_ids: Iterable[int]):
+        """Tira os usuários de todos os grupos (banco e sub-índices)"""
+        user_ids = set(user_ids)
+        ids = list(user_ids)
+        for start in range(0, len(ids), 500):
+            db.query(UserGroup).filter(
+                UserGroup.user_id.in_(ids[start : start + 500])
+            ).delete(synchronize_session=False)
+        db.commit()
+
+        with self._lock:
+            affected = [
+                group
+                for group, users in self.members.items()
+                if not users.isdisjoint(user_ids)
+            ]
+            for group in affected:
+                self.members[group] -= user_ids
+                if not self.members[group]:
+                    del self.members[group]
+        if affected:
+            self.rebuild(face_recognition, affected)
+
+    def rebuild(self, face_recognition, groups: Optional[Iterable[str]] = None):
+        """Remonta os sub-índices pedidos (ou todos) a partir da galeria global"""
+        with self._lock:
+            snapshot = face_recognition.snapshot
+            generation, partitions = self._published
+            if groups is None or generation != snapshot.generation:
+                # IDs renumerados: nenhum sub-índice anterior é aproveitado
+                names, partitions = list(self.members), {}
+            else:
+                names, partitions = list(groups), dict(partitions)
+            for name in names:
+                users = tuple(self.members.get(name, ()))
+                if not users:
+                    partitions.pop(name, None)
+                    continue
+                partitions[name] = self._build(face_recognition, snapshot, users)
+            self._published = (snapshot.generation, partitions)
+
+    def _build(
+        self, face_recognition, snapshot, user_ids: Tuple[int, ...]
+    ) -> GalleryPartition:
+        templates = snapshot.user_to_faiss
+        faiss_ids = np.array(
+            [f for user_id in user_ids for f in templates.get(user_id, ())],
+            dtype=np.int64,
+        )
+        partition = GalleryPartition(EMBEDDING_DIMENSION)
+        if len(faiss_ids):
+            vectors = face_recognition.get_vectors(faiss_ids, snapshot)
+            partition.reset(faiss_ids, vectors)
+        return partition
+
+    def search(
+        self, group: str, queries: np.ndarray, k: int, generation: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k no sub-índice do grupo (sem colunas se o grupo não existe ou
+        o sub-índice é de outra ``generation`` da galeria)"""
+        published_generation, partitions = self._published
+        partition = partitions.get(group)
+        if partition is None or published_generation != generation:
+            empty = np.empty((queries.shape[0], 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        return partition.search(queries, k)
+
+    def stats(self) -> List[dict]:
+        _, partitions = self._published
+        return [
+            {
+                "name": name,
+                "users": len(users),
+                "vectors": (
+                    partitions[name].index.ntotal if name in partitions else 0
+                ),
+            }
+            for name, users in sorted(self.members.items())
+        ]
+
+
+# Instância global das galerias por grupo
+group_galleries = GroupGalleries()
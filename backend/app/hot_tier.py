@@ -0,0 +1,241 @@
+"""Galeria quente: usuários frequentes ou vistos recentemente, buscados primeiro
+
+A galeria quente é um IndexFlatIP pequeno (HOT_TIER_SIZE usuários) com os
+vetores desses usuários e o ID global do FAISS de cada linha. No
+reconhecimento, um acerto confiante na galeria quente é aceito sem consultar
+a galeria completa; misses e casos ambíguos seguem para a busca normal.
+
+Os usuários são escolhidos pelas passagens recentes (AccessLog dos últimos
+HOT_TIER_RECENT_DAYS dias) e completados por ``User.passage_count``, em uma
+thread de fundo a cada HOT_TIER_REBALANCE_SECONDS.
+"""
+
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import (
+    EMBEDDING_DIMENSION,
+    HOT_TIER_SIZE,
+    HOT_TIER_RECENT_DAYS,
+    HOT_TIER_REBALANCE_SECONDS,
+    HOT_TIER_MIN_SIMILARITY,
+    HOT_TIER_MIN_GAP,
+)
+from app import metrics
+from app.models import AccessLog, User
+from app.sharding import GalleryPartition
+
+logger = logging.getLogger(__name__)
+
+
+class HotTier:
+    """Índice pequeno dos usuários mais ativos, trocado por inteiro a cada montagem
+
+    Buscas leem a partição publicada sem lock; montagens criam uma partição
+    nova e só então a publicam, junto com a ``generation`` da galeria de onde
+    vieram os vetores (IDs renumerados invalidam a partição até a próxima
+    montagem). Remoções não alteram a partição: IDs que saíram de
+    ``id_to_user`` são ignorados até a próxima montagem.
+    """
+
+    def __init__(
+        self,
+        capacity: int = HOT_TIER_SIZE,
+        recent_days: int = HOT_TIER_RECENT_DAYS,
+        min_similarity: float = HOT_TIER_MIN_SIMILARITY,
+        min_gap: float = HOT_TIER_MIN_GAP,
+    ):
+        self.capacity = capacity
+        self.recent_days = recent_days
+        self.min_similarity = min_similarity
+        self.min_gap = min_gap
+        self.user_ids: List[int] = []
+        # (generation da galeria, partição) publicados juntos
+        self._published: Tuple[int, Optional[GalleryPartition]] = (-1, None)
+        self._build_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.fallthroughs = 0
+        self.last_rebalance = None
+
+    def select_users(self, db, now: Optional[datetime] = None) -> List[int]:
+        """Usuários ativos mais vistos no período recente, depois por passagens"""
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.recent_days)
+        passages = func.count(AccessLog.id)
+        recent = (
+            db.query(AccessLog.user_id)
+            .join(User, User.id == AccessLog.user_id)
+            .filter(
+                AccessLog.access_granted.is_(True),
+                AccessLog.timestamp >= cutoff,
+                User.is_active.is_(True),
+            )
+            .group_by(AccessLog.user_id)
+            .order_by(passages.desc())
+            .limit(self.capacity)
+            .all()
+        )
+        frequent = (
+            db.query(User.id)
+            .filter(User.is_active.is_(True), User.passage_count > 0)
+            .order_by(User.passage_count.desc())
+            .limit(self.capacity)
+            .all()
+        )
+        # Ordem preservada, sem repetições: recentes primeiro
+        selected = dict.fromkeys(row[0] for row in recent + frequent)
+        return list(selected)[: self.capacity]
+
+    def build(self, face_recognition, user_ids: Optional[List[int]] = None):
+        """Monta e publica a partição dos usuários dados (ou dos atuais)"""
+        with self._build_lock:
+            if user_ids is None:
+                user_ids = self.user_ids
+            snapshot = face_recognition.snapshot
+            faiss_ids = np.array(
+                [
+                    faiss_id
+                    for user_id in user_ids
+                    for faiss_id in snapshot.user_to_faiss.get(user_id, ())
+                ],
+                dtype=np.int64,
+            )
+            partition = GalleryPartition(EMBEDDING_DIMENSION)
+            if len(faiss_ids):
+                partition.reset(
+                    faiss_ids, face_recognition.get_vectors(faiss_ids, snapshot)
+                )
+
+            self.user_ids = list(user_ids)
+            self._published = (snapshot.generation, partition)
+
+    def rebalance(self, session_factory, face_recognition) -> dict:
+        """Reescolhe os usuários da galeria quente a partir das passagens"""
+        db = session_factory()
+        try:
+            user_ids = self.select_users(db)
+        finally:
+            db.close()
+        self.build(face_recognition, user_ids)
+        self.last_rebalance = datetime.utcnow()
+        return self.stats()
+
+    def identify(
+        self, queries: np.ndarray, snapshot, k: int = 5
+    ) -> List[Optional[Tuple[int, float]]]:
+        """Acertos confiantes na galeria quente: (user_id, distância) ou None
+
+        Um acerto exige similaridade >= ``min_similarity`` e folga >=
+        ``min_gap`` para o segundo usuário mais parecido entre os k vizinhos
+        (sem outro usuário entre eles, a folga é medida contra o k-ésimo).
+        ``snapshot`` é a versão da galeria usada pela requisição.
+        """
+        generation, partition = self._published
+        if (
+            partition is None
+            or partition.index.ntotal == 0
+            or generation != snapshot.generation
+        ):
+            self._count(0, len(queries))
+            return [None] * len(queries)
+
+        similarities, ids = partition.search(queries, k)
+        decisions = []
+        for row_ids, row_sims in zip(ids, similarities):
+            best_user, best, runner_up = None, -1.0, float(row_sims[-1])
+            for faiss_id, similarity in zip(row_ids, row_sims):
+                user_id = snapshot.id_to_user.get(int(faiss_id))
+                if user_id is None:
+                    continue
+                if best_user is None:
+                    best_user, best = user_id, float(similarity)
+                elif user_id != best_user:
+                    runner_up = float(similarity)
+                    break
+            confident = (
+                best_user is not None
+                and best >= self.min_similarity
+                and best - runner_up >= self.min_gap
+            )
+            decisions.append((best_user, 1.0 - best) if confident else None)
+
+        hits = sum(decision is not None for decision in decisions)
+        self._count(hits, len(decisions) - hits)
+        return decisions
+
+    def _count(self, hits: int, fallthroughs: int):
+        with self._stats_lock:
+            self.hits += hits
+            self.fallthroughs += fallthroughs
+        if hits:
+            metrics.hot_tier_lookup("hit", hits)
+        if fallthroughs:
+            metrics.hot_tier_lookup("fallthrough", fallthroughs)
+
+    def stats(self) -> dict:
+        _, partition = self._published
+        lookups = self.hits + self.fallthroughs
+        return {
+            "users": len(self.user_ids),
+            "vectors": partition.index.ntotal if partition is not None else 0,
+            "hits": self.hits,
+            "fallthroughs": self.fallthroughs,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "last_rebalance": (
+                self.last_rebalance.isoformat() if self.last_rebalance else None
+            ),
+        }
+
+    def start(
+        self,
+        session_factory,
+        face_recognition,
+        interval_seconds: int = HOT_TIER_REBALANCE_SECONDS,
+    ):
+        """Inicia o rebalanceamento periódico em thread de fundo"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    stats = self.rebalance(session_factory, face_recognition)
+                    logger.info(
+                        "🔥 Galeria quente: %s usuários, %s vetores",
+                        stats["users"],
+                        stats["vectors"],
+                    )
+                except Exception as e:
+                    logger.error("Erro ao rebalancear galeria quente: %s", e)
+                self._stop_event.wait(interval_seconds)
+
+        self._thread = threading.Thread(
+            target=run, name="hot-tier-rebalancer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Interrompe o rebalanceamento"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Instância global da galeria quente
+hot_tier = HotTier()
@@ -0,0 +1,42 @@
+import base64
+import io
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Tamanho máximo das imagens de validação (redimensionadas para performance)
+VALIDATION_MAX_SIZE = (800, 600)
+
+
+def decode_base64_payload(image_data: str) -> bytes:
+    """Decodifica imagem em base64 (com ou sem prefixo data URL)"""
+    if "," in image_data:
+        return base64.b64decode(image_data.split(",")[1])
+    return base64.b64decode(image_data)
+
+
+def bytes_to_bgr(
+    image_bytes: bytes, max_size: Optional[Tuple[int, int]] = VALIDATION_MAX_SIZE
+) -> np.ndarray:
+    """Converte bytes de imagem (JPEG/PNG/...) em array BGR do OpenCV"""
+    image = Image.open(io.BytesIO(image_bytes))
+    # Redimensionar se muito grande para melhor performance
+    if max_size and (image.width > max_size[0] or image.height > max_size[1]):
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+
+def fit_image(
+    image: np.ndarray, max_size: Tuple[int, int] = VALIDATION_MAX_SIZE
+) -> np.ndarray:
+    """Reduz um frame BGR para caber em max_size, mantendo a proporção"""
+    height, width = image.shape[:2]
+    scale = min(max_size[0] / width, max_size[1] / height)
+    if scale >= 1.0:
+        return image
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
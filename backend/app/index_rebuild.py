@@ -0,0 +1,389 @@
+"""Reconstrução do índice FAISS a partir dos embeddings criptografados no banco
+
+Uso (a partir do diretório backend):
+    python -m app.index_rebuild --check
+    python -m app.index_rebuild --rebuild [--workers 4] [--chunk-size 2000]
+    python -m app.index_rebuild --compact
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+import faiss
+import numpy as np
+from sqlalchemy import update
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import (
+    EMBEDDING_DIMENSION,
+    FAISS_COMPACT_TOMBSTONE_RATIO,
+    FAISS_REBUILD_CHUNK_SIZE,
+    FAISS_REBUILD_WORKERS,
+)
+from app.models import User
+from app.encryption import encryption_manager
+
+# Nome fixo: sob "python -m app.index_rebuild" o __name__ é "__main__", fora do
+# logger "app" configurado por setup_logging
+logger = logging.getLogger("app.index_rebuild")
+
+# Uma reconstrução ou compactação por vez (cada uma troca o índice inteiro)
+_rebuild_lock = threading.Lock()
+
+
+def decode_chunk(
+    chunk: Tuple[List[int], List[bytes]]
+) -> Tuple[List[int], np.ndarray, List[int]]:
+    """Descriptografa e normaliza um bloco de embeddings (executa no pool)"""
+    user_ids, blobs = chunk
+    try:
+        embeddings = encryption_manager.decrypt_embeddings(blobs)
+        valid_ids, failed_ids = list(user_ids), []
+    except Exception:
+        # Algum registro inválido no bloco: decodificar um a um para isolá-lo
+        rows, valid_ids, failed_ids = [], [], []
+        for user_id, blob in zip(user_ids, blobs):
+            try:
+                rows.append(encryption_manager.decrypt_embedding(blob))
+                valid_ids.append(user_id)
+            except Exception:
+                failed_ids.append(user_id)
+        embeddings = (
+            np.vstack(rows)
+            if rows
+            else np.empty((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        )
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return valid_ids, np.ascontiguousarray(embeddings / norms, dtype=np.float32), failed_ids
+
+
+def iter_active_user_chunks(
+    session_factory, chunk_size: int
+) -> Iterator[Tuple[List[int], List[bytes]]]:
+    """Lê usuários ativos em blocos paginados por id (uma sessão curta por bloco)"""
+    last_id = 0
+    while True:
+        db = session_factory()
+        try:
+            rows = (
+                db.query(User.id, User.embedding_hash)
+                .filter(User.is_active == True, User.id > last_id)
+                .order_by(User.id)
+                .limit(chunk_size)
+                .all()
+            )
+        finally:
+            db.close()
+
+        if not rows:
+            break
+
+        last_id = rows[-1][0]
+        yield [row[0] for row in rows], [row[1] for row in rows]
+
+        if len(rows) < chunk_size:
+            break
+
+
+def build_index_from_db(
+    session_factory,
+    chunk_size: int = FAISS_REBUILD_CHUNK_SIZE,
+    workers: int = FAISS_REBUILD_WORKERS,
+):
+    """Monta um novo índice FAISS e mapeamento a partir do banco em uma passada
+
+    A leitura do banco acontece no processo principal enquanto o pool
+    descriptografa os blocos anteriores; no máximo ``2 * workers`` blocos ficam
+    pendentes, o que limita a memória usada. Os workers são iniciados com
+    "spawn": um fork do processo da API (threads do onnxruntime, OpenMP,
+    logging) pode travar os filhos.
+    """
+    index = faiss.IndexFlatIP(EMBEDDING_DIMENSION)
+    id_to_user = {}
+    failed_users = []
+
+    def consume(result):
+        user_ids, embeddings, failed_ids = result
+        start = index.ntotal
+        if len(user_ids):
+            index.add(embeddings)
+        for offset, user_id in enumerate(user_ids):
+            id_to_user[start + offset] = user_id
+        failed_users.extend(failed_ids)
+
+    chunks = iter_active_user_chunks(session_factory, chunk_size)
+
+    if workers <= 1:
+        for chunk in chunks:
+            consume(decode_chunk(chunk))
+    else:
+        # Resultados consumidos na ordem de submissão para IDs determinísticos
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(decode_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    consume(pending.popleft().result())
+            while pending:
+                consume(pending.popleft().result())
+
+    return index, id_to_user, failed_users
+
+
+def update_faiss_ids(
+    session_factory,
+    user_to_faiss: Dict[int, Tuple[int, ...]],
+    batch_size: int = 5000,
+):
+    """Grava no banco os faiss_id renumerados de uma galeria publicada
+
+    ``user_to_faiss`` é o da versão publicada (``snapshot.user_to_faiss``);
+    com vários templates, o banco guarda o mais recente, como no cadastro.
+    Gravado em lotes (UPDATE em massa por chave).
+    """
+    items = [(user_id, ids[-1]) for user_id, ids in user_to_faiss.items()]
+    db = session_factory()
+    try:
+        for start in range(0, len(items), batch_size):
+            batch = items[start : start + batch_size]
+            db.execute(
+                update(User),
+                [{"id": user_id, "faiss_id": faiss_id} for user_id, faiss_id in batch],
+            )
+            db.commit()
+    finally:
+        db.close()
+
+
+def deactivate_failed_users(session_factory, user_ids: List[int]):
+    """Desativa usuários cujo embedding não pôde ser lido (fora da galeria)"""
+    from app.user_cache import user_cache
+
+    db = session_factory()
+    try:
+        for start in range(0, len(user_ids), 500):
+            db.query(User).filter(User.id.in_(user_ids[start : start + 500])).update(
+                {User.is_active: False}, synchronize_session=False
+            )
+        db.commit()
+    finally:
+        db.close()
+    for user_id in user_ids:
+        user_cache.set_active(user_id, False)
+
+
+def rebuild_index(
+    face_recognition,
+    session_factory,
+    chunk_size: int = FAISS_REBUILD_CHUNK_SIZE,
+    workers: int = FAISS_REBUILD_WORKERS,
+    deactivate_failed: bool = False,
+) -> dict:
+    """Reconstrói o índice FAISS do sistema a partir dos usuários ativos no banco
+
+    Cadastros e remoções feitos durante a montagem são reaplicados na troca
+    do índice (``replace_index(..., since=...)``). Usuários com embedding
+    ilegível ficam fora da galeria; com ``deactivate_failed`` também são
+    desativados no banco (senão continuam em ``missing_in_index`` na
+    verificação de consistência).
+    """
+    with _rebuild_lock:
+        started = time.perf_counter()
+        since = face_recognition.snapshot
+        index, id_to_user, failed_users = build_index_from_db(
+            session_factory, chunk_size=chunk_size, workers=workers
+        )
+        published = face_recognition.replace_index(index, id_to_user, since=since)
+        update_faiss_ids(session_factory, published.user_to_faiss)
+        indexed = len(published.id_to_user)
+        if failed_users and deactivate_failed:
+            deactivate_failed_users(session_factory, failed_users)
+        elapsed = time.perf_counter() - started
+
+    logger.info(
+        "✅ Índice FAISS reconstruído: %s embeddings em %.1fs (%s falhas)",
+        indexed,
+        elapsed,
+        len(failed_users),
+    )
+    if failed_users and not deactivate_failed:
+        logger.warning(
+            "⚠️  %s usuários ativos com embedding ilegível ficaram fora do índice "
+            "(use deactivate_failed para desativá-los): %s",
+            len(failed_users),
+            failed_users[:20],
+        )
+    return {
+        "indexed_users": indexed,
+        "failed_users": failed_users,
+        "failed_users_deactivated": bool(failed_users) and deactivate_failed,
+        "elapsed_seconds": round(elapsed, 3),
+        "users_per_second": round(indexed / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def compact_index(
+    face_recognition,
+    session_factory,
+    min_tombstone_ratio: float = FAISS_COMPACT_TOMBSTONE_RATIO,
+) -> dict:
+    """Remonta o índice só com os vetores ativos, descartando os tombstones
+
+    Os vetores vêm da própria galeria (sem ler nem descriptografar o banco) e
+    a troca usa ``replace_index(..., since=...)``, como na reconstrução; os
+    ``faiss_id`` renumerados são gravados no banco. Só compacta se os
+    tombstones forem ao menos ``min_tombstone_ratio`` do índice, e não espera
+    se já houver uma reconstrução em andamento.
+    """
+    snapshot = face_recognition.snapshot
+    total = snapshot.index.ntotal if snapshot.index is not None else 0
+    tombstones = total - len(snapshot.id_to_user)
+    if tombstones <= 0 or tombstones < total * min_tombstone_ratio:
+        return {"compacted": False, "index_total": total, "tombstones": tombstones}
+    if not _rebuild_lock.acquire(blocking=False):
+        return {"compacted": False, "reason": "reconstrução em andamento"}
+
+    try:
+        started = time.perf_counter()
+        since = face_recognition.snapshot
+        total = since.index.ntotal
+        faiss_ids = np.array(sorted(since.id_to_user), dtype=np.int64)
+        index = faiss.IndexFlatIP(EMBEDDING_DIMENSION)
+        if len(faiss_ids):
+            index.add(
+                np.ascontiguousarray(
+                    face_recognition.get_vectors(faiss_ids, since), dtype=np.float32
+                )
+            )
+        id_to_user = {
+            new_id: since.id_to_user[int(old_id)]
+            for new_id, old_id in enumerate(faiss_ids)
+        }
+        published = face_recognition.replace_index(index, id_to_user, since=since)
+        update_faiss_ids(session_factory, published.user_to_faiss)
+        elapsed = time.perf_counter() - started
+    finally:
+        _rebuild_lock.release()
+
+    removed = total - len(faiss_ids)
+    logger.info(
+        "Índice FAISS compactado: %s tombstones descartados em %.1fs", removed, elapsed
+    )
+    return {
+        "compacted": True,
+        "removed_tombstones": removed,
+        "index_total": len(published.id_to_user),
+        "elapsed_seconds": round(elapsed, 3),
+    }
+
+
+def check_consistency(face_recognition, db) -> dict:
+    """Compara usuários ativos no banco com o índice FAISS e o mapeamento de IDs"""
+    active = dict(
+        db.query(User.id, User.faiss_id).filter(User.is_active == True).all()
+    )
+    # Índice e mapeamento da mesma versão da galeria
+    snapshot = face_recognition.snapshot
+    id_to_user = snapshot.id_to_user
+    ntotal = snapshot.index.ntotal if snapshot.index is not None else 0
+
+    # Usuários ativos sem entrada correspondente no índice
+    missing_in_index = sorted(
+        user_id
+        for user_id, faiss_id in active.items()
+        if id_to_user.get(faiss_id) != user_id
+    )
+    # Entradas do índice que apontam para usuários inativos ou inexistentes
+    orphaned_entries = sorted(
+        faiss_id for faiss_id, user_id in id_to_user.items() if user_id not in active
+    )
+    # Entradas do mapeamento além do tamanho do índice
+    dangling_entries = sorted(faiss_id for faiss_id in id_to_user if faiss_id >= ntotal)
+    # Usuários ativos mapeados por mais de uma entrada
+    seen, duplicated_users = set(), set()
+    for user_id in id_to_user.values():
+        if user_id in seen:
+            duplicated_users.add(user_id)
+        seen.add(user_id)
+
+    return {
+        "consistent": not (
+            missing_in_index or orphaned_entries or dangling_entries or duplicated_users
+        ),
+        "active_users": len(active),
+        "index_total": ntotal,
+        "mapped_entries": len(id_to_user),
+        "tombstones": ntotal - len(id_to_user),
+        "missing_in_index": missing_in_index,
+        "orphaned_entries": orphaned_entries,
+        "dangling_entries": dangling_entries,
+        "duplicated_users": sorted(duplicated_users),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Verifica ou reconstrói o índice FAISS a partir do banco"
+    )
+    parser.add_argument("--check", action="store_true", help="Apenas verificar consistência")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruir o índice")
+    parser.add_argument(
+        "--compact", action="store_true", help="Descartar tombstones do índice"
+    )
+    parser.add_argument("--workers", type=int, default=FAISS_REBUILD_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=FAISS_REBUILD_CHUNK_SIZE)
+    parser.add_argument(
+        "--deactivate-failed",
+        action="store_true",
+        help="Desativar usuários cujo embedding não pôde ser lido",
+    )
+    args = parser.parse_args()
+
+    from app.logging_setup import setup_logging
+
+    setup_logging()
+
+    from app.database import SessionLocal, init_database
+    from app.face_recognition import face_recognition
+
+    init_database()
+
+    if args.rebuild:
+        result = rebuild_index(
+            face_recognition,
+            SessionLocal,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            deactivate_failed=args.deactivate_failed,
+        )
+        print(json.dumps(result, indent=2))
+    elif args.compact:
+        result = compact_index(face_recognition, SessionLocal, min_tombstone_ratio=0.0)
+        print(json.dumps(result, indent=2))
+
+    db = SessionLocal()
+    try:
+        report = check_consistency(face_recognition, db)
+    finally:
+        db.close()
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["consistent"] else 1)
+
+
+if __name__ == "__main__":
+    main()
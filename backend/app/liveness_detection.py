@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 from typing import List, Tuple
+import logging
 import sys
 import os
 
@@ -17,6 +18,8 @@ from config import (
     EYE_ASPECT_RATIO_THRESHOLD,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class LivenessDetector:
     def __init__(self):
@@ -121,16 +124,14 @@ class AdvancedLivenessDetector:
         landmarks: np.ndarray = None,
     ) -> bool:
         """Adiciona frame com análise de textura e detecção de piscadas"""
-        print(
-            f"DEBUG LIVENESS: Adicionando frame - Histórico atual: {len(self.frame_history)}"
-        )
+        logger.debug("Adicionando frame - Histórico atual: %s", len(self.frame_history))
 
         # Extrair região da face
         x1, y1, x2, y2 = face_bbox.astype(int)
         face_roi = face_image[y1:y2, x1:x2]
 
         if face_roi.size == 0:
-            print("DEBUG LIVENESS: ROI vazio")
+            logger.debug("ROI vazio")
             return False
 
         # Redimensionar para análise consistente
@@ -143,7 +144,7 @@ class AdvancedLivenessDetector:
         self.texture_history.append(texture_score)
         self.frame_history.append(self._normalize_bbox(face_bbox))
 
-        print(f"DEBUG LIVENESS: Textura score: {texture_score:.2f}")
+        logger.debug("Textura score: %.2f", texture_score)
 
         # Detecção de piscadas (se landmarks disponíveis)
         if BLINK_DETECTION_ENABLED and landmarks is not None:
@@ -164,15 +165,15 @@ class AdvancedLivenessDetector:
 
         # Verificar liveness
         if len(self.texture_history) >= LIVENESS_FRAMES_REQUIRED:
-            print(
-                f"DEBUG LIVENESS: Analisando liveness com {len(self.texture_history)} frames"
-            )
+            logger.debug("Analisando liveness com %s frames", len(self.texture_history))
             result = self._analyze_texture_and_movement()
-            print(f"DEBUG LIVENESS: Resultado da análise: {result}")
+            logger.debug("Resultado da análise: %s", result)
             return result
 
-        print(
-            f"DEBUG LIVENESS: Frames insuficientes ({len(self.texture_history)} < {LIVENESS_FRAMES_REQUIRED})"
+        logger.debug(
+            "Frames insuficientes (%s < %s)",
+            len(self.texture_history),
+            LIVENESS_FRAMES_REQUIRED,
         )
         return False
 
@@ -193,10 +194,10 @@ class AdvancedLivenessDetector:
             ):
                 self.blink_count += 1
                 self.blink_detected = True
-                print(f"Piscada detectada! Total: {self.blink_count}")
+                logger.debug("Piscada detectada! Total: %s", self.blink_count)
 
         except Exception as e:
-            print(f"Erro na detecção de piscada: {e}")
+            logger.error("Erro na detecção de piscada: %s", e)
 
     def _normalize_bbox(self, bbox: np.ndarray) -> np.ndarray:
         """Normaliza bbox"""
@@ -291,7 +292,7 @@ class AdvancedLivenessDetector:
             return ear
 
         except Exception as e:
-            print(f"Erro no cálculo de EAR: {e}")
+            logger.error("Erro no cálculo de EAR: %s", e)
             return 0.0
 
     def _calculate_ear(self, eye_points: np.ndarray) -> float:
@@ -313,7 +314,7 @@ class AdvancedLivenessDetector:
             return ear
 
         except Exception as e:
-            print(f"Erro no cálculo de EAR individual: {e}")
+            logger.error("Erro no cálculo de EAR individual: %s", e)
             return 0.0
 
     def reset(self):
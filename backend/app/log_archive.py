@@ -0,0 +1,207 @@
+import gzip
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import sys
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import (
+    LOG_ARCHIVE_DIR,
+    LOG_RETENTION_DAYS,
+    LOG_ARCHIVE_INTERVAL_SECONDS,
+    LOG_ARCHIVE_BATCH_SIZE,
+)
+from app.models import AccessLog, User
+from app.log_queries import serialize_log, to_naive_utc
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "access_logs_"
+SEGMENT_SUFFIX = ".ndjson.gz"
+
+
+class AccessLogArchiver:
+    """Move logs antigos da tabela access_logs para segmentos diários compactados
+
+    Cada dia tem um arquivo ``access_logs_AAAA-MM-DD.ndjson.gz`` somente-anexo: a
+    cada execução um novo membro gzip é anexado ao final do arquivo, o que mantém
+    os dados já gravados intactos e continua legível por ``gzip.open``.
+    """
+
+    def __init__(
+        self,
+        archive_dir: Path = LOG_ARCHIVE_DIR,
+        retention_days: int = LOG_RETENTION_DAYS,
+        batch_size: int = LOG_ARCHIVE_BATCH_SIZE,
+    ):
+        self.archive_dir = Path(archive_dir)
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.last_run = None
+
+    def segment_path(self, day: date) -> Path:
+        """Caminho do segmento de um dia"""
+        return self.archive_dir / f"{SEGMENT_PREFIX}{day.isoformat()}{SEGMENT_SUFFIX}"
+
+    def _append_segment(self, day: date, logs: List[dict]):
+        """Anexa logs de um dia ao segmento correspondente (novo membro gzip)"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        payload = "".join(json.dumps(log, ensure_ascii=False) + "\n" for log in logs)
+
+        with open(self.segment_path(day), "ab") as f:
+            f.write(gzip.compress(payload.encode("utf-8")))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def archive_old_logs(self, session_factory, now: Optional[datetime] = None) -> dict:
+        """Arquiva e remove da tabela os logs mais antigos que o período de retenção"""
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.retention_days)
+        archived = 0
+        segments = set()
+
+        with self._lock:
+            while True:
+                db = session_factory()
+                try:
+                    rows = (
+                        db.query(AccessLog, User.name)
+                        .outerjoin(User, User.id == AccessLog.user_id)
+                        .filter(AccessLog.timestamp < cutoff)
+                        .order_by(AccessLog.timestamp.asc(), AccessLog.id.asc())
+                        .limit(self.batch_size)
+                        .all()
+                    )
+                    if not rows:
+                        break
+
+                    by_day = defaultdict(list)
+                    for log, user_name in rows:
+                        by_day[log.timestamp.date()].append(
+                            serialize_log(log, user_name)
+                        )
+
+                    # Gravar (com fsync) antes de remover do banco: uma falha
+                    # entre as duas etapas só pode duplicar, nunca perder, logs
+                    for day, logs in by_day.items():
+                        self._append_segment(day, logs)
+                        segments.add(day)
+
+                    ids = [log.id for log, _ in rows]
+                    db.query(AccessLog).filter(AccessLog.id.in_(ids)).delete(
+                        synchronize_session=False
+                    )
+                    db.commit()
+                    archived += len(rows)
+                finally:
+                    db.close()
+
+                if len(rows) < self.batch_size:
+                    break
+
+        self.last_run = now
+        return {
+            "archived_logs": archived,
+            "segments": sorted(day.isoformat() for day in segments),
+            "cutoff": cutoff.isoformat(),
+        }
+
+    def list_segments(self) -> List[dict]:
+        """Lista segmentos arquivados em ordem cronológica"""
+        if not self.archive_dir.exists():
+            return []
+
+        segments = []
+        for path in sorted(self.archive_dir.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")):
+            day = path.name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)]
+            segments.append(
+                {"date": day, "file": path.name, "size_bytes": path.stat().st_size}
+            )
+        return segments
+
+    def iter_archived_logs(
+        self,
+        user_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        access_granted: Optional[bool] = None,
+    ) -> Iterator[dict]:
+        """Lê logs arquivados, abrindo apenas os segmentos do intervalo pedido"""
+        start = to_naive_utc(start)
+        end = to_naive_utc(end)
+
+        for segment in self.list_segments():
+            day = date.fromisoformat(segment["date"])
+            if start is not None and day < start.date():
+                continue
+            if end is not None and day > end.date():
+                continue
+
+            # Ids já emitidos neste segmento (um arquivamento interrompido pode
+            # ter gravado o mesmo log duas vezes)
+            seen_ids = set()
+            with gzip.open(self.archive_dir / segment["file"], "rt", encoding="utf-8") as f:
+                for line in f:
+                    log = json.loads(line)
+                    if log["id"] in seen_ids:
+                        continue
+                    seen_ids.add(log["id"])
+
+                    if user_id is not None and log["user_id"] != user_id:
+                        continue
+                    if access_granted is not None and log["access_granted"] != access_granted:
+                        continue
+                    timestamp = datetime.fromisoformat(log["timestamp"])
+                    if start is not None and timestamp < start:
+                        continue
+                    if end is not None and timestamp >= end:
+                        continue
+                    yield log
+
+    def start(self, session_factory, interval_seconds: int = LOG_ARCHIVE_INTERVAL_SECONDS):
+        """Inicia job periódico de arquivamento em thread de fundo"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    result = self.archive_old_logs(session_factory)
+                    if result["archived_logs"]:
+                        logger.info(
+                            "🗄️  %s logs arquivados em %s segmentos",
+                            result["archived_logs"],
+                            len(result["segments"]),
+                        )
+                except Exception as e:
+                    logger.error("Erro no arquivamento de logs: %s", e)
+                self._stop_event.wait(interval_seconds)
+
+        self._thread = threading.Thread(
+            target=run, name="access-log-archiver", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Interrompe o job de arquivamento"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Instância global do arquivador de logs
+log_archiver = AccessLogArchiver()
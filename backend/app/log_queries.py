@@ -0,0 +1,192 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, literal, or_
+from sqlalchemy.orm import Query, Session
+
+from app.models import AccessLog, User
+
+# Colunas exportadas (ordem usada no CSV)
+LOG_FIELDS = [
+    "id",
+    "user_id",
+    "user_name",
+    "confidence",
+    "access_granted",
+    "liveness_passed",
+    "timestamp",
+    "ip_address",
+    "error_message",
+]
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Converte datetime com timezone para UTC sem tzinfo (formato do banco)"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def encode_cursor(timestamp: datetime, log_id: int) -> str:
+    """Gera cursor opaco a partir da chave (timestamp, id) do último log da página"""
+    raw = f"{timestamp.isoformat()}|{log_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decodifica cursor gerado por encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp_str, log_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp_str), int(log_id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def build_logs_query(
+    db: Session,
+    user_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    access_granted: Optional[bool] = None,
+    with_names: bool = True,
+) -> Query:
+    """Monta consulta de logs aplicando os filtros
+
+    Com ``with_names`` cada linha é ``(AccessLog, nome)`` via join com users;
+    sem ele, ``(AccessLog, None)`` para resolução de nomes pelo chamador.
+    """
+    if with_names:
+        query = db.query(AccessLog, User.name).outerjoin(
+            User, User.id == AccessLog.user_id
+        )
+    else:
+        query = db.query(AccessLog, literal(None))
+
+    if user_id is not None:
+        query = query.filter(AccessLog.user_id == user_id)
+    if start is not None:
+        query = query.filter(AccessLog.timestamp >= to_naive_utc(start))
+    if end is not None:
+        query = query.filter(AccessLog.timestamp < to_naive_utc(end))
+    if access_granted is not None:
+        query = query.filter(AccessLog.access_granted == access_granted)
+
+    return query
+
+
+def apply_cursor(query: Query, cursor: Optional[Tuple[datetime, int]]) -> Query:
+    """Aplica paginação por chave (timestamp, id) em ordem decrescente"""
+    if cursor is not None:
+        timestamp, log_id = cursor
+        query = query.filter(
+            or_(
+                AccessLog.timestamp < timestamp,
+                and_(AccessLog.timestamp == timestamp, AccessLog.id < log_id),
+            )
+        )
+    return query.order_by(AccessLog.timestamp.desc(), AccessLog.id.desc())
+
+
+def serialize_log(log: AccessLog, user_name: Optional[str]) -> dict:
+    """Converte log em dicionário serializável"""
+    return {
+        "id": log.id,
+        "user_id": log.user_id,
+        "user_name": user_name,
+        "confidence": log.confidence,
+        "access_granted": log.access_granted,
+        "liveness_passed": log.liveness_passed,
+        "timestamp": log.timestamp.isoformat(),
+        "ip_address": log.ip_address,
+        "error_message": log.error_message,
+    }
+
+
+def fetch_logs_page(
+    db: Session,
+    limit: int,
+    cursor: Optional[str] = None,
+    name_resolver: Optional[Callable[[Iterable[int]], Dict[int, str]]] = None,
+    **filters,
+) -> Tuple[List[dict], Optional[str]]:
+    """Retorna uma página de logs e o cursor da próxima página (ou None)
+
+    ``name_resolver`` recebe os user_ids da página e devolve ``{id: nome}``
+    (ex.: cache de usuários); sem ele os nomes vêm de um join com users.
+    """
+    decoded = decode_cursor(cursor) if cursor else None
+    query = apply_cursor(
+        build_logs_query(db, with_names=name_resolver is None, **filters), decoded
+    )
+
+    # Buscar um registro a mais para saber se existe próxima página
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        last_log = rows[-1][0]
+        next_cursor = encode_cursor(last_log.timestamp, last_log.id)
+
+    if name_resolver is not None:
+        names = name_resolver(log.user_id for log, _ in rows if log.user_id is not None)
+        rows = [(log, names.get(log.user_id)) for log, _ in rows]
+
+    return [serialize_log(log, user_name) for log, user_name in rows], next_cursor
+
+
+def iter_logs(session_factory, chunk_size: int = 1000, **filters) -> Iterator[dict]:
+    """Itera sobre todos os logs filtrados em blocos paginados por chave
+
+    Cada bloco usa uma sessão curta própria, de forma que a exportação não mantém
+    uma transação de leitura aberta (o que bloquearia escritas no SQLite) e usa
+    memória constante independentemente do volume exportado.
+    """
+    cursor = None
+    while True:
+        db = session_factory()
+        try:
+            query = apply_cursor(build_logs_query(db, **filters), cursor)
+            rows = query.limit(chunk_size).all()
+            chunk = [serialize_log(log, user_name) for log, user_name in rows]
+            if rows:
+                last_log = rows[-1][0]
+                cursor = (last_log.timestamp, last_log.id)
+        finally:
+            db.close()
+
+        yield from chunk
+
+        if len(rows) < chunk_size:
+            break
+
+
+def iter_ndjson(logs: Iterator[dict]) -> Iterator[str]:
+    """Serializa logs como NDJSON (um objeto JSON por linha)"""
+    for log in logs:
+        yield json.dumps(log, ensure_ascii=False) + "\n"
+
+
+def iter_csv(logs: Iterator[dict], rows_per_chunk: int = 500) -> Iterator[str]:
+    """Serializa logs como CSV, emitindo o cabeçalho e blocos de linhas"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=LOG_FIELDS)
+    writer.writeheader()
+
+    pending = 0
+    for log in logs:
+        writer.writerow(log)
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+
+    yield buffer.getvalue()
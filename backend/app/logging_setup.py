@@ -0,0 +1,87 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import os
+from typing import Optional
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro (para coletores de log)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta registros com a fila cheia em vez de bloquear"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(
+    level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None
+) -> logging.Logger:
+    """Configura os loggers da aplicação (idempotente)
+
+    Os registros são enfileirados pelo thread da requisição e escritos em
+    stdout por um thread separado (QueueListener), então a escrita no driver
+    de logs do Docker não bloqueia o processamento dos frames.
+    """
+    global _listener
+
+    app_logger = logging.getLogger("app")
+    if _listener is not None:
+        return app_logger
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(
+        JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+
+    app_logger.handlers[:] = [DroppingQueueHandler(log_queue)]
+    app_logger.setLevel(level.upper())
+    app_logger.propagate = False
+
+    atexit.register(stop_logging)
+    return app_logger
+
+
+def stop_logging():
+    """Esvazia a fila de logs e encerra o thread de escrita"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
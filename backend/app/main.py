@@ -1,15 +1,30 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Request
+from fastapi import (
+    FastAPI,
+    Depends,
+    HTTPException,
+    UploadFile,
+    File,
+    Form,
+    Header,
+    Query,
+    Request,
+)
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import List, Optional
 import cv2
 import numpy as np
 import base64
 import io
 from PIL import Image
 import json
+import logging
+import secrets
+import time
 from datetime import datetime
 
 import sys
@@ -25,19 +40,145 @@ sys.path.insert(0, project_root)
 backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, backend_root)
 
+# Configurar logging antes dos demais módulos (que já registram na importação)
+from .logging_setup import setup_logging
+
+setup_logging()
+
 # Imports locais - usar imports relativos (funciona tanto no Docker quanto localmente)
-from .database import get_db, init_database
+from .database import get_db, init_database, SessionLocal
 from .models import User, AccessLog
-from .face_recognition import face_recognition
+from .face_recognition import face_recognition, GalleryReplacedError
 from .liveness_detection import advanced_liveness_detector
 from .encryption import encryption_manager
-from config import API_TITLE, API_VERSION, MAX_FILE_SIZE, ALLOWED_EXTENSIONS
+from .image_utils import decode_base64_payload, bytes_to_bgr
+from .log_queries import fetch_logs_page, iter_logs, iter_ndjson, iter_csv
+from .log_archive import log_archiver
+from .user_cache import user_cache
+from .index_rebuild import rebuild_index, check_consistency, compact_index
+from .duplicates import find_enrollment_duplicate
+from . import metrics
+from .metrics import stage
+from .admission import inference_queue, AdmissionRejected, client_address
+from .pipeline import (
+    recognize_image,
+    verify_image,
+    is_access_granted,
+    register_passage,
+)
+from .streams import stream_manager, parse_stream_sources
+from .sharding import ShardedGallery
+from .hot_tier import hot_tier
+from .groups import group_galleries, UnknownGateError
+from .bulk_users import deactivate_users, reactivate_users, delete_users
+from .profiling import (
+    ProfilerBusyError,
+    sampling_profiler,
+    request_profiler,
+    memory_tracker,
+)
+from config import (
+    API_TITLE,
+    API_VERSION,
+    MAX_FILE_SIZE,
+    ALLOWED_EXTENSIONS,
+    LOGS_PAGE_DEFAULT_LIMIT,
+    LOGS_PAGE_MAX_LIMIT,
+    LOGS_EXPORT_CHUNK_SIZE,
+    LOG_ARCHIVE_ENABLED,
+    FAISS_REBUILD_ON_START,
+    SERVER_TIMING_ENABLED,
+    SERVER_TIMING_HEADER,
+    PROFILING_ENABLED,
+    ADMIN_TOKEN,
+    ADMISSION_CLIENT_HEADER,
+    STREAM_SOURCES,
+    STREAM_DEFAULT_FPS,
+    MULTI_FACE_LOG_EACH,
+    GALLERY_SHARDS,
+    GALLERY_SHARD_ADDRESSES,
+    HOT_TIER_SIZE,
+    EMBEDDING_DIMENSION,
+    SEARCH_MAX_K,
+    SEARCH_MAX_QUERIES,
+    DUPLICATE_ENROLLMENT_POLICY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicia e encerra os jobs de fundo da aplicação"""
+    db = SessionLocal()
+    try:
+        if FAISS_REBUILD_ON_START == "always":
+            rebuild_index(face_recognition, SessionLocal)
+        elif FAISS_REBUILD_ON_START == "auto":
+            report = check_consistency(face_recognition, db)
+            if report["missing_in_index"]:
+                logger.warning(
+                    "⚠️  %s usuários ativos ausentes do índice FAISS, reconstruindo...",
+                    len(report["missing_in_index"]),
+                )
+                rebuild_index(face_recognition, SessionLocal)
+        compact_index(face_recognition, SessionLocal)
+    except Exception as e:
+        logger.error("Erro ao verificar/reconstruir índice FAISS: %s", e)
+
+    try:
+        cached_users = user_cache.warm(db)
+        logger.info("Cache de usuários aquecido: %s usuários", cached_users)
+    except Exception as e:
+        logger.error("Erro ao aquecer cache de usuários: %s", e)
+
+    try:
+        group_galleries.load(db, face_recognition)
+        face_recognition.attach_groups(group_galleries)
+    except Exception as e:
+        logger.error("Erro ao carregar galerias por grupo: %s", e)
+    finally:
+        db.close()
+
+    metrics.bind_recognition_gauges(face_recognition)
+
+    try:
+        if GALLERY_SHARD_ADDRESSES:
+            face_recognition.attach_shards(
+                ShardedGallery.remote(GALLERY_SHARD_ADDRESSES.split(","))
+            )
+        elif GALLERY_SHARDS > 0:
+            face_recognition.attach_shards(ShardedGallery.local(GALLERY_SHARDS))
+    except Exception as e:
+        logger.error("Erro ao iniciar galeria particionada: %s", e)
+
+    if HOT_TIER_SIZE > 0:
+        face_recognition.attach_hot_tier(hot_tier)
+        hot_tier.start(SessionLocal, face_recognition)
+
+    inference_queue.start()
+    if LOG_ARCHIVE_ENABLED:
+        log_archiver.start(SessionLocal)
+    for stream_id, source in parse_stream_sources(STREAM_SOURCES).items():
+        try:
+            stream_manager.add(stream_id, source, SessionLocal)
+        except Exception as e:
+            logger.error("Erro ao iniciar stream %s: %s", stream_id, e)
+    yield
+    stream_manager.stop_all()
+    log_archiver.stop()
+    inference_queue.stop()
+    hot_tier.stop()
+    face_recognition.detach_hot_tier()
+    face_recognition.detach_shards()
+
 
 # Inicializar FastAPI
 app = FastAPI(
     title=API_TITLE,
     version=API_VERSION,
     description="Sistema de Reconhecimento Facial para Controle de Acesso",
+    lifespan=lifespan,
 )
 
 # Configurar CORS
@@ -47,12 +188,71 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Endpoints que podem detalhar o tempo por etapa (Server-Timing / "timings")
+TIMED_ENDPOINTS = {"/api/validate", "/api/verify", "/api/register"}
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Contagem e latência por endpoint e, sob demanda, Server-Timing por etapa"""
+    started = time.perf_counter()
+    timings = None
+    if request.url.path in TIMED_ENDPOINTS and (
+        SERVER_TIMING_ENABLED or request.headers.get(SERVER_TIMING_HEADER) == "1"
+    ):
+        timings = metrics.start_request_timings()
+
+    # cProfile das próximas N requisições (armado via /api/admin/profile/requests)
+    profiling = (
+        request_profiler.armed
+        and not request.url.path.startswith("/api/admin/")
+        and request_profiler.try_begin()
+    )
+
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if timings is not None:
+            response.headers["Server-Timing"] = metrics.format_server_timing(
+                timings, time.perf_counter() - started
+            )
+            response.headers["Timing-Allow-Origin"] = "*"
+        return response
+    finally:
+        if profiling:
+            request_profiler.end()
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        metrics.observe_request(
+            request.method, endpoint, status, time.perf_counter() - started
+        )
+
+
+def with_timings(body: dict) -> dict:
+    """Inclui o detalhamento por etapa na resposta, se estiver sendo coletado"""
+    timings = metrics.current_timings()
+    if timings is not None:
+        body["timings"] = timings
+    return body
+
+
 # Inicializar banco de dados
 init_database()
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas no formato de exposição do Prometheus"""
+    if not metrics.METRICS_ACTIVE:
+        raise HTTPException(status_code=503, detail="Métricas desabilitadas")
+    content, content_type = metrics.render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
 @app.get("/")
 async def root():
     """API Root - Frontend agora é servido pelo Next.js"""
@@ -64,24 +264,28 @@ async def register_user(
     name: str = Form(...),
     email: str = Form(...),
     photo: UploadFile = File(...),
+    groups: Optional[str] = Form(None),
     db: Session = Depends(get_db),
 ):
-    """Cadastra novo usuário"""
+    """Cadastra novo usuário (``groups``: grupos separados por vírgula)"""
     try:
-        print(
-            f"DEBUG: Recebido cadastro - Nome: {name}, Email: {email}, Arquivo: {photo.filename}"
+        logger.debug(
+            "Recebido cadastro - Nome: %s, Email: %s, Arquivo: %s",
+            name,
+            email,
+            photo.filename,
         )
 
         # Validar arquivo
         if not photo.filename:
-            print("DEBUG: Erro - Arquivo não fornecido")
+            logger.debug("Erro - Arquivo não fornecido")
             raise HTTPException(status_code=400, detail="Arquivo não fornecido")
 
         # Verificar extensão
         file_ext = "." + photo.filename.split(".")[-1].lower()
-        print(f"DEBUG: Extensão do arquivo: {file_ext}")
+        logger.debug("Extensão do arquivo: %s", file_ext)
         if file_ext not in ALLOWED_EXTENSIONS:
-            print(f"DEBUG: Erro - Formato não suportado: {file_ext}")
+            logger.debug("Erro - Formato não suportado: %s", file_ext)
             raise HTTPException(
                 status_code=400, detail="Formato de arquivo não suportado"
             )
@@ -92,34 +296,53 @@ async def register_user(
             raise HTTPException(status_code=400, detail="Arquivo muito grande")
 
         # Converter para imagem OpenCV
-        image = Image.open(io.BytesIO(content))
-        image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        with stage("decode"):
+            image_cv = bytes_to_bgr(content, max_size=None)
 
         # Extrair embedding
-        print("DEBUG: Extraindo embedding...")
+        logger.debug("Extraindo embedding...")
         embedding = face_recognition.extract_embedding(image_cv)
         if embedding is None:
-            print("DEBUG: Erro - Nenhuma face detectada")
+            logger.debug("Erro - Nenhuma face detectada")
             raise HTTPException(
                 status_code=400, detail="Nenhuma face detectada na imagem"
             )
-        print(f"DEBUG: Embedding extraído com sucesso - Dimensão: {embedding.shape}")
+        logger.debug("Embedding extraído com sucesso - Dimensão: %s", embedding.shape)
 
         # Verificar se email já existe
-        print("DEBUG: Verificando se email já existe...")
+        logger.debug("Verificando se email já existe...")
         existing_user = db.query(User).filter(User.email == email).first()
         if existing_user:
-            print("DEBUG: Erro - Email já cadastrado")
+            logger.debug("Erro - Email já cadastrado")
             raise HTTPException(status_code=400, detail="Email já cadastrado")
-        print("DEBUG: Email disponível")
+        logger.debug("Email disponível")
+
+        # Verificar se a mesma face já está cadastrada com outro usuário
+        duplicate = None
+        if DUPLICATE_ENROLLMENT_POLICY in ("warn", "reject"):
+            with stage("duplicate_check"):
+                duplicate = find_enrollment_duplicate(face_recognition, embedding)
+        if duplicate is not None:
+            duplicate_id, similarity = duplicate
+            if DUPLICATE_ENROLLMENT_POLICY == "reject":
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Face já cadastrada para o usuário {duplicate_id}",
+                )
+            logger.warning(
+                "Possível cadastro duplicado: %s parece com o usuário %s (%.3f)",
+                email,
+                duplicate_id,
+                similarity,
+            )
 
         # Criptografar embedding
-        print("DEBUG: Criptografando embedding...")
+        logger.debug("Criptografando embedding...")
         encrypted_embedding = encryption_manager.encrypt_embedding(embedding)
-        print("DEBUG: Embedding criptografado com sucesso")
+        logger.debug("Embedding criptografado com sucesso")
 
         # Criar usuário no banco
-        print("DEBUG: Criando usuário no banco...")
+        logger.debug("Criando usuário no banco...")
         user = User(
             name=name,
             email=email,
@@ -128,25 +351,43 @@ async def register_user(
         )
 
         db.add(user)
-        db.commit()
-        db.refresh(user)
-        print(f"DEBUG: Usuário criado com ID: {user.id}")
+        with stage("db_write"):
+            db.commit()
+            db.refresh(user)
+        logger.debug("Usuário criado com ID: %s", user.id)
 
         # Adicionar embedding ao índice FAISS
-        print("DEBUG: Adicionando embedding ao FAISS...")
-        faiss_id = face_recognition.add_user_embedding(embedding, user.id)
-        print(f"DEBUG: Embedding adicionado ao FAISS com ID: {faiss_id}")
+        logger.debug("Adicionando embedding ao FAISS...")
+        with stage("index_add"):
+            faiss_id = face_recognition.add_user_embedding(embedding, user.id)
+        logger.debug("Embedding adicionado ao FAISS com ID: %s", faiss_id)
 
         # Atualizar faiss_id no banco
         user.faiss_id = faiss_id
-        db.commit()
-        print("DEBUG: FAISS ID atualizado no banco")
+        with stage("db_write"):
+            db.commit()
+        logger.debug("FAISS ID atualizado no banco")
 
-        return {
+        user_cache.put(user.id, user.name, True, user.passage_count)
+
+        if groups:
+            groups = group_galleries.set_user_groups(
+                db, face_recognition, user.id, groups.split(",")
+            )
+
+        response = {
             "success": True,
             "message": "Usuário cadastrado com sucesso!",
             "user_id": user.id,
         }
+        if groups:
+            response["groups"] = groups
+        if duplicate is not None:
+            response["possible_duplicate"] = {
+                "user_id": duplicate[0],
+                "similarity": round(duplicate[1], 4),
+            }
+        return with_timings(response)
 
     except HTTPException:
         raise
@@ -154,6 +395,103 @@ async def register_user(
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 
+def decode_frame(image_data: str) -> np.ndarray:
+    """Decodifica o frame base64 enviado pelo cliente (400 se inválido)"""
+    with stage("decode"):
+        # Decodificar imagem base64 de forma mais eficiente
+        try:
+            image_bytes = decode_base64_payload(image_data)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail="Formato de imagem inválido")
+
+        # Converter para imagem OpenCV de forma otimizada
+        try:
+            image_cv = bytes_to_bgr(image_bytes)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail="Erro ao processar imagem")
+
+    return image_cv
+
+
+def recognize_frame(
+    image_data: str, multi_face: bool = False, group: Optional[str] = None
+) -> dict:
+    """Decodifica o frame, detecta faces e reconhece a melhor (ou todas)
+
+    Executa nos threads da fila de inferência (controle de admissão).
+    """
+    return recognize_image(decode_frame(image_data), multi_face=multi_face, group=group)
+
+
+def verify_frame(image_data: str, user_id: int) -> dict:
+    """Decodifica o frame e compara a melhor face com os templates do usuário"""
+    return verify_image(decode_frame(image_data), user_id)
+
+
+def admission_client_key(request: Request) -> str:
+    """Chave do cliente na fila de inferência (IP e, se houver, X-Client-Id)
+
+    Atrás de um proxy confiável (ADMISSION_TRUSTED_PROXIES) o IP vem de
+    X-Real-IP / X-Forwarded-For.
+    """
+    peer = request.client.host if request.client is not None else None
+    client_key = client_address(peer, request.headers)
+    client_id = request.headers.get(ADMISSION_CLIENT_HEADER)
+    if client_id:
+        client_key = f"{client_key}|{client_id}"
+    return client_key
+
+
+async def submit_inference(request: Request, func, *args) -> dict:
+    """Executa ``func`` na fila de inferência, convertendo recusas em HTTP"""
+    try:
+        return await inference_queue.submit(admission_client_key(request), func, *args)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+def resolve_access(
+    db: Session, user_id: Optional[int], distance: float, liveness_passed: bool
+) -> dict:
+    """Decisão de acesso de uma face, contando a passagem se liberado"""
+    access_granted = is_access_granted(user_id, distance, liveness_passed)
+    decision = {
+        "access_granted": bool(access_granted),
+        "liveness_passed": bool(liveness_passed),
+        "confidence": float(1.0 - distance) if user_id else 0.0,
+        "user_id": int(user_id) if user_id else None,
+        "user_name": None,
+    }
+
+    # Processar acesso concedido
+    if access_granted:
+        try:
+            updated = register_passage(db, user_id)
+            if updated:
+                user_name, passage_count = updated
+                decision["message"] = f"Acesso liberado para {user_name}!"
+                decision["user_name"] = user_name
+                decision["passage_count"] = passage_count
+            else:
+                decision["access_granted"] = False
+                decision["message"] = "Usuário não encontrado no banco"
+        except Exception as e:
+            logger.error("Erro ao processar usuário: %s", e)
+            decision["access_granted"] = False
+            decision["message"] = "Erro ao processar acesso"
+    else:
+        if not liveness_passed:
+            decision["message"] = "Falha na verificação de liveness"
+        else:
+            decision["message"] = "Usuário não reconhecido"
+
+    return decision
+
+
 @app.post("/api/validate")
 async def validate_face(request: Request, db: Session = Depends(get_db)):
     """Valida face em tempo real - versão otimizada"""
@@ -161,36 +499,26 @@ async def validate_face(request: Request, db: Session = Depends(get_db)):
         # Obter dados da requisição
         data = await request.json()
         image_data = data.get("image")
+        multi_face = bool(data.get("multi_face", False))
 
         if not image_data:
             raise HTTPException(status_code=400, detail="Imagem não fornecida")
 
-        # Decodificar imagem base64 de forma mais eficiente
+        # Portão ou grupo: busca só entre os usuários que o portão admite
         try:
-            if "," in image_data:
-                image_bytes = base64.b64decode(image_data.split(",")[1])
-            else:
-                image_bytes = base64.b64decode(image_data)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail="Formato de imagem inválido")
-
-        # Converter para imagem OpenCV de forma otimizada
-        try:
-            image = Image.open(io.BytesIO(image_bytes))
-            # Redimensionar se muito grande para melhor performance
-            if image.width > 800 or image.height > 600:
-                image.thumbnail((800, 600), Image.Resampling.LANCZOS)
-            image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail="Erro ao processar imagem")
+            group = group_galleries.resolve(data.get("gate"), data.get("group"))
+        except UnknownGateError as e:
+            raise HTTPException(
+                status_code=400, detail=f"Portão sem grupo configurado: {e.args[0]}"
+            )
 
-        # Detectar faces com timeout implícito
-        try:
-            faces = face_recognition.detect_faces(image_cv)
-        except Exception as e:
-            print(f"Erro na detecção de faces: {e}")
-            faces = []
+        # Inferência na fila limitada; o frame mais novo de um cliente substitui
+        # o que ainda aguarda na fila
+        frame = await submit_inference(
+            request, recognize_frame, image_data, multi_face, group
+        )
 
+        faces = frame["faces"]
         if not faces:
             # Log tentativa sem face detectada (sem commit imediato para performance)
             log = AccessLog(
@@ -202,104 +530,305 @@ async def validate_face(request: Request, db: Session = Depends(get_db)):
             )
             db.add(log)
             # Usar commit assíncrono para não bloquear
-            db.commit()
+            with stage("db_write"):
+                db.commit()
 
-            return {
-                "success": False,
-                "message": "Nenhuma face detectada",
-                "access_granted": False,
-                "liveness_passed": False,
-                "confidence": 0.0,
-                "user_id": None,
-            }
+            return with_timings(
+                {
+                    "success": False,
+                    "message": "Nenhuma face detectada",
+                    "access_granted": False,
+                    "liveness_passed": False,
+                    "confidence": 0.0,
+                    "user_id": None,
+                }
+            )
 
-        # Pegar melhor face (otimizado)
-        best_face = max(faces, key=lambda x: x.get("det_score", 0))
+        best_face = frame["best_face"]
         embedding = best_face.get("embedding")
         bbox = best_face.get("bbox")
 
         if embedding is None:
-            return {
-                "success": False,
-                "message": "Erro ao extrair características faciais",
-                "access_granted": False,
-                "liveness_passed": False,
-                "confidence": 0.0,
-                "user_id": None,
-            }
+            return with_timings(
+                {
+                    "success": False,
+                    "message": "Erro ao extrair características faciais",
+                    "access_granted": False,
+                    "liveness_passed": False,
+                    "confidence": 0.0,
+                    "user_id": None,
+                }
+            )
 
         # Verificar liveness (desabilitado temporariamente para melhor performance)
-        liveness_passed = True
+        with stage("liveness"):
+            liveness_passed = True
+
+        if multi_face:
+            # Uma decisão por face; a mesma pessoa duas vezes no frame conta
+            # uma passagem só (as demais faces reaproveitam a decisão liberada,
+            # cada uma com a própria confiança)
+            counted = {}  # user_id -> decisão da face que contou a passagem
+            matches = []
+            for match in frame["matches"]:
+                user_id, distance = match["user_id"], match["distance"]
+                if user_id in counted and is_access_granted(
+                    user_id, distance, liveness_passed
+                ):
+                    decision = {**counted[user_id], "confidence": float(1.0 - distance)}
+                else:
+                    decision = resolve_access(db, user_id, distance, liveness_passed)
+                    if decision["access_granted"]:
+                        counted[user_id] = decision
+                matches.append((match, decision))
+                if match["face"] is best_face:
+                    best_match = (match, decision)
+
+            response = {"success": True, **best_match[1]}
+            response["faces"] = [
+                {
+                    "bbox": [int(v) for v in match["face"]["bbox"]],
+                    "det_score": float(match["face"]["det_score"]),
+                    **decision,
+                }
+                for match, decision in matches
+            ]
+            logged = matches if MULTI_FACE_LOG_EACH else [best_match]
+        else:
+            user_id, distance = frame["user_id"], frame["distance"]
+            response = {
+                "success": True,
+                **resolve_access(db, user_id, distance, liveness_passed),
+            }
+            logged = [({"user_id": user_id, "distance": distance}, response)]
+        if group is not None:
+            response["group"] = group
 
-        # Reconhecer face com tratamento de erro
+        # Log da tentativa (assíncrono para não bloquear resposta)
         try:
-            user_id, distance = face_recognition.recognize_face(embedding)
+            for match, decision in logged:
+                user_id = match["user_id"]
+                db.add(
+                    AccessLog(
+                        user_id=user_id,
+                        confidence=1.0 - match["distance"] if user_id else None,
+                        access_granted=decision["access_granted"],
+                        liveness_passed=liveness_passed,
+                        ip_address=request.client.host,
+                        user_agent=request.headers.get("user-agent"),
+                    )
+                )
+            with stage("db_write"):
+                db.commit()
         except Exception as e:
-            print(f"Erro no reconhecimento: {e}")
-            user_id, distance = None, 1.0
+            logger.error("Erro ao salvar log: %s", e)
+
+        return with_timings(response)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erro geral na validação: %s", e)
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
 
-        # Determinar se acesso foi concedido
-        access_granted = user_id is not None and liveness_passed and distance < 0.6
+@app.post("/api/verify")
+async def verify_face(request: Request, db: Session = Depends(get_db)):
+    """Verificação 1:1: a face confere com o usuário informado (crachá, QR code)?
 
-        # Preparar resposta básica
+    Compara só com os templates do usuário, sem busca na galeria inteira.
+    """
+    try:
+        data = await request.json()
+        image_data = data.get("image")
+        user_id = data.get("user_id")
+
+        if not image_data:
+            raise HTTPException(status_code=400, detail="Imagem não fornecida")
+        if not isinstance(user_id, int) or isinstance(user_id, bool):
+            raise HTTPException(status_code=400, detail="user_id inválido")
+        if user_id not in face_recognition.user_to_faiss:
+            raise HTTPException(
+                status_code=404, detail="Usuário sem template cadastrado"
+            )
+
+        frame = await submit_inference(request, verify_frame, image_data, user_id)
+
+        if not frame["faces"]:
+            db.add(
+                AccessLog(
+                    access_granted=False,
+                    liveness_passed=False,
+                    ip_address=request.client.host,
+                    user_agent=request.headers.get("user-agent"),
+                    error_message="Nenhuma face detectada",
+                )
+            )
+            with stage("db_write"):
+                db.commit()
+
+            return with_timings(
+                {
+                    "success": False,
+                    "message": "Nenhuma face detectada",
+                    "access_granted": False,
+                    "liveness_passed": False,
+                    "confidence": 0.0,
+                    "user_id": user_id,
+                }
+            )
+
+        # Verificar liveness (desabilitado, como em /api/validate)
+        with stage("liveness"):
+            liveness_passed = True
+
+        similarity = frame["similarity"]
+        verified = frame["verified"]
         response = {
             "success": True,
-            "access_granted": bool(access_granted),
-            "liveness_passed": bool(liveness_passed),
-            "confidence": float(1.0 - distance) if user_id else 0.0,
-            "user_id": int(user_id) if user_id else None,
-            "user_name": None,
+            **resolve_access(
+                db, user_id if verified else None, frame["distance"], liveness_passed
+            ),
+            "user_id": user_id,
+            "verified": bool(verified),
+            "similarity": round(similarity, 4) if similarity is not None else None,
         }
+        if not verified:
+            response["message"] = "Face não confere com o usuário informado"
+
+        # Log da tentativa com o usuário alegado
+        try:
+            db.add(
+                AccessLog(
+                    user_id=user_id,
+                    confidence=similarity,
+                    access_granted=response["access_granted"],
+                    liveness_passed=liveness_passed,
+                    ip_address=request.client.host,
+                    user_agent=request.headers.get("user-agent"),
+                    error_message=None if verified else "Verificação 1:1 recusada",
+                )
+            )
+            with stage("db_write"):
+                db.commit()
+        except Exception as e:
+            logger.error("Erro ao salvar log: %s", e)
+
+        return with_timings(response)
 
-        # Processar acesso concedido
-        if access_granted:
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erro geral na verificação: %s", e)
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+def embed_images(images: list) -> list:
+    """Embedding da melhor face de cada imagem base64 (None se não houver face)"""
+    embeddings = []
+    for image_data in images:
+        with stage("decode"):
             try:
-                user = db.query(User).filter(User.id == user_id).first()
-                if user:
-                    # Incrementar contador de passagens
-                    user.passage_count += 1
-                    db.commit()
-
-                    response["message"] = f"Acesso liberado para {user.name}!"
-                    response["user_name"] = user.name
-                    response["passage_count"] = user.passage_count
-                    print(
-                        f"✅ Usuário reconhecido: {user.name} (ID: {user_id}) - Passagem #{user.passage_count}"
-                    )
-                else:
-                    response["access_granted"] = False
-                    response["message"] = "Usuário não encontrado no banco"
-            except Exception as e:
-                print(f"Erro ao processar usuário: {e}")
-                response["access_granted"] = False
-                response["message"] = "Erro ao processar acesso"
+                image_cv = bytes_to_bgr(decode_base64_payload(image_data))
+            except Exception:
+                raise HTTPException(
+                    status_code=400, detail="Formato de imagem inválido"
+                )
+        embeddings.append(face_recognition.extract_embedding(image_cv))
+    return embeddings
+
+
+@app.post("/api/search")
+async def search_gallery(request: Request, db: Session = Depends(get_db)):
+    """Candidatos mais próximos na galeria para um ou mais embeddings/imagens
+
+    Corpo: ``embeddings`` (listas de floats) ou ``images`` (base64), ``k`` e,
+    opcionalmente, ``min_similarity`` para busca por raio (todos os usuários
+    acima da similaridade, até SEARCH_MAX_K por consulta). Todas as consultas
+    são resolvidas em uma única busca no índice.
+    """
+    try:
+        data = await request.json()
+        embeddings = data.get("embeddings")
+        images = data.get("images")
+        if bool(embeddings) == bool(images):
+            raise HTTPException(
+                status_code=400, detail="Informe embeddings ou images (apenas um)"
+            )
+
+        queries = embeddings or images
+        if not isinstance(queries, list) or len(queries) > SEARCH_MAX_QUERIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Envie uma lista com até {SEARCH_MAX_QUERIES} consultas",
+            )
+
+        k = data.get("k", 5)
+        if not isinstance(k, int) or not 1 <= k <= SEARCH_MAX_K:
+            raise HTTPException(
+                status_code=400, detail=f"k deve estar entre 1 e {SEARCH_MAX_K}"
+            )
+
+        min_similarity = data.get("min_similarity")
+        if min_similarity is not None and not isinstance(min_similarity, (int, float)):
+            raise HTTPException(status_code=400, detail="min_similarity inválido")
+
+        if images:
+            vectors = await run_in_threadpool(embed_images, images)
         else:
-            if not liveness_passed:
-                response["message"] = "Falha na verificação de liveness"
-            else:
-                response["message"] = "Usuário não reconhecido"
+            try:
+                vectors = [np.asarray(e, dtype=np.float32) for e in embeddings]
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Embedding inválido")
+            if any(v.shape != (EMBEDDING_DIMENSION,) for v in vectors):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Embeddings devem ter {EMBEDDING_DIMENSION} dimensões",
+                )
+
+        found = [v for v in vectors if v is not None]
+        if min_similarity is not None:
+            hits = await run_in_threadpool(
+                face_recognition.search_radius, found, float(min_similarity)
+            )
+        else:
+            hits = await run_in_threadpool(
+                face_recognition.search_candidates, found, k
+            )
 
-        # Log da tentativa (assíncrono para não bloquear resposta)
-        try:
-            log = AccessLog(
-                user_id=user_id,
-                confidence=1.0 - distance if user_id else None,
-                access_granted=access_granted,
-                liveness_passed=liveness_passed,
-                ip_address=request.client.host,
-                user_agent=request.headers.get("user-agent"),
+        names = user_cache.get_names(
+            db, [user_id for candidates in hits for user_id, _ in candidates]
+        )
+        hits = iter(hits)
+        results = []
+        for i, vector in enumerate(vectors):
+            candidates = next(hits) if vector is not None else []
+            results.append(
+                {
+                    "query": i,
+                    "face_found": vector is not None,
+                    "truncated": len(candidates) > SEARCH_MAX_K,
+                    "candidates": [
+                        {
+                            "user_id": user_id,
+                            "user_name": names.get(user_id),
+                            "similarity": round(similarity, 4),
+                        }
+                        for user_id, similarity in candidates[:SEARCH_MAX_K]
+                    ],
+                }
             )
-            db.add(log)
-            db.commit()
-        except Exception as e:
-            print(f"Erro ao salvar log: {e}")
 
-        return response
+        return {
+            "success": True,
+            "mode": "range" if min_similarity is not None else "top_k",
+            "results": results,
+        }
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erro geral na validação: {e}")
+        logger.error("Erro na busca de candidatos: %s", e)
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 
@@ -379,42 +908,114 @@ async def get_users(db: Session = Depends(get_db)):
 
 
 @app.get("/api/logs")
-async def get_logs(limit: int = 50, db: Session = Depends(get_db)):
-    """Lista logs de acesso"""
+async def get_logs(
+    limit: int = Query(LOGS_PAGE_DEFAULT_LIMIT, ge=1, le=LOGS_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    user_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    access_granted: Optional[bool] = None,
+    db: Session = Depends(get_db),
+):
+    """Lista logs de acesso com paginação por cursor (timestamp, id) e filtros"""
     try:
-        logs = (
-            db.query(AccessLog).order_by(AccessLog.timestamp.desc()).limit(limit).all()
+        logs, next_cursor = fetch_logs_page(
+            db,
+            limit,
+            cursor=cursor,
+            name_resolver=lambda user_ids: user_cache.get_names(db, user_ids),
+            user_id=user_id,
+            start=start,
+            end=end,
+            access_granted=access_granted,
         )
 
-        # Buscar nomes dos usuários para os logs que têm user_id
-        user_names = {}
-        user_ids = [log.user_id for log in logs if log.user_id is not None]
-        if user_ids:
-            users = db.query(User).filter(User.id.in_(user_ids)).all()
-            user_names = {user.id: user.name for user in users}
+        return {
+            "success": True,
+            "logs": logs,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+        }
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
 
+@app.get("/api/logs/export")
+async def export_logs(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    access_granted: Optional[bool] = None,
+):
+    """Exporta logs filtrados em NDJSON ou CSV via streaming (memória constante)"""
+    logs = iter_logs(
+        SessionLocal,
+        chunk_size=LOGS_EXPORT_CHUNK_SIZE,
+        user_id=user_id,
+        start=start,
+        end=end,
+        access_granted=access_granted,
+    )
+
+    if format == "csv":
+        body, media_type = iter_csv(logs), "text/csv"
+    else:
+        body, media_type = iter_ndjson(logs), "application/x-ndjson"
+
+    filename = f"access_logs_{datetime.utcnow():%Y%m%d_%H%M%S}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/api/logs/archive")
+async def list_log_archive():
+    """Lista segmentos diários de logs arquivados"""
+    try:
         return {
             "success": True,
-            "logs": [
-                {
-                    "id": log.id,
-                    "user_id": log.user_id,
-                    "user_name": user_names.get(log.user_id) if log.user_id else None,
-                    "confidence": log.confidence,
-                    "access_granted": log.access_granted,
-                    "liveness_passed": log.liveness_passed,
-                    "timestamp": log.timestamp.isoformat(),
-                    "ip_address": log.ip_address,
-                    "error_message": log.error_message,
-                }
-                for log in logs
-            ],
+            "retention_days": log_archiver.retention_days,
+            "last_run": (
+                log_archiver.last_run.isoformat() if log_archiver.last_run else None
+            ),
+            "segments": log_archiver.list_segments(),
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 
+@app.get("/api/logs/archive/query")
+async def query_log_archive(
+    user_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    access_granted: Optional[bool] = None,
+):
+    """Consulta logs arquivados (NDJSON via streaming)"""
+    logs = log_archiver.iter_archived_logs(
+        user_id=user_id, start=start, end=end, access_granted=access_granted
+    )
+    return StreamingResponse(iter_ndjson(logs), media_type="application/x-ndjson")
+
+
+@app.post("/api/logs/archive/run")
+async def run_log_archive():
+    """Executa o arquivamento de logs antigos imediatamente"""
+    try:
+        result = await run_in_threadpool(log_archiver.archive_old_logs, SessionLocal)
+        return {"success": True, **result}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
 @app.get("/api/stats")
 async def get_stats(db: Session = Depends(get_db)):
     """Retorna estatísticas do sistema"""
@@ -430,7 +1031,7 @@ async def get_stats(db: Session = Depends(get_db)):
         try:
             face_stats = face_recognition.get_stats()
         except Exception as e:
-            print(f"Erro ao obter estatísticas de reconhecimento facial: {e}")
+            logger.error("Erro ao obter estatísticas de reconhecimento facial: %s", e)
             face_stats = {
                 "total_embeddings": 0,
                 "registered_users": 0,
@@ -449,6 +1050,8 @@ async def get_stats(db: Session = Depends(get_db)):
                     (successful_access / total_logs * 100) if total_logs > 0 else 0
                 ),
                 "face_recognition": face_stats,
+                "user_cache": user_cache.get_stats(),
+                "inference_queue": inference_queue.get_stats(),
             },
         }
 
@@ -456,6 +1059,246 @@ async def get_stats(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 
+@app.get("/api/index/check")
+async def check_index(db: Session = Depends(get_db)):
+    """Verifica consistência entre usuários no banco e o índice FAISS"""
+    try:
+        return {"success": True, "report": check_consistency(face_recognition, db)}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.post("/api/index/rebuild")
+async def rebuild_faiss_index(deactivate_failed: bool = False):
+    """Reconstrói o índice FAISS a partir dos embeddings criptografados no banco
+
+    ``deactivate_failed=true`` desativa os usuários com embedding ilegível.
+    """
+    try:
+        result = await run_in_threadpool(
+            rebuild_index,
+            face_recognition,
+            SessionLocal,
+            deactivate_failed=deactivate_failed,
+        )
+        return {"success": True, **result}
+
+    except GalleryReplacedError as e:
+        # Ex.: banco limpo durante a reconstrução
+        raise HTTPException(status_code=409, detail=str(e))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.post("/api/index/compact")
+async def compact_faiss_index():
+    """Descarta os tombstones do índice FAISS, remontando-o com os vetores ativos"""
+    try:
+        result = await run_in_threadpool(
+            compact_index, face_recognition, SessionLocal, min_tombstone_ratio=0.0
+        )
+        return {"success": True, **result}
+
+    except GalleryReplacedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+async def compact_after_removal() -> Optional[dict]:
+    """Compacta o índice se as remoções deixaram tombstones demais
+
+    Uma falha aqui não desfaz a remoção já concluída: só é registrada.
+    """
+    try:
+        return await run_in_threadpool(compact_index, face_recognition, SessionLocal)
+    except Exception as e:
+        logger.error("Erro ao compactar índice FAISS: %s", e)
+        return None
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Exige X-Admin-Token igual a ADMIN_TOKEN (sem token configurado, nega tudo)"""
+    if not (
+        ADMIN_TOKEN
+        and x_admin_token
+        and secrets.compare_digest(x_admin_token, ADMIN_TOKEN)
+    ):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+
+
+def require_profiling(x_admin_token: Optional[str] = Header(None)):
+    """Libera os endpoints de profiling apenas com PROFILING_ENABLED e token válido"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    require_admin(x_admin_token)
+
+
+@app.get("/api/streams")
+async def list_streams():
+    """Streams de câmera ativos com vazão e frames descartados"""
+    return {"success": True, "streams": stream_manager.get_stats()}
+
+
+@app.post("/api/streams", dependencies=[Depends(require_admin)])
+async def add_stream(request: Request):
+    """Inicia o processamento de um stream (URL RTSP ou arquivo de vídeo)"""
+    data = await request.json()
+    stream_id = data.get("stream_id")
+    source = data.get("source")
+    if not stream_id or not source:
+        raise HTTPException(status_code=400, detail="stream_id e source são obrigatórios")
+
+    try:
+        worker = await run_in_threadpool(
+            stream_manager.add,
+            stream_id,
+            source,
+            SessionLocal,
+            float(data.get("target_fps", STREAM_DEFAULT_FPS)),
+            bool(data.get("loop", False)),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+    return {"success": True, "stream": worker.get_stats()}
+
+
+@app.delete("/api/streams/{stream_id}", dependencies=[Depends(require_admin)])
+async def remove_stream(stream_id: str):
+    """Encerra um stream"""
+    removed = await run_in_threadpool(stream_manager.remove, stream_id)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Stream não encontrado")
+    return {"success": True, "message": f"Stream {stream_id} encerrado"}
+
+
+@app.post("/api/admin/profile/sample", dependencies=[Depends(require_profiling)])
+async def sample_profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1),
+):
+    """Profiling por amostragem de todos os threads (pilhas colapsadas/flamegraph)"""
+    try:
+        collapsed = await run_in_threadpool(
+            sampling_profiler.sample, seconds, interval_ms
+        )
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    filename = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.collapsed"
+    return Response(
+        content=collapsed,
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/api/admin/profile/requests", dependencies=[Depends(require_profiling)])
+async def arm_request_profile(count: int = Query(10, ge=1)):
+    """Arma o cProfile para as próximas ``count`` requisições"""
+    try:
+        request_profiler.arm(count)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return request_profiler.get_status()
+
+
+@app.get("/api/admin/profile/requests", dependencies=[Depends(require_profiling)])
+async def get_request_profile(
+    format: str = Query("prof", pattern="^(prof|text)$"),
+    limit: int = Query(50, ge=1),
+):
+    """Resultado do cProfile (.prof para snakeviz/flameprof, ou texto)"""
+    status = request_profiler.get_status()
+    if not status["complete"]:
+        return JSONResponse(status_code=202, content=status)
+
+    try:
+        content = request_profiler.dump(format, limit)
+    except ProfilerBusyError as e:
+        return JSONResponse(status_code=202, content={**status, "detail": str(e)})
+
+    if format == "text":
+        return Response(content=content, media_type="text/plain")
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="requests.prof"'},
+    )
+
+
+@app.delete("/api/admin/profile/requests", dependencies=[Depends(require_profiling)])
+async def cancel_request_profile():
+    """Cancela o profiling de requisições em andamento"""
+    request_profiler.cancel()
+    return request_profiler.get_status()
+
+
+@app.post("/api/admin/memory/start", dependencies=[Depends(require_profiling)])
+async def start_memory_tracking(frames: int = Query(10, ge=1, le=64)):
+    """Ativa o tracemalloc (custo de memória/CPU enquanto ativo)"""
+    return memory_tracker.start(frames)
+
+
+@app.post("/api/admin/memory/stop", dependencies=[Depends(require_profiling)])
+async def stop_memory_tracking():
+    """Desativa o tracemalloc"""
+    return memory_tracker.stop()
+
+
+@app.get("/api/admin/memory/snapshot", dependencies=[Depends(require_profiling)])
+async def memory_snapshot(
+    limit: int = Query(25, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+):
+    """Maiores alocações e crescimento desde o snapshot anterior"""
+    try:
+        return await run_in_threadpool(memory_tracker.snapshot, limit, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/api/groups")
+async def list_groups():
+    """Grupos de usuários, tamanho dos sub-índices e portões mapeados"""
+    try:
+        return {"groups": group_galleries.stats(), "gates": group_galleries.gates}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.put("/api/users/{user_id}/groups")
+async def set_user_groups(
+    user_id: int, request: Request, db: Session = Depends(get_db)
+):
+    """Define os grupos de um usuário: {"groups": ["sede", "filial"]}"""
+    try:
+        data = await request.json()
+        groups = data.get("groups")
+        if not isinstance(groups, list) or not all(isinstance(g, str) for g in groups):
+            raise HTTPException(
+                status_code=400, detail="groups deve ser uma lista de nomes"
+            )
+
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+        groups = group_galleries.set_user_groups(db, face_recognition, user_id, groups)
+        return {"success": True, "user_id": user_id, "groups": groups}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
 @app.delete("/api/users/{user_id}")
 async def delete_user(user_id: int, db: Session = Depends(get_db)):
     """Remove usuário"""
@@ -464,12 +1307,14 @@ async def delete_user(user_id: int, db: Session = Depends(get_db)):
         if not user:
             raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
-        # Remover do índice FAISS
-        face_recognition.remove_user_embedding(user.faiss_id)
+        # Remover do índice FAISS (pelo usuário: o faiss_id muda ao compactar)
+        face_recognition.remove_users([user.id])
 
         # Marcar como inativo no banco
         user.is_active = False
         db.commit()
+        user_cache.set_active(user.id, False)
+        await compact_after_removal()
 
         return {"success": True, "message": "Usuário removido com sucesso"}
 
@@ -484,36 +1329,90 @@ async def delete_all_users(db: Session = Depends(get_db)):
     """Remove todos os usuários"""
     try:
         # Obter todos os usuários ativos
-        users = db.query(User).filter(User.is_active == True).all()
+        user_ids = [row[0] for row in db.query(User.id).filter(User.is_active == True)]
 
-        if not users:
+        if not user_ids:
             return {
                 "success": True,
                 "message": "Nenhum usuário encontrado",
                 "deleted_count": 0,
             }
 
-        # Remover todos do índice FAISS
-        for user in users:
-            if user.faiss_id > 0:
-                face_recognition.remove_user_embedding(user.faiss_id)
-
-        # Marcar todos como inativos
-        for user in users:
-            user.is_active = False
-
-        db.commit()
+        # Desativar todos com uma única gravação do índice FAISS, fora do event loop
+        await run_in_threadpool(deactivate_users, db, face_recognition, user_ids)
+        await compact_after_removal()
 
         return {
             "success": True,
-            "message": f"{len(users)} usuários removidos com sucesso",
-            "deleted_count": len(users),
+            "message": f"{len(user_ids)} usuários removidos com sucesso",
+            "deleted_count": len(user_ids),
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 
+async def read_user_ids(request: Request) -> List[int]:
+    """Lê {"user_ids": [...]} do corpo de uma operação em lote"""
+    data = await request.json()
+    user_ids = data.get("user_ids") if isinstance(data, dict) else None
+    if (
+        not isinstance(user_ids, list)
+        or not user_ids
+        or not all(type(u) is int for u in user_ids)
+    ):
+        raise HTTPException(
+            status_code=400, detail="user_ids deve ser uma lista de IDs de usuário"
+        )
+    return user_ids
+
+
+@app.post("/api/users/bulk/deactivate")
+async def bulk_deactivate_users(request: Request, db: Session = Depends(get_db)):
+    """Desativa vários usuários com uma única gravação do índice FAISS"""
+    try:
+        user_ids = await read_user_ids(request)
+        result = await run_in_threadpool(
+            deactivate_users, db, face_recognition, user_ids
+        )
+        return {"success": True, **result, "compaction": await compact_after_removal()}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.post("/api/users/bulk/reactivate")
+async def bulk_reactivate_users(request: Request, db: Session = Depends(get_db)):
+    """Reativa vários usuários a partir dos embeddings guardados no banco"""
+    try:
+        user_ids = await read_user_ids(request)
+        result = await run_in_threadpool(
+            reactivate_users, db, face_recognition, user_ids
+        )
+        return {"success": True, **result}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
+@app.post("/api/users/bulk/delete")
+async def bulk_delete_users(request: Request, db: Session = Depends(get_db)):
+    """Exclui vários usuários do banco e do índice FAISS"""
+    try:
+        user_ids = await read_user_ids(request)
+        result = await run_in_threadpool(delete_users, db, face_recognition, user_ids)
+        return {"success": True, **result, "compaction": await compact_after_removal()}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+
 @app.delete("/api/logs/clear")
 async def clear_logs(db: Session = Depends(get_db)):
     """Limpa todos os logs de acesso"""
@@ -555,8 +1454,10 @@ async def clear_database(db: Session = Depends(get_db)):
         db.query(User).delete()
         db.commit()
 
-        # Limpar índice FAISS
+        # Limpar índice FAISS, grupos e cache de usuários
+        group_galleries.clear(db)
         face_recognition.clear_index()
+        user_cache.clear()
 
         return {
             "success": True,
@@ -573,5 +1474,5 @@ if __name__ == "__main__":
     import uvicorn
     from config import API_HOST, API_PORT
 
-    print(f"Iniciando servidor em http://{API_HOST}:{API_PORT}")
+    logger.info("Iniciando servidor em http://%s:%s", API_HOST, API_PORT)
     uvicorn.run(app, host=API_HOST, port=API_PORT)
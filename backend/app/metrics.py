@@ -0,0 +1,216 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import sys
+import os
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import METRICS_ENABLED
+
+# prometheus_client é opcional: sem ele as medições viram no-op
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+    )
+
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+METRICS_ACTIVE = METRICS_ENABLED and PROMETHEUS_AVAILABLE
+
+# Buckets em segundos: de 1 ms a 10 s, cobrindo etapas rápidas (busca, banco)
+# e lentas (detecção em CPU)
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.15,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+if METRICS_ACTIVE:
+    HTTP_REQUESTS = Counter(
+        "facial_http_requests_total",
+        "Requisições HTTP por endpoint e status",
+        ["method", "endpoint", "status"],
+    )
+    HTTP_LATENCY = Histogram(
+        "facial_http_request_duration_seconds",
+        "Latência das requisições HTTP por endpoint",
+        ["method", "endpoint"],
+        buckets=LATENCY_BUCKETS,
+    )
+    STAGE_LATENCY = Histogram(
+        "facial_pipeline_stage_duration_seconds",
+        "Latência por etapa do pipeline de reconhecimento",
+        ["stage"],
+        buckets=LATENCY_BUCKETS,
+    )
+    GALLERY_SIZE = Gauge(
+        "facial_gallery_size", "Identidades ativas no índice FAISS"
+    )
+    GALLERY_TOMBSTONES = Gauge(
+        "facial_gallery_tombstones", "Vetores removidos ainda presentes no índice FAISS"
+    )
+    GALLERY_SHARDS_FAILED = Gauge(
+        "facial_gallery_shards_failed",
+        "1 se a galeria particionada foi desligada por falha (buscas no índice local)",
+    )
+    INFERENCE_QUEUE_DEPTH = Gauge(
+        "facial_inference_queue_depth", "Requisições de inferência aguardando ou em execução"
+    )
+    ADMISSION_REJECTED = Counter(
+        "facial_admission_rejected_total",
+        "Frames recusados pelo controle de admissão",
+        ["reason"],
+    )
+    STREAM_EVENTS = Counter(
+        "facial_stream_events_total",
+        "Frames lidos/processados/descartados e eventos por stream de câmera",
+        ["stream", "event"],
+    )
+    HOT_TIER_LOOKUPS = Counter(
+        "facial_hot_tier_lookups_total",
+        "Consultas resolvidas na galeria quente (hit) ou enviadas à completa",
+        ["result"],
+    )
+    MODEL_PROVIDER = Gauge(
+        "facial_model_provider_info",
+        "Provider ONNX Runtime ativo nos modelos (1 = ativo)",
+        ["provider"],
+    )
+
+
+# Tempos por etapa da requisição atual (Server-Timing); None quando desligado
+_request_timings: ContextVar[Optional[dict]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextmanager
+def stage(name: str):
+    """Mede a duração de uma etapa do pipeline
+
+    Alimenta o histograma por etapa e, se a requisição atual estiver coletando
+    tempos (Server-Timing), acumula a duração da etapa nela.
+    """
+    timings = _request_timings.get()
+    if not METRICS_ACTIVE and timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if METRICS_ACTIVE:
+            STAGE_LATENCY.labels(name).observe(elapsed)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def start_request_timings() -> dict:
+    """Passa a coletar os tempos por etapa no contexto atual"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def current_timings() -> Optional[dict]:
+    """Tempos por etapa (ms) da requisição atual, ou None se não coletados"""
+    timings = _request_timings.get()
+    if timings is None:
+        return None
+    return {name: round(seconds * 1000, 3) for name, seconds in timings.items()}
+
+
+def format_server_timing(timings: dict, total: float) -> str:
+    """Monta o header Server-Timing (durações em ms)"""
+    entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+def observe_request(method: str, endpoint: str, status: int, duration: float):
+    """Registra uma requisição HTTP concluída"""
+    if METRICS_ACTIVE:
+        HTTP_REQUESTS.labels(method, endpoint, str(status)).inc()
+        HTTP_LATENCY.labels(method, endpoint).observe(duration)
+
+
+def set_queue_depth(depth: int):
+    """Frames aguardando ou em execução na fila de inferência"""
+    if METRICS_ACTIVE:
+        INFERENCE_QUEUE_DEPTH.set(depth)
+
+
+def admission_rejected(reason: str):
+    """Conta requisições recusadas pelo controle de admissão"""
+    if METRICS_ACTIVE:
+        ADMISSION_REJECTED.labels(reason).inc()
+
+
+def stream_event(stream_id: str, event: str, amount: int = 1):
+    """Contadores por stream (frames_read, frames_dropped, recognized, ...)"""
+    if METRICS_ACTIVE:
+        STREAM_EVENTS.labels(stream_id, event).inc(amount)
+
+
+def hot_tier_lookup(result: str, amount: int = 1):
+    """Consultas aceitas na galeria quente ("hit") ou enviadas à completa"""
+    if METRICS_ACTIVE:
+        HOT_TIER_LOOKUPS.labels(result).inc(amount)
+
+
+def bind_recognition_gauges(face_recognition):
+    """Liga os gauges da galeria e do provider ao sistema de reconhecimento
+
+    Os valores são lidos no momento da coleta (scrape), sem custo no caminho
+    das requisições.
+    """
+    if not METRICS_ACTIVE:
+        return
+
+    def gallery_size():
+        return len(face_recognition.id_to_user)
+
+    def tombstones():
+        snapshot = face_recognition.snapshot
+        total = snapshot.index.ntotal if snapshot.index is not None else 0
+        return total - len(snapshot.id_to_user)
+
+    def shards_failed():
+        return 1 if getattr(face_recognition, "shards_error", None) else 0
+
+    GALLERY_SIZE.set_function(gallery_size)
+    GALLERY_TOMBSTONES.set_function(tombstones)
+    GALLERY_SHARDS_FAILED.set_function(shards_failed)
+
+    for provider in getattr(face_recognition, "active_providers", None) or ["none"]:
+        MODEL_PROVIDER.labels(provider).set(1)
+
+
+def render_metrics():
+    """Retorna (conteúdo, content-type) no formato de exposição do Prometheus"""
+    return generate_latest(), CONTENT_TYPE_LATEST
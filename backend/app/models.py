@@ -7,9 +7,11 @@ from sqlalchemy import (
     Float,
     Text,
     Boolean,
+    Index,
+    LargeBinary,
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import deferred, sessionmaker
 from datetime import datetime
 import sys
 import os
@@ -31,13 +33,23 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
     email = Column(String(100), unique=True, index=True)
-    embedding_hash = Column(Text, nullable=False)  # Embedding criptografado
+    # Embedding criptografado (AES-GCM, binário); carregado só quando acessado
+    embedding_hash = deferred(Column(LargeBinary, nullable=False))
     faiss_id = Column(Integer, nullable=False)  # ID no índice FAISS
     passage_count = Column(Integer, default=0)  # Contador de passagens
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
 
 
+class UserGroup(Base):
+    """Grupos (site, prédio, turno) de um usuário; um usuário pode ter vários"""
+
+    __tablename__ = "user_groups"
+
+    user_id = Column(Integer, primary_key=True)
+    group_name = Column(String(100), primary_key=True, index=True)
+
+
 class AccessLog(Base):
     __tablename__ = "access_logs"
 
@@ -51,6 +63,12 @@ class AccessLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     error_message = Column(String(500), nullable=True)
 
+    __table_args__ = (
+        # Paginação por chave (timestamp, id) e filtro por usuário
+        Index("ix_access_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_access_logs_user_timestamp_id", "user_id", "timestamp", "id"),
+    )
+
 
 # Criar tabelas
 def create_tables():
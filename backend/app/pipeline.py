@@ -0,0 +1,154 @@
+"""Etapas de reconhecimento compartilhadas pela API e pelos streams de câmera"""
+
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import sys
+import os
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import MULTI_FACE_MAX_FACES, VERIFY_THRESHOLD
+from app.database import increment_passage_count
+from app.face_recognition import face_recognition
+from app.metrics import stage
+from app.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+# Distância máxima (1 - similaridade) para liberar o acesso
+ACCESS_MAX_DISTANCE = 0.6
+
+
+def recognize_image(
+    image: np.ndarray,
+    multi_face: bool = False,
+    max_faces: int = MULTI_FACE_MAX_FACES,
+    group: Optional[str] = None,
+) -> dict:
+    """Detecta faces na imagem BGR e reconhece a melhor
+
+    Retorna ``faces``, ``best_face`` (ou None), ``user_id`` (ou None) e
+    ``distance``. Com ``multi_face``, reconhece até ``max_faces`` faces (as de
+    maior qualidade) em uma única busca e inclui ``matches``: uma entrada
+    ``{"face", "user_id", "distance"}`` por face; ``best_face`` é escolhida
+    entre elas. Com ``group``, só os usuários do grupo são buscados.
+    """
+    # Detectar faces com timeout implícito
+    try:
+        faces = face_recognition.detect_faces(image)
+    except Exception as e:
+        logger.error("Erro na detecção de faces: %s", e)
+        faces = []
+
+    result = {"faces": faces, "best_face": None, "user_id": None, "distance": 1.0}
+    if multi_face:
+        result["matches"] = []
+    if not faces:
+        return result
+
+    # detect_faces já ordena por qualidade; sem embedding não há o que buscar
+    candidates = faces[: max(1, max_faces)] if multi_face else faces
+    candidates = [face for face in candidates if face.get("embedding") is not None]
+
+    # Pegar melhor face (otimizado)
+    best_face = max(faces, key=lambda x: x.get("det_score", 0))
+    if multi_face and candidates:
+        best_face = max(candidates, key=lambda x: x.get("det_score", 0))
+    result["best_face"] = best_face
+    if best_face.get("embedding") is None:
+        return result
+
+    if not multi_face:
+        candidates = [best_face]
+
+    # Reconhecer faces com tratamento de erro (uma busca para todas)
+    try:
+        decisions = face_recognition.recognize_faces(
+            [face["embedding"] for face in candidates], group=group
+        )
+    except Exception as e:
+        logger.error("Erro no reconhecimento: %s", e)
+        decisions = [(None, 1.0)] * len(candidates)
+
+    for face, (user_id, distance) in zip(candidates, decisions):
+        if face is best_face:
+            result["user_id"], result["distance"] = user_id, distance
+        if multi_face:
+            result["matches"].append(
+                {"face": face, "user_id": user_id, "distance": distance}
+            )
+
+    return result
+
+
+def verify_image(image: np.ndarray, user_id: int) -> dict:
+    """Detecta a melhor face e a compara só com os templates de ``user_id``
+
+    Retorna ``faces``, ``best_face``, ``similarity`` (None sem face ou sem
+    template), ``distance`` e ``verified``.
+    """
+    try:
+        faces = face_recognition.detect_faces(image)
+    except Exception as e:
+        logger.error("Erro na detecção de faces: %s", e)
+        faces = []
+
+    result = {
+        "faces": faces,
+        "best_face": None,
+        "similarity": None,
+        "distance": 1.0,
+        "verified": False,
+    }
+    if not faces:
+        return result
+
+    best_face = max(faces, key=lambda x: x.get("det_score", 0))
+    result["best_face"] = best_face
+    if best_face.get("embedding") is None:
+        return result
+
+    similarity = face_recognition.verify_face(best_face["embedding"], user_id)
+    if similarity is not None:
+        result["similarity"] = similarity
+        result["distance"] = 1.0 - similarity
+        result["verified"] = result["distance"] <= VERIFY_THRESHOLD
+    return result
+
+
+def is_access_granted(
+    user_id: Optional[int], distance: float, liveness_passed: bool
+) -> bool:
+    return user_id is not None and liveness_passed and distance < ACCESS_MAX_DISTANCE
+
+
+def register_passage(db: Session, user_id: int) -> Optional[Tuple[str, int]]:
+    """Conta a passagem de um usuário reconhecido
+
+    Incrementa o contador com um UPDATE atômico, que também confere no banco
+    se o usuário existe e está ativo (o cache pode estar desatualizado, ex.:
+    usuário reativado por outro worker). Retorna (nome, passage_count) ou None
+    se o usuário não existir/estiver inativo.
+    """
+    with stage("passage_update"):
+        updated = increment_passage_count(db, user_id)
+
+    if updated:
+        user_name, passage_count = updated
+        user_cache.put(user_id, user_name, True, passage_count)
+        logger.debug(
+            "✅ Usuário reconhecido: %s (ID: %s) - Passagem #%s",
+            user_name,
+            user_id,
+            passage_count,
+        )
+        return updated
+
+    # Inexistente ou inativo no banco: descartar a entrada que o cache tiver
+    user_cache.invalidate(user_id)
+    return None
@@ -0,0 +1,247 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import PROFILING_MAX_SECONDS, PROFILING_MAX_REQUESTS
+
+
+class ProfilerBusyError(RuntimeError):
+    """Já existe uma sessão de profiling em andamento"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Profiler por amostragem de pilhas de todos os threads
+
+    Um thread auxiliar lê ``sys._current_frames()`` a cada intervalo e conta
+    as pilhas no formato "collapsed" (``thread;f1;f2;f3 N``), aceito por
+    flamegraph.pl, speedscope e similares. Não tem custo quando parado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float, interval_ms: float = 10.0) -> str:
+        """Amostra por ``seconds`` segundos e retorna as pilhas colapsadas"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("Profiling por amostragem já em andamento")
+
+        try:
+            seconds = min(seconds, PROFILING_MAX_SECONDS)
+            interval = max(interval_ms, 1.0) / 1000
+            own_id = threading.get_ident()
+            stacks = Counter()
+
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(names.get(thread_id, str(thread_id)))
+                    stacks[";".join(reversed(labels))] += 1
+                time.sleep(interval)
+
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+
+# Marca a requisição sendo perfilada (o contexto vai junto para o worker)
+_profiling_request: ContextVar[bool] = ContextVar("profiling_request", default=False)
+
+
+class RequestProfiler:
+    """cProfile das próximas N requisições
+
+    Depois de armado, o middleware HTTP perfila uma requisição por vez até
+    completar N; requisições simultâneas passam sem profiling. O cProfile só
+    registra o thread que o ativou: o middleware perfila o event loop e
+    ``run`` perfila o job da requisição no thread de inferência (InferenceQueue);
+    o resultado soma os dois. Outras etapas em threadpool aparecem como espera.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles: List[cProfile.Profile] = []
+        self._remaining = 0
+        self._requested = 0
+        self._busy = False
+        self._token = None
+        self._current: Optional[cProfile.Profile] = None
+
+    @property
+    def armed(self) -> bool:
+        return self._remaining > 0
+
+    def arm(self, count: int):
+        """Prepara o profiling das próximas ``count`` requisições"""
+        with self._lock:
+            if self._remaining > 0:
+                raise ProfilerBusyError("Profiling de requisições já em andamento")
+            self._profiles = []
+            self._requested = min(count, PROFILING_MAX_REQUESTS)
+            self._remaining = self._requested
+
+    def cancel(self):
+        with self._lock:
+            self._remaining = 0
+
+    def try_begin(self) -> bool:
+        """Reserva o profiler para a requisição atual, se houver vaga"""
+        with self._lock:
+            if self._remaining <= 0 or self._busy:
+                return False
+            self._busy = True
+        self._token = _profiling_request.set(True)
+        self._current = self._enable()
+        return True
+
+    def end(self):
+        self._disable(self._current)
+        _profiling_request.reset(self._token)
+        with self._lock:
+            self._busy = False
+            self._remaining -= 1
+
+    def run(self, func: Callable, *args):
+        """Executa ``func(*args)`` no thread atual, perfilado se for parte da
+        requisição em profiling"""
+        if not _profiling_request.get():
+            return func(*args)
+        profile = self._enable()
+        try:
+            return func(*args)
+        finally:
+            self._disable(profile)
+
+    def _enable(self) -> Optional[cProfile.Profile]:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: um profiler ativo já cobre todos os threads
+            return None
+        return profile
+
+    def _disable(self, profile: Optional[cProfile.Profile]):
+        if profile is None:
+            return
+        profile.disable()
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get_status(self) -> dict:
+        return {
+            "requested": self._requested,
+            "remaining": max(self._remaining, 0),
+            "complete": self._requested > 0 and self._remaining <= 0,
+        }
+
+    def dump(self, fmt: str = "prof", limit: int = 50) -> bytes:
+        """Resultado como arquivo pstats (.prof) ou texto ordenado por tempo acumulado"""
+        if not self._profiles or self._remaining > 0 or self._busy:
+            raise ProfilerBusyError("Profiling de requisições ainda não concluído")
+
+        output = io.StringIO()
+        stats = pstats.Stats(*self._profiles, stream=output)
+        if fmt == "text":
+            stats.sort_stats("cumulative").print_stats(limit)
+            return output.getvalue().encode()
+        return marshal.dumps(stats.stats)
+
+
+class MemoryTracker:
+    """Snapshots do tracemalloc para investigar crescimento de memória
+
+    O tracemalloc só fica ativo entre ``start`` e ``stop``; cada snapshot é
+    comparado com o anterior.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def start(self, frames: int = 10) -> dict:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._previous = None
+            return self.get_status()
+
+    def stop(self) -> dict:
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+            return self.get_status()
+
+    def get_status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "traced_bytes": current,
+            "peak_bytes": peak,
+        }
+
+    def snapshot(self, limit: int = 25, group_by: str = "lineno") -> dict:
+        """Maiores alocações atuais e crescimento desde o snapshot anterior"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("tracemalloc não está ativo")
+
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                )
+            )
+            top = [
+                {
+                    "location": str(stat.traceback),
+                    "size_bytes": stat.size,
+                    "count": stat.count,
+                }
+                for stat in snapshot.statistics(group_by)[:limit]
+            ]
+
+            growth = None
+            if self._previous is not None:
+                growth = [
+                    {
+                        "location": str(stat.traceback),
+                        "size_diff_bytes": stat.size_diff,
+                        "count_diff": stat.count_diff,
+                        "size_bytes": stat.size,
+                    }
+                    for stat in snapshot.compare_to(self._previous, group_by)[:limit]
+                ]
+            self._previous = snapshot
+
+            return {**self.get_status(), "top": top, "growth": growth}
+
+
+# Instâncias globais
+sampling_profiler = SamplingProfiler()
+request_profiler = RequestProfiler()
+memory_tracker = MemoryTracker()
@@ -0,0 +1,442 @@
+"""Galeria particionada em shards (processos locais ou nós remotos)
+
+Cada shard guarda uma parte dos vetores em um IndexFlatIP próprio, junto com o
+ID do FAISS global de cada linha. As consultas são enviadas a todos os shards
+ao mesmo tempo e os top-k parciais são mesclados; cadastros vão para o shard
+escolhido por crc32(user_id), estável entre reinícios.
+
+Shards locais são processos filhos ligados por pipes. Um nó remoto roda o
+mesmo servidor atrás de um socket (multiprocessing.connection):
+    python -m app.sharding --listen 0.0.0.0:7000
+e é configurado em GALLERY_SHARD_ADDRESSES="host1:7000,host2:7000".
+
+O coordenador abre GALLERY_SHARD_CONNECTIONS conexões com cada shard e cada
+conexão é atendida por um thread próprio no shard, de modo que buscas
+simultâneas não esperam umas pelas outras.
+"""
+
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import zlib
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Connection, Listener
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import (
+    EMBEDDING_DIMENSION,
+    GALLERY_SHARD_AUTHKEY,
+    GALLERY_SHARD_CONNECTIONS,
+)
+
+# Explícito: o servidor remoto roda como __main__ e loga pelo logger "app"
+logger = logging.getLogger("app.sharding")
+
+
+def shard_for(user_id: int, num_shards: int) -> int:
+    """Shard de um usuário (hash estável, independente do processo)"""
+    return zlib.crc32(str(user_id).encode()) % num_shards
+
+
+class ReadWriteLock:
+    """Várias leituras (buscas) ao mesmo tempo ou uma escrita exclusiva
+
+    Uma escrita pendente bloqueia novas leituras, para não esperar para sempre.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def reading(self):
+        with self._condition:
+            while self._writing:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._condition:
+            while self._writing:
+                self._condition.wait()
+            self._writing = True
+            while self._readers:
+                self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class GalleryPartition:
+    """Parte da galeria: IndexFlatIP e o ID global do FAISS de cada linha
+
+    Compartilhada pelos threads de conexão do shard: buscas rodam em paralelo
+    (o FAISS libera o GIL) e alterações esperam as buscas em andamento.
+    """
+
+    def __init__(self, dim: int):
+        self.index = faiss.IndexFlatIP(dim)
+        self.faiss_ids = np.empty(0, dtype=np.int64)
+        self._lock = ReadWriteLock()
+
+    def reset(self, faiss_ids: np.ndarray, vectors: np.ndarray):
+        with self._lock.writing():
+            self.index.reset()
+            self.faiss_ids = np.empty(0, dtype=np.int64)
+            self._add(faiss_ids, vectors)
+
+    def add(self, faiss_ids: np.ndarray, vectors: np.ndarray):
+        with self._lock.writing():
+            self._add(faiss_ids, vectors)
+
+    def _add(self, faiss_ids: np.ndarray, vectors: np.ndarray):
+        if len(faiss_ids):
+            self.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+            self.faiss_ids = np.concatenate(
+                [self.faiss_ids, np.asarray(faiss_ids, dtype=np.int64)]
+            )
+
+    def remove(self, faiss_ids: np.ndarray) -> int:
+        with self._lock.writing():
+            positions = np.nonzero(np.isin(self.faiss_ids, faiss_ids))[0]
+            if len(positions):
+                # IndexFlat compacta as linhas restantes mantendo a ordem
+                self.index.remove_ids(faiss.IDSelectorBatch(positions.astype(np.int64)))
+                self.faiss_ids = np.delete(self.faiss_ids, positions)
+        return len(positions)
+
+    def size(self) -> int:
+        with self._lock.reading():
+            return self.index.ntotal
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock.reading():
+            k = min(k, self.index.ntotal)
+            if k <= 0:
+                empty = np.empty((queries.shape[0], 0))
+                return empty.astype(np.float32), empty.astype(np.int64)
+            similarities, positions = self.index.search(queries, k)
+            faiss_ids = self.faiss_ids
+        ids = np.where(positions >= 0, faiss_ids[np.maximum(positions, 0)], -1)
+        return similarities, ids
+
+    def range_search(self, queries: np.ndarray, min_similarity: float) -> list:
+        with self._lock.reading():
+            if self.index.ntotal == 0:
+                empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+                return [empty] * len(queries)
+            # range_search devolve produto interno estritamente > raio
+            radius = float(
+                np.nextafter(np.float32(min_similarity), np.float32(-np.inf))
+            )
+            lims, similarities, positions = self.index.range_search(queries, radius)
+            faiss_ids = self.faiss_ids
+        return [
+            (
+                faiss_ids[positions[lims[i] : lims[i + 1]]],
+                similarities[lims[i] : lims[i + 1]],
+            )
+            for i in range(len(queries))
+        ]
+
+
+# Comandos aceitos de um coordenador
+SHARD_OPS = ("reset", "add", "remove", "size", "search", "range_search")
+
+
+def serve_shard(conn: Connection, state: GalleryPartition):
+    """Atende comandos de uma conexão até receber "close" ou a conexão cair"""
+    while True:
+        try:
+            op, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            if op == "close":
+                conn.send(("ok", None))
+                return
+            if op not in SHARD_OPS:
+                raise ValueError(f"Comando desconhecido: {op}")
+            conn.send(("ok", getattr(state, op)(*args)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def serve_connections(
+    conns: List[Connection], dim: int = EMBEDDING_DIMENSION, threads: int = 1
+):
+    """Processo de um shard local: um thread por conexão, mesma partição"""
+    faiss.omp_set_num_threads(max(1, threads))
+    state = GalleryPartition(dim)
+    workers = [
+        threading.Thread(target=serve_shard, args=(conn, state), daemon=True)
+        for conn in conns
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+class ShardError(RuntimeError):
+    """Falha de comunicação ou execução em um shard"""
+
+
+class ShardedGallery:
+    """Coordenador: roteia cadastros e faz scatter/gather das buscas
+
+    ``lanes`` tem uma conexão com cada shard por operação simultânea. Cada
+    operação reserva uma lane livre, envia o comando a todos os shards
+    envolvidos e só então lê as respostas, de modo que os shards trabalham em
+    paralelo; operações de threads diferentes usam lanes diferentes.
+    """
+
+    def __init__(self, lanes: List[List[Connection]], processes: Optional[list] = None):
+        if not lanes or not lanes[0]:
+            raise ValueError("Pelo menos um shard é necessário")
+        self.lanes = lanes
+        self.processes = processes or []
+        self._free_lanes = queue.Queue()
+        for lane in range(len(lanes)):
+            self._free_lanes.put(lane)
+
+    @classmethod
+    def local(
+        cls,
+        num_shards: int,
+        dim: int = EMBEDDING_DIMENSION,
+        connections: int = GALLERY_SHARD_CONNECTIONS,
+    ) -> "ShardedGallery":
+        """Inicia ``num_shards`` processos locais, um núcleo de FAISS cada"""
+        context = mp.get_context("spawn")
+        threads = max(1, (os.cpu_count() or 1) // num_shards)
+        connections = max(1, connections)
+        lanes = [[] for _ in range(connections)]
+        processes = []
+        for i in range(num_shards):
+            pipes = [context.Pipe() for _ in range(connections)]
+            process = context.Process(
+                target=serve_connections,
+                args=([child for _, child in pipes], dim, threads),
+                name=f"gallery-shard-{i}",
+                daemon=True,
+            )
+            process.start()
+            for lane, (parent_conn, child_conn) in zip(lanes, pipes):
+                child_conn.close()
+                lane.append(parent_conn)
+            processes.append(process)
+        logger.info("Galeria particionada em %s shards locais", num_shards)
+        return cls(lanes, processes)
+
+    @classmethod
+    def remote(
+        cls, addresses: List[str], connections: int = GALLERY_SHARD_CONNECTIONS
+    ) -> "ShardedGallery":
+        """Conecta a shards já em execução (``python -m app.sharding --listen``)"""
+        if not GALLERY_SHARD_AUTHKEY:
+            raise ValueError("Defina GALLERY_SHARD_AUTHKEY para usar shards remotos")
+        lanes = []
+        for _ in range(max(1, connections)):
+            lane = []
+            for address in addresses:
+                host, _, port = address.rpartition(":")
+                lane.append(
+                    Client((host, int(port)), authkey=GALLERY_SHARD_AUTHKEY.encode())
+                )
+            lanes.append(lane)
+        logger.info("Galeria particionada em %s shards remotos", len(addresses))
+        return cls(lanes)
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.lanes[0])
+
+    def _call(self, requests: dict) -> dict:
+        """Envia {shard: (op, args)} a todos e depois coleta as respostas"""
+        replies = {}
+        lane = self._free_lanes.get()
+        try:
+            connections = self.lanes[lane]
+            sent = []
+            for shard, request in requests.items():
+                try:
+                    connections[shard].send(request)
+                    sent.append(shard)
+                except (OSError, ValueError) as e:
+                    replies[shard] = ("error", f"conexão perdida: {e}")
+            for shard in sent:
+                try:
+                    replies[shard] = connections[shard].recv()
+                except (EOFError, OSError) as e:
+                    replies[shard] = ("error", f"conexão perdida: {e}")
+        finally:
+            self._free_lanes.put(lane)
+
+        errors = [f"shard {s}: {r[1]}" for s, r in replies.items() if r[0] != "ok"]
+        if errors:
+            raise ShardError("; ".join(errors))
+        return {shard: reply[1] for shard, reply in replies.items()}
+
+    def _route(self, faiss_ids: np.ndarray, user_ids: np.ndarray) -> dict:
+        """Agrupa as posições de cada shard: {shard: índices no lote}"""
+        shards = np.array([shard_for(int(u), self.num_shards) for u in user_ids])
+        return {
+            shard: np.nonzero(shards == shard)[0]
+            for shard in range(self.num_shards)
+            if np.any(shards == shard)
+        }
+
+    def load(self, faiss_ids: np.ndarray, user_ids: np.ndarray, vectors: np.ndarray):
+        """Substitui o conteúdo de todos os shards pela galeria dada"""
+        faiss_ids = np.asarray(faiss_ids, dtype=np.int64)
+        routes = self._route(faiss_ids, user_ids)
+        empty = np.empty(0, dtype=np.int64)
+        self._call(
+            {
+                shard: (
+                    "reset",
+                    (
+                        faiss_ids[routes[shard]] if shard in routes else empty,
+                        vectors[routes[shard]] if shard in routes else vectors[:0],
+                    ),
+                )
+                for shard in range(self.num_shards)
+            }
+        )
+
+    def add(self, faiss_id: int, user_id: int, vector: np.ndarray):
+        shard = shard_for(user_id, self.num_shards)
+        self._call(
+            {shard: ("add", (np.array([faiss_id]), np.asarray(vector).reshape(1, -1)))}
+        )
+
+    def add_many(self, faiss_ids: List[int], user_ids: List[int], vectors: np.ndarray):
+        """Adiciona um lote, com uma mensagem por shard"""
+        faiss_ids = np.asarray(faiss_ids, dtype=np.int64)
+        routes = self._route(faiss_ids, user_ids)
+        self._call(
+            {
+                shard: ("add", (faiss_ids[rows], vectors[rows]))
+                for shard, rows in routes.items()
+            }
+        )
+
+    def remove(self, faiss_ids: List[int]):
+        # O shard de cada ID não é guardado aqui: todos removem o que tiverem
+        ids = np.asarray(faiss_ids, dtype=np.int64)
+        self._call({shard: ("remove", (ids,)) for shard in range(self.num_shards)})
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k global: união dos top-k de cada shard, reordenada
+
+        Mesmo formato de ``search_index``: (similaridades, IDs do FAISS).
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        replies = self._call(
+            {shard: ("search", (queries, k)) for shard in range(self.num_shards)}
+        )
+        similarities = np.hstack([replies[s][0] for s in range(self.num_shards)])
+        ids = np.hstack([replies[s][1] for s in range(self.num_shards)])
+        k = min(k, similarities.shape[1])
+        order = np.argsort(-similarities, axis=1, kind="stable")[:, :k]
+        return (
+            np.take_along_axis(similarities, order, axis=1),
+            np.take_along_axis(ids, order, axis=1),
+        )
+
+    def range_search(self, queries: np.ndarray, min_similarity: float) -> list:
+        """Busca por raio em todos os shards: (IDs, similaridades) por consulta"""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        replies = self._call(
+            {
+                shard: ("range_search", (queries, min_similarity))
+                for shard in range(self.num_shards)
+            }
+        )
+        results = []
+        for i in range(len(queries)):
+            ids = np.concatenate([replies[s][i][0] for s in range(self.num_shards)])
+            sims = np.concatenate([replies[s][i][1] for s in range(self.num_shards)])
+            order = np.argsort(-sims, kind="stable")
+            results.append((ids[order], sims[order]))
+        return results
+
+    def sizes(self) -> List[int]:
+        replies = self._call({s: ("size", ()) for s in range(self.num_shards)})
+        return [replies[s] for s in range(self.num_shards)]
+
+    def close(self):
+        errors = []
+        for _ in self.lanes:
+            try:
+                self._call({s: ("close", ()) for s in range(self.num_shards)})
+            except ShardError as e:
+                errors.append(e)
+        if errors:
+            logger.warning("Erro ao encerrar shards: %s", errors[0])
+        for lane in self.lanes:
+            for conn in lane:
+                conn.close()
+        for process in self.processes:
+            process.join(5)
+
+
+def _serve_and_close(conn: Connection, state: GalleryPartition):
+    with conn:
+        serve_shard(conn, state)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de shard da galeria")
+    parser.add_argument("--listen", required=True, help="host:porta")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    from app.logging_setup import setup_logging
+
+    setup_logging()
+
+    if not GALLERY_SHARD_AUTHKEY:
+        raise SystemExit("Defina GALLERY_SHARD_AUTHKEY (mesma chave do coordenador)")
+
+    faiss.omp_set_num_threads(max(1, args.threads))
+    state = GalleryPartition(EMBEDDING_DIMENSION)
+    host, _, port = args.listen.rpartition(":")
+    authkey = GALLERY_SHARD_AUTHKEY.encode()
+    with Listener((host, int(port)), authkey=authkey) as listener:
+        logger.info("Shard aguardando coordenador em %s", args.listen)
+        while True:
+            # Um thread por conexão, todas sobre a mesma partição; um
+            # coordenador por vez (ao conectar ele recarrega a partição)
+            conn = listener.accept()
+            logger.info("Conexão do coordenador: %s", listener.last_accepted)
+            threading.Thread(
+                target=_serve_and_close, args=(conn, state), daemon=True
+            ).start()
+
+
+if __name__ == "__main__":
+    main()
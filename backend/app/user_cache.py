@@ -0,0 +1,150 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import sys
+import os
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from config import USER_CACHE_MAX_SIZE
+from app.models import User
+
+
+class UserMetadata(NamedTuple):
+    name: str
+    is_active: bool
+    passage_count: int
+
+
+class UserMetadataCache:
+    """Cache LRU em memória de id -> (name, is_active, passage_count)
+
+    Usado no caminho quente do reconhecimento para resolver a identidade após um
+    acerto no FAISS sem ida ao banco. Operações de cadastro, remoção e limpeza
+    devem atualizar o cache.
+    """
+
+    def __init__(self, max_size: int = USER_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, UserMetadata]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def warm(self, db) -> int:
+        """Pré-carrega usuários ativos, priorizando os de maior passagem"""
+        rows = (
+            db.query(User.id, User.name, User.is_active, User.passage_count)
+            .filter(User.is_active == True)
+            .order_by(User.passage_count.desc())
+            .limit(self.max_size)
+            .all()
+        )
+
+        with self._lock:
+            self._entries.clear()
+            # Inserir do menos para o mais frequente: os mais frequentes ficam no
+            # fim da fila LRU e são os últimos a serem descartados
+            for user_id, name, is_active, passage_count in reversed(rows):
+                self._entries[user_id] = UserMetadata(
+                    name, bool(is_active), passage_count or 0
+                )
+
+        return len(rows)
+
+    def get(self, user_id: int) -> Optional[UserMetadata]:
+        """Busca metadados no cache (None se ausente)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry
+
+    def get_or_load(self, db, user_id: int) -> Optional[UserMetadata]:
+        """Busca metadados no cache, consultando o banco apenas em caso de falta"""
+        entry = self.get(user_id)
+        if entry is not None:
+            return entry
+
+        row = (
+            db.query(User.name, User.is_active, User.passage_count)
+            .filter(User.id == user_id)
+            .first()
+        )
+        if row is None:
+            return None
+
+        return self.put(user_id, row[0], row[1], row[2])
+
+    def get_names(self, db, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Resolve nomes de vários usuários com no máximo uma consulta ao banco"""
+        names = {}
+        missing = []
+        for user_id in set(user_ids):
+            entry = self.get(user_id)
+            if entry is not None:
+                names[user_id] = entry.name
+            else:
+                missing.append(user_id)
+
+        if missing:
+            rows = (
+                db.query(User.id, User.name, User.is_active, User.passage_count)
+                .filter(User.id.in_(missing))
+                .all()
+            )
+            for user_id, name, is_active, passage_count in rows:
+                self.put(user_id, name, is_active, passage_count)
+                names[user_id] = name
+
+        return names
+
+    def put(
+        self, user_id: int, name: str, is_active: bool, passage_count: int
+    ) -> UserMetadata:
+        """Insere ou substitui metadados de um usuário"""
+        entry = UserMetadata(name, bool(is_active), passage_count or 0)
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def set_active(self, user_id: int, is_active: bool):
+        """Atualiza o status de um usuário em cache (se presente)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries[user_id] = entry._replace(is_active=bool(is_active))
+
+    def invalidate(self, user_id: int):
+        """Remove um usuário do cache"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+# Instância global do cache de metadados de usuários
+user_cache = UserMetadataCache()
@@ -0,0 +1,64 @@
+"""Fixtures comuns dos testes (lógica que roda sem os modelos de face)
+
+Uso (a partir do diretório backend):
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.models import Base
+
+
+@pytest.fixture
+def engine():
+    """Banco SQLite em memória compartilhado entre sessões e threads"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def index_type():
+    """Tipo do índice da galeria; sobrescreva com parametrize("index_type", ...)"""
+    return "flat"
+
+
+@pytest.fixture
+def gallery(tmp_path, monkeypatch, index_type):
+    """FaceRecognitionSystem sem modelos, com índice vazio em diretório temporário"""
+    import app.face_recognition as module
+
+    monkeypatch.setattr(module, "FAISS_INDEX_DIR", tmp_path)
+    monkeypatch.setattr(module, "FAISS_INDEX_TYPE", index_type)
+    monkeypatch.setattr(module.FaceRecognitionSystem, "load_models", lambda self: None)
+    return module.FaceRecognitionSystem()
+
+
+def random_embeddings(rows: int, dim: int = 512, seed: int = 0):
+    """Embeddings unitários aleatórios (float32)"""
+    import numpy as np
+
+    vectors = np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
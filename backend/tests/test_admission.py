@@ -0,0 +1,159 @@
+import asyncio
+import ipaddress
+import threading
+
+import pytest
+
+from app.admission import (
+    AdmissionRejected,
+    InferenceQueue,
+    client_address,
+    parse_trusted_proxies,
+)
+
+
+class Gate:
+    """Job que ocupa o worker até ser liberado"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        assert self.release.wait(5)
+        return "gate"
+
+
+async def wait_started(gate):
+    assert await asyncio.get_running_loop().run_in_executor(None, gate.started.wait, 5)
+
+
+@pytest.fixture
+def queue():
+    queue = InferenceQueue(workers=1, max_depth=2, deadline=5.0)
+    yield queue
+    queue.stop()
+
+
+def test_superseded_frame_gets_429_and_new_frame_keeps_its_slot(queue):
+    gate, executed = Gate(), []
+
+    def job(name):
+        executed.append(name)
+        return name
+
+    async def scenario():
+        blocker = asyncio.create_task(queue.submit("gate", gate))
+        await wait_started(gate)
+        old = asyncio.create_task(queue.submit("a", job, "a-old"))
+        await asyncio.sleep(0)
+        other = asyncio.create_task(queue.submit("b", job, "b"))
+        await asyncio.sleep(0)
+        new = asyncio.create_task(queue.submit("a", job, "a-new"))
+        await asyncio.sleep(0)
+        gate.release.set()
+        return await asyncio.gather(blocker, old, other, new, return_exceptions=True)
+
+    blocker, old, other, new = asyncio.run(scenario())
+
+    assert isinstance(old, AdmissionRejected)
+    assert old.status_code == 429 and old.reason == "superseded"
+    assert (blocker, other, new) == ("gate", "b", "a-new")
+    # O frame novo ocupa o lugar do antigo, à frente do cliente "b"
+    assert executed == ["a-new", "b"]
+    queue.stop()  # aguarda os workers contabilizarem
+    assert queue.get_stats()["superseded"] == 1
+
+
+def test_full_queue_rejects_immediately_with_503(queue):
+    gate = Gate()
+
+    async def scenario():
+        blocker = asyncio.create_task(queue.submit("gate", gate))
+        await wait_started(gate)
+        queued = [
+            asyncio.create_task(queue.submit(key, lambda: key)) for key in ("a", "b")
+        ]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await queue.submit("c", lambda: "c")
+        gate.release.set()
+        await asyncio.gather(blocker, *queued)
+        return rejected.value
+
+    rejection = asyncio.run(scenario())
+
+    assert rejection.status_code == 503 and rejection.reason == "queue_full"
+    assert rejection.retry_after >= 1
+    queue.stop()  # aguarda os workers contabilizarem
+    assert queue.get_stats()["rejected_full"] == 1
+
+
+def test_frame_past_deadline_is_dropped_with_503():
+    queue = InferenceQueue(workers=1, max_depth=4, deadline=0.05)
+    gate, executed = Gate(), []
+
+    async def scenario():
+        blocker = asyncio.create_task(queue.submit("gate", gate))
+        await wait_started(gate)
+        late = asyncio.create_task(queue.submit("a", executed.append, "a"))
+        await asyncio.sleep(0.2)
+        gate.release.set()
+        return await asyncio.gather(blocker, late, return_exceptions=True)
+
+    try:
+        _, late = asyncio.run(scenario())
+    finally:
+        queue.stop()  # aguarda os workers contabilizarem
+
+    assert isinstance(late, AdmissionRejected)
+    assert late.status_code == 503 and late.reason == "deadline"
+    assert executed == []
+    assert queue.get_stats()["expired"] == 1
+
+
+def test_job_exception_is_propagated(queue):
+    def fail():
+        raise RuntimeError("falhou")
+
+    with pytest.raises(RuntimeError, match="falhou"):
+        asyncio.run(queue.submit("a", fail))
+    queue.stop()  # aguarda os workers contabilizarem
+    assert queue.get_stats()["completed"] == 1
+
+
+def test_parse_trusted_proxies_skips_invalid_entries():
+    networks = parse_trusted_proxies(" 127.0.0.1, 172.16.0.0/12,,nope, ::1")
+
+    assert networks == [
+        ipaddress.ip_network("127.0.0.1/32"),
+        ipaddress.ip_network("172.16.0.0/12"),
+        ipaddress.ip_network("::1/128"),
+    ]
+
+
+TRUSTED = parse_trusted_proxies("127.0.0.1,172.16.0.0/12")
+
+
+@pytest.mark.parametrize(
+    "peer, headers, expected",
+    [
+        (None, {}, "unknown"),
+        ("203.0.113.9", {}, "203.0.113.9"),
+        # Cabeçalhos de um cliente não confiável são ignorados
+        ("203.0.113.9", {"x-forwarded-for": "10.9.9.9"}, "203.0.113.9"),
+        ("203.0.113.9", {"x-real-ip": "10.9.9.9"}, "203.0.113.9"),
+        ("172.18.0.5", {"x-real-ip": " 198.51.100.7 "}, "198.51.100.7"),
+        # Vale o endereço mais à direita que não é de proxy
+        (
+            "172.18.0.5",
+            {"x-forwarded-for": "1.1.1.1, 198.51.100.7, 127.0.0.1"},
+            "198.51.100.7",
+        ),
+        ("127.0.0.1", {"x-forwarded-for": "127.0.0.1, 172.18.0.2"}, "127.0.0.1"),
+        ("127.0.0.1", {}, "127.0.0.1"),
+    ],
+)
+def test_client_address(peer, headers, expected):
+    assert client_address(peer, headers, TRUSTED) == expected
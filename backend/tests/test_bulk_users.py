@@ -0,0 +1,179 @@
+import pytest
+
+import app.bulk_users as bulk_users
+import app.index_rebuild as index_rebuild
+from app.bulk_users import deactivate_users, delete_users, reactivate_users
+from app.encryption import encryption_manager
+from app.groups import GroupGalleries
+from app.index_rebuild import check_consistency, compact_index
+from app.models import AccessLog, User, UserGroup
+from app.user_cache import UserMetadataCache
+from conftest import random_embeddings
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = UserMetadataCache(max_size=100)
+    monkeypatch.setattr(bulk_users, "user_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def groups(monkeypatch, gallery):
+    groups = GroupGalleries(gates={})
+    monkeypatch.setattr(bulk_users, "group_galleries", groups)
+    gallery.attach_groups(groups)
+    return groups
+
+
+@pytest.fixture
+def embeddings():
+    return random_embeddings(10)
+
+
+@pytest.fixture
+def enrolled(gallery, db, cache, groups, embeddings):
+    """Usuários 1..10 ativos, no banco (embedding criptografado) e na galeria"""
+    user_ids = list(range(1, 11))
+    faiss_ids = gallery.add_user_embeddings(embeddings, user_ids)
+    for user_id, faiss_id, embedding in zip(user_ids, faiss_ids, embeddings):
+        db.add(
+            User(
+                id=user_id,
+                name=f"U{user_id}",
+                email=f"u{user_id}@x",
+                embedding_hash=encryption_manager.encrypt_embedding(embedding),
+                faiss_id=faiss_id,
+                is_active=True,
+            )
+        )
+        cache.put(user_id, f"U{user_id}", True, 0)
+    db.commit()
+    return user_ids
+
+
+def recognized(gallery, vectors):
+    return [
+        u for u, _ in gallery.recognize_faces(list(vectors), adaptive_threshold=False)
+    ]
+
+
+def active_ids(db):
+    return sorted(row[0] for row in db.query(User.id).filter(User.is_active == True))
+
+
+def test_deactivate_users(gallery, db, cache, enrolled, embeddings):
+    report = deactivate_users(db, gallery, [2, 3, 3, 42])
+
+    assert report["deactivated"] == 2
+    assert report["removed_embeddings"] == 2
+    assert report["requested"] == 3
+    assert report["skipped_user_ids"] == [42]
+    assert active_ids(db) == [1, 4, 5, 6, 7, 8, 9, 10]
+    assert recognized(gallery, embeddings[:3]) == [1, None, None]
+    assert cache.get(2).is_active is False
+
+    # Já inativo: ignorado
+    assert deactivate_users(db, gallery, [2])["skipped_user_ids"] == [2]
+    assert check_consistency(gallery, db)["consistent"]
+
+
+def test_reactivate_users(gallery, db, cache, enrolled, embeddings):
+    deactivate_users(db, gallery, [2, 3, 4])
+
+    report = reactivate_users(db, gallery, [2, 3, 5, 42])
+
+    assert report["reactivated"] == 2
+    assert report["skipped_user_ids"] == [5, 42]
+    assert report["failed_user_ids"] == []
+    assert active_ids(db) == [1, 2, 3, 5, 6, 7, 8, 9, 10]
+    assert recognized(gallery, embeddings[1:4]) == [2, 3, None]
+    assert cache.get(3).is_active is True
+    # faiss_id no banco aponta para a entrada nova da galeria
+    faiss_id = db.query(User.faiss_id).filter(User.id == 2).scalar()
+    assert faiss_id >= 10 and gallery.id_to_user[faiss_id] == 2
+    assert check_consistency(gallery, db)["consistent"]
+
+
+def test_reactivate_skips_undecryptable_embeddings(gallery, db, enrolled):
+    deactivate_users(db, gallery, [2, 3])
+    blob = bytearray(db.query(User.embedding_hash).filter(User.id == 3).scalar())
+    blob[-1] ^= 0x01
+    db.query(User).filter(User.id == 3).update({User.embedding_hash: bytes(blob)})
+    db.commit()
+
+    report = reactivate_users(db, gallery, [2, 3])
+
+    assert report["reactivated"] == 1
+    assert report["failed_user_ids"] == [3]
+    assert 3 not in active_ids(db)
+    assert 3 not in gallery.user_to_faiss
+
+
+def test_reactivate_rolls_back_gallery_when_commit_fails(
+    gallery, db, enrolled, embeddings, monkeypatch
+):
+    deactivate_users(db, gallery, [2, 3])
+    mapped = dict(gallery.id_to_user)
+
+    def fail():
+        raise RuntimeError("disco cheio")
+
+    monkeypatch.setattr(db, "commit", fail)
+    with pytest.raises(RuntimeError, match="disco cheio"):
+        reactivate_users(db, gallery, [2, 3])
+    monkeypatch.undo()
+
+    assert gallery.id_to_user == mapped
+    assert recognized(gallery, embeddings[1:3]) == [None, None]
+    assert active_ids(db) == [1, 4, 5, 6, 7, 8, 9, 10]
+
+
+def test_delete_users(gallery, db, cache, groups, enrolled, embeddings):
+    groups.set_user_groups(db, gallery, 2, ["site-a"])
+    groups.set_user_groups(db, gallery, 5, ["site-a"])
+    db.add(AccessLog(user_id=2, access_granted=True, liveness_passed=True))
+    db.commit()
+
+    report = delete_users(db, gallery, [2, 42])
+
+    assert report["deleted"] == 1 and report["skipped_user_ids"] == [42]
+    assert db.query(User).filter(User.id == 2).count() == 0
+    assert db.query(UserGroup.user_id).all() == [(5,)]
+    assert groups.members == {"site-a": {5}}
+    assert db.query(AccessLog).filter(AccessLog.user_id == 2).count() == 1
+    assert recognized(gallery, embeddings[:2]) == [1, None]
+    assert cache.get(2) is None
+    assert check_consistency(gallery, db)["consistent"]
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8"])
+def test_compact_index_drops_tombstones(
+    gallery, db, session_factory, enrolled, embeddings
+):
+    deactivate_users(db, gallery, [1, 2, 3, 4])
+    reactivate_users(db, gallery, [4])
+    assert gallery.faiss_index.ntotal == 11
+
+    report = compact_index(gallery, session_factory, min_tombstone_ratio=0.3)
+
+    assert report["compacted"] is True
+    assert report["removed_tombstones"] == 4
+    assert gallery.faiss_index.ntotal == 7
+    db.expire_all()
+    assert check_consistency(gallery, db)["consistent"]
+    assert recognized(gallery, embeddings[2:6]) == [None, 4, 5, 6]
+
+
+def test_compact_index_skips_below_threshold_or_when_busy(
+    gallery, db, session_factory, enrolled
+):
+    deactivate_users(db, gallery, [1])
+
+    report = compact_index(gallery, session_factory, min_tombstone_ratio=0.3)
+    assert report == {"compacted": False, "index_total": 10, "tombstones": 1}
+
+    with index_rebuild._rebuild_lock:
+        report = compact_index(gallery, session_factory, min_tombstone_ratio=0)
+    assert report["compacted"] is False and "reason" in report
+    assert gallery.faiss_index.ntotal == 10
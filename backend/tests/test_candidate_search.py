@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from conftest import random_embeddings
+
+
+def brute_force(gallery, query, k):
+    """Top-k usuários pela melhor similaridade entre os templates ativos"""
+    snapshot = gallery.snapshot
+    faiss_ids = np.array(sorted(snapshot.id_to_user))
+    similarities = gallery.get_vectors(faiss_ids, snapshot) @ query
+    best = {}
+    for faiss_id, similarity in zip(faiss_ids, similarities):
+        user_id = snapshot.id_to_user[int(faiss_id)]
+        best[user_id] = max(best.get(user_id, -np.inf), float(similarity))
+    return sorted(best.items(), key=lambda item: -item[1])[:k]
+
+
+@pytest.fixture
+def queries():
+    return random_embeddings(4, seed=1)
+
+
+@pytest.fixture
+def populated(gallery, queries):
+    rng = np.random.default_rng(2)
+    embeddings, user_ids = [random_embeddings(300, seed=3)], list(range(1, 301))
+    # Vizinhos mais próximos de cada consulta: vários templates do mesmo
+    # usuário e usuários que serão removidos (tombstones no topo do índice)
+    for q, query in enumerate(queries):
+        for n in range(12):
+            noise = rng.normal(size=query.shape).astype(np.float32) * 0.02 * (n + 1)
+            embeddings.append((query + noise)[None])
+            user_ids.append(1000 + q * 10 + n % 6)
+    gallery.add_user_embeddings(np.vstack(embeddings), user_ids)
+    gallery.remove_users([1000 + q * 10 + n for q in range(4) for n in range(0, 6, 2)])
+    gallery.remove_users(range(1, 120))
+    return gallery
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_candidates_match_brute_force(populated, queries, k):
+    results = populated.search_candidates(list(queries), k)
+
+    for query, candidates in zip(queries, results):
+        expected = brute_force(populated, query, k)
+        assert [user for user, _ in candidates] == [user for user, _ in expected]
+        np.testing.assert_allclose(
+            [s for _, s in candidates], [s for _, s in expected], atol=1e-5
+        )
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8"])
+def test_candidates_skip_tombstones_and_repeat_users(populated, queries):
+    live_users = set(populated.snapshot.id_to_user.values())
+
+    for candidates in populated.search_candidates(list(queries), 10):
+        users = [user for user, _ in candidates]
+        assert len(users) == 10
+        assert len(set(users)) == len(users)
+        assert set(users) <= live_users
+        # Os usuários removidos eram os mais próximos: não podem aparecer
+        assert all(user % 10 % 2 for user in users if user >= 1000)
+
+
+def test_candidates_when_k_exceeds_live_users(gallery):
+    gallery.add_user_embeddings(random_embeddings(6), [1, 1, 2, 2, 3, 4])
+    gallery.remove_users([4])
+
+    (candidates,) = gallery.search_candidates([random_embeddings(1, seed=5)[0]], 10)
+
+    assert sorted(user for user, _ in candidates) == [1, 2, 3]
+
+
+def test_candidates_on_empty_gallery(gallery):
+    assert gallery.search_candidates([random_embeddings(1)[0]], 5) == [[]]
+    assert gallery.search_candidates([], 5) == []
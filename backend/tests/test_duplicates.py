@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from app.duplicates import (
+    UnionFind,
+    find_duplicate_clusters,
+    find_enrollment_duplicate,
+)
+from conftest import random_embeddings
+
+
+def test_union_find_groups_transitive_pairs():
+    clusters = UnionFind()
+    for a, b in [(1, 2), (3, 4), (2, 5), (5, 1), (6, 6)]:
+        clusters.union(a, b)
+
+    groups = sorted(sorted(group) for group in clusters.groups())
+
+    assert groups == [[1, 2, 5], [3, 4], [6]]
+    assert clusters.find(5) == clusters.find(1)
+    assert clusters.size[clusters.find(1)] == 3
+
+
+def test_union_find_long_chain_keeps_one_root():
+    clusters = UnionFind()
+    for item in range(1000):
+        clusters.union(item, item + 1)
+
+    assert len({clusters.find(item) for item in range(1001)}) == 1
+    assert clusters.size[clusters.find(0)] == 1001
+
+
+def near(vector, seed, scale=0.01):
+    noise = np.random.default_rng(seed).normal(size=vector.shape) * scale
+    moved = (vector + noise).astype(np.float32)
+    return moved / np.linalg.norm(moved)
+
+
+@pytest.fixture
+def populated(gallery):
+    base = random_embeddings(20)
+    embeddings = list(base) + [
+        near(base[0], 1),  # 100 e 101: mesma pessoa que o usuário 1
+        near(base[0], 2),
+        near(base[1], 3),  # segundo template do usuário 2 (não é duplicado)
+        near(base[4], 4),  # 104: duplicado do usuário 5, removido depois
+        near(base[9], 5),  # 109 e 110: mesma pessoa que o usuário 10
+        near(near(base[9], 5), 6),
+    ]
+    user_ids = list(range(1, 21)) + [100, 101, 2, 104, 109, 110]
+    gallery.add_user_embeddings(np.vstack(embeddings), user_ids)
+    gallery.remove_users([104])
+    return gallery
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 2048])
+def test_duplicate_clusters(populated, batch_size):
+    report = find_duplicate_clusters(
+        populated, min_similarity=0.9, batch_size=batch_size
+    )
+
+    assert report["gallery_size"] == 25
+    assert sorted(c["user_ids"] for c in report["clusters"]) == [
+        [1, 100, 101],
+        [10, 109, 110],
+    ]
+    assert report["duplicate_pairs"] == 6
+    for cluster in report["clusters"]:
+        similarities = [pair["similarity"] for pair in cluster["pairs"]]
+        assert similarities == sorted(similarities, reverse=True)
+        assert cluster["max_similarity"] == similarities[0] >= 0.9
+
+
+def test_duplicate_clusters_batching_is_consistent(populated):
+    reports = [
+        find_duplicate_clusters(populated, min_similarity=0.9, batch_size=size)
+        for size in (1, 3, 2048)
+    ]
+
+    assert all(r["clusters"] == reports[0]["clusters"] for r in reports[1:])
+
+
+def test_no_clusters_on_distinct_gallery(gallery):
+    gallery.add_user_embeddings(random_embeddings(10), range(1, 11))
+
+    report = find_duplicate_clusters(gallery, min_similarity=0.9)
+
+    assert report["clusters"] == [] and report["duplicate_pairs"] == 0
+
+
+def test_enrollment_duplicate(populated):
+    base = random_embeddings(20)
+
+    user_id, similarity = find_enrollment_duplicate(
+        populated, near(base[6], 7), min_similarity=0.9
+    )
+    assert user_id == 7 and similarity >= 0.9
+    # O cadastro removido (104) não conta: o mais próximo é o usuário 5
+    user_id, _ = find_enrollment_duplicate(
+        populated, near(base[4], 8), min_similarity=0.9
+    )
+    assert user_id == 5
+    assert (
+        find_enrollment_duplicate(
+            populated, random_embeddings(1, seed=9)[0], min_similarity=0.9
+        )
+        is None
+    )
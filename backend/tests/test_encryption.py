@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+import app.encryption as encryption
+from app.database import migrate_embeddings
+from app.encryption import EMBEDDING_DIMENSION, EncryptionManager
+
+
+@pytest.fixture
+def manager():
+    return EncryptionManager()
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(5, EMBEDDING_DIMENSION)).astype(np.float32)
+
+
+@pytest.mark.parametrize("storage_dtype", ["float32", "float16"])
+def test_round_trip(manager, vectors, monkeypatch, storage_dtype):
+    monkeypatch.setattr(encryption, "EMBEDDING_STORAGE_DTYPE", storage_dtype)
+    blob = manager.encrypt_embedding(vectors[0])
+
+    decrypted = manager.decrypt_embedding(blob)
+
+    assert decrypted.dtype == np.float32
+    tolerance = 1e-6 if storage_dtype == "float32" else 1e-2
+    np.testing.assert_allclose(decrypted, vectors[0], atol=tolerance)
+    assert not manager.is_legacy_embedding(blob)
+
+
+def test_bulk_decrypt_matches_single_decrypt(manager, vectors, monkeypatch):
+    blobs = [manager.encrypt_embedding(v) for v in vectors[:3]]
+    # Mistura de dtypes e formato legado força o caminho linha a linha
+    monkeypatch.setattr(encryption, "EMBEDDING_STORAGE_DTYPE", "float16")
+    blobs.append(manager.encrypt_embedding(vectors[3]))
+    blobs.append(manager.encrypt_data(str(vectors[4].tolist())))
+
+    fast = manager.decrypt_embeddings(blobs[:3])
+    mixed = manager.decrypt_embeddings(blobs)
+
+    assert fast.shape == (3, EMBEDDING_DIMENSION)
+    np.testing.assert_array_equal(fast, vectors[:3])
+    for row, blob in zip(mixed, blobs):
+        np.testing.assert_array_equal(row, manager.decrypt_embedding(blob))
+    assert manager.decrypt_embeddings([]).shape == (0, EMBEDDING_DIMENSION)
+
+
+def test_corrupted_blob_is_rejected(manager, vectors):
+    blob = bytearray(manager.encrypt_embedding(vectors[0]))
+    blob[40] ^= 0x01
+
+    with pytest.raises(ValueError):
+        manager.decrypt_embedding(bytes(blob))
+    with pytest.raises(ValueError):
+        manager.decrypt_embeddings([manager.encrypt_embedding(vectors[1]), bytes(blob)])
+
+
+def test_truncated_and_wrong_size_blobs_are_rejected(manager, vectors):
+    blob = manager.encrypt_embedding(vectors[0])
+    with pytest.raises(ValueError, match="truncado"):
+        manager.decrypt_embedding(blob[:20])
+
+    # Autêntico, mas com outra dimensão: no lote deslocaria os vetores seguintes
+    short = manager.encrypt_embedding(vectors[0][:100])
+    with pytest.raises(ValueError, match="tamanho inválido"):
+        manager.decrypt_embeddings([blob, short, blob])
+
+
+def test_legacy_embedding(manager, vectors):
+    legacy = manager.encrypt_data(str(vectors[0].tolist()))
+
+    assert manager.is_legacy_embedding(legacy)
+    assert manager.is_legacy_embedding(legacy.encode("ascii"))
+    np.testing.assert_allclose(manager.decrypt_embedding(legacy), vectors[0])
+    np.testing.assert_allclose(
+        manager.decrypt_legacy_embedding(legacy.encode("ascii")), vectors[0]
+    )
+
+    summarized = manager.encrypt_data("[0.1, 0.2, ..., 0.3]")
+    with pytest.raises(ValueError):
+        manager.decrypt_legacy_embedding(summarized)
+
+
+def test_migrate_embeddings_converts_only_legacy_rows(engine, vectors):
+    manager = encryption.encryption_manager
+    binary = manager.encrypt_embedding(vectors[1])
+    with engine.begin() as conn:
+        insert = text(
+            "INSERT INTO users (id, name, email, embedding_hash, faiss_id, is_active) "
+            "VALUES (:id, :name, :email, :embedding, 0, 1)"
+        )
+        conn.execute(
+            insert,
+            [
+                {
+                    "id": 1,
+                    "name": "legado",
+                    "email": "a@x",
+                    "embedding": manager.encrypt_data(str(vectors[0].tolist())),
+                },
+                {"id": 2, "name": "binário", "email": "b@x", "embedding": binary},
+                {
+                    "id": 3,
+                    "name": "ilegível",
+                    "email": "c@x",
+                    "embedding": manager.encrypt_data("[1.0, ..., 2.0]"),
+                },
+            ],
+        )
+
+    assert migrate_embeddings(batch_size=1, bind=engine) == 1
+
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text("SELECT id, embedding_hash FROM users")).all())
+    np.testing.assert_array_equal(manager.decrypt_embedding(rows[1]), vectors[0])
+    assert rows[2] == binary
+    assert manager.is_legacy_embedding(rows[3])
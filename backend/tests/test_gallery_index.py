@@ -0,0 +1,160 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+from app.gallery_index import (
+    FullPrecisionStore,
+    create_index,
+    index_type_of,
+    range_search_index,
+    search_index,
+)
+
+DIM = 64
+
+
+def normalized(rng, rows):
+    vectors = rng.normal(size=(rows, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def corpus():
+    return normalized(np.random.default_rng(0), 500)
+
+
+@pytest.fixture
+def queries(corpus):
+    # Consultas próximas de vetores da galeria, como numa validação real
+    noise = normalized(np.random.default_rng(1), 8) * 0.6
+    mixed = corpus[:8] + noise
+    return mixed / np.linalg.norm(mixed, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(tmp_path, corpus):
+    store = FullPrecisionStore(tmp_path / "vectors.f32", dim=DIM)
+    store.append(corpus)
+    return store
+
+
+def sq8_index(corpus):
+    index = create_index("sq8", dim=DIM)
+    index.add(corpus)
+    return index
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8", "fp16"])
+def test_create_index_types(index_type):
+    assert index_type_of(create_index(index_type, dim=DIM)) == index_type
+
+
+def test_create_index_rejects_unknown_type():
+    with pytest.raises(ValueError):
+        create_index("ivf", dim=DIM)
+
+
+def test_store_append_truncate_reset(tmp_path, corpus):
+    store = FullPrecisionStore(tmp_path / "vectors.f32", dim=DIM)
+    assert len(store) == 0
+
+    store.append(corpus[:10])
+    store.append(corpus[10:20])
+    assert len(store) == 20
+    np.testing.assert_array_equal(store.get([0, 15]), corpus[[0, 15]])
+
+    store.truncate(12)
+    assert len(store) == 12
+    assert len(FullPrecisionStore(tmp_path / "vectors.f32", dim=DIM)) == 12
+
+    store.reset(corpus[30:33])
+    np.testing.assert_array_equal(store.get([0, 1, 2]), corpus[30:33])
+    store.reset()
+    assert len(store) == 0
+
+
+def test_rerank_returns_exact_similarities(corpus, queries, store):
+    index = sq8_index(corpus)
+
+    similarities, ids = search_index(index, queries, 10, store=store, rerank_factor=4)
+
+    assert ids.shape == (len(queries), 10)
+    for query, row_ids, row_similarities in zip(queries, ids, similarities):
+        np.testing.assert_allclose(row_similarities, corpus[row_ids] @ query, atol=1e-5)
+        assert np.all(np.diff(row_similarities) <= 0)
+
+
+def test_rerank_over_all_candidates_matches_flat_top_k(corpus, queries, store):
+    flat = create_index("flat", dim=DIM)
+    flat.add(corpus)
+    expected_similarities, expected_ids = flat.search(queries, 5)
+
+    similarities, ids = search_index(
+        sq8_index(corpus), queries, 5, store=store, rerank_factor=len(corpus)
+    )
+
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_allclose(similarities, expected_similarities, atol=1e-5)
+
+
+def test_search_with_k_above_ntotal_and_empty_index(corpus, store):
+    index = sq8_index(corpus[:3])
+
+    similarities, ids = search_index(index, corpus[:1], 10, store=store)
+    assert sorted(ids[0]) == [0, 1, 2]
+    assert ids[0][0] == 0
+
+    similarities, ids = search_index(create_index("sq8", dim=DIM), corpus[:2], 5)
+    assert ids.shape == (2, 0) and similarities.shape == (2, 0)
+
+
+def test_range_search_cuts_exactly_at_min_similarity(corpus, queries, store):
+    index = sq8_index(corpus)
+    exact = queries @ corpus.T
+    # Limiar no meio de um intervalo entre similaridades reais: o conjunto
+    # esperado não depende do arredondamento do produto interno
+    ordered = np.sort(exact[0])[::-1]
+    min_similarity = float((ordered[20] + ordered[21]) / 2)
+
+    results = range_search_index(index, queries, min_similarity, store=store)
+
+    assert len(results) == len(queries)
+    for row, (ids, similarities) in zip(exact, results):
+        assert set(ids.tolist()) == set(np.flatnonzero(row >= min_similarity).tolist())
+        assert np.all(similarities >= min_similarity)
+        np.testing.assert_allclose(similarities, row[ids], atol=1e-5)
+        assert np.all(np.diff(similarities) <= 0)
+
+
+def test_range_search_margin_recovers_quantization_misses(corpus, store):
+    index = sq8_index(corpus)
+    queries = corpus[:10]
+    exact = queries @ corpus.T
+    ordered = np.sort(exact, axis=1)[:, ::-1]
+    # Limiares entre vizinhos consecutivos: sem depender de arredondamento
+    thresholds = (ordered[:, 1:40] + ordered[:, 2:41]) / 2
+
+    missed = 0
+    for i, j in product(range(len(queries)), range(thresholds.shape[1])):
+        query, row, min_similarity = queries[i], exact[i], thresholds[i, j]
+        expected = set(np.flatnonzero(row >= min_similarity).tolist())
+        with_margin, _ = range_search_index(
+            index, query[None], float(min_similarity), store=store
+        )[0]
+        without_margin, _ = range_search_index(
+            index, query[None], float(min_similarity), store=store, margin=0.0
+        )[0]
+        assert set(with_margin.tolist()) == expected
+        assert set(without_margin.tolist()) <= expected
+        missed += len(expected) - len(without_margin)
+
+    # Sem margem o raio do sq8 perde vizinhos que a re-ordenação aceitaria
+    assert missed > 0
+
+
+def test_range_search_on_empty_index():
+    results = range_search_index(
+        create_index("flat", dim=DIM), np.zeros((2, DIM), np.float32), 0.5
+    )
+    assert [len(ids) for ids, _ in results] == [0, 0]
@@ -0,0 +1,164 @@
+import threading
+
+import faiss
+import numpy as np
+import pytest
+
+import app.face_recognition as face_recognition_module
+from app.face_recognition import GalleryReplacedError
+from app.gallery_index import search_index
+from conftest import random_embeddings
+
+
+def assert_consistent(snapshot):
+    """``user_to_faiss`` é exatamente o inverso de ``id_to_user``"""
+    inverse = {}
+    for faiss_id, user_id in snapshot.id_to_user.items():
+        inverse.setdefault(user_id, set()).add(faiss_id)
+    assert {u: set(ids) for u, ids in snapshot.user_to_faiss.items()} == inverse
+    assert all(ids for ids in snapshot.user_to_faiss.values())
+    assert all(0 <= f < snapshot.index.ntotal for f in snapshot.id_to_user)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8"])
+def test_add_and_remove_keep_mappings_consistent(gallery):
+    vectors = random_embeddings(12)
+
+    assert gallery.add_user_embedding(vectors[0], 1) == 0
+    assert gallery.add_user_embeddings(vectors[1:6], [2, 2, 3, 1, 4]) == [1, 2, 3, 4, 5]
+    assert_consistent(gallery.snapshot)
+    assert gallery.user_to_faiss[1] == (0, 4)
+
+    assert gallery.remove_users([2, 99]) == 2
+    gallery.remove_user_embedding(4)
+    gallery.remove_user_embedding(4)
+    assert_consistent(gallery.snapshot)
+    assert gallery.user_to_faiss == {1: (0,), 3: (3,), 4: (5,)}
+
+    # Usuário removido volta com IDs novos; os antigos seguem como tombstones
+    gallery.add_user_embeddings(vectors[6:8], [2, 2])
+    assert_consistent(gallery.snapshot)
+    assert gallery.user_to_faiss[2] == (6, 7)
+    assert gallery.faiss_index.ntotal == 8
+    if gallery.gallery_vectors is not None:
+        assert len(gallery.gallery_vectors) == 8
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8"])
+def test_published_snapshots_never_change(gallery):
+    vectors = random_embeddings(4)
+    gallery.add_user_embeddings(vectors[:2], [1, 2])
+    before = gallery.snapshot
+    frozen = (before.index.ntotal, dict(before.id_to_user), dict(before.user_to_faiss))
+
+    gallery.add_user_embedding(vectors[2], 3)
+    gallery.remove_users([1])
+    gallery.add_user_embeddings(vectors[3:], [1])
+
+    assert (
+        before.index.ntotal,
+        before.id_to_user,
+        before.user_to_faiss,
+    ) == frozen
+    _, ids = search_index(before.index, vectors[:1], 5, store=before.store)
+    assert ids[0].tolist() == [0, 1]
+    assert gallery.snapshot.index.ntotal == 4
+
+
+def test_generation_changes_only_on_renumbering(gallery):
+    vectors = random_embeddings(3)
+    generation = gallery.snapshot.generation
+
+    gallery.add_user_embeddings(vectors, [1, 2, 3])
+    gallery.remove_users([2])
+    assert gallery.snapshot.generation == generation
+
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(np.ascontiguousarray(vectors[[0, 2]]))
+    gallery.replace_index(index, {0: 1, 1: 3})
+    assert gallery.snapshot.generation == generation + 1
+    assert_consistent(gallery.snapshot)
+
+    gallery.clear_index()
+    assert gallery.snapshot.generation == generation + 2
+    assert gallery.snapshot.id_to_user == {} and gallery.user_to_faiss == {}
+
+
+def test_replace_index_replays_changes_since_snapshot(gallery):
+    vectors = random_embeddings(6)
+    gallery.add_user_embeddings(vectors[:3], [1, 2, 3])
+    since = gallery.snapshot
+    # Reconstrução compacta montada a partir de ``since``...
+    rebuilt = faiss.IndexFlatIP(vectors.shape[1])
+    rebuilt.add(np.ascontiguousarray(vectors[:3]))
+
+    # ...enquanto chegam um cadastro, um template novo e uma remoção
+    gallery.add_user_embedding(vectors[3], 4)
+    gallery.add_user_embedding(vectors[4], 1)
+    gallery.remove_users([2])
+
+    published = gallery.replace_index(rebuilt, {0: 1, 1: 2, 2: 3}, since=since)
+
+    snapshot = gallery.snapshot
+    assert_consistent(snapshot)
+    assert published is snapshot
+    assert sorted(snapshot.user_to_faiss) == [1, 3, 4]
+    assert len(snapshot.user_to_faiss[1]) == 2
+    for user_id, vector in [(1, vectors[4]), (3, vectors[2]), (4, vectors[3])]:
+        assert gallery.verify_face(vector, user_id) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_replace_index_rejects_stale_base(gallery):
+    vectors = random_embeddings(2)
+    gallery.add_user_embeddings(vectors, [1, 2])
+    since = gallery.snapshot
+    gallery.clear_index()
+
+    rebuilt = faiss.IndexFlatIP(vectors.shape[1])
+    rebuilt.add(np.ascontiguousarray(vectors))
+    with pytest.raises(GalleryReplacedError):
+        gallery.replace_index(rebuilt, {0: 1, 1: 2}, since=since)
+    assert gallery.snapshot.id_to_user == {}
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8"])
+def test_saved_gallery_is_reloaded(gallery):
+    vectors = random_embeddings(5)
+    gallery.add_user_embeddings(vectors, [1, 2, 2, 3, 4])
+    gallery.remove_users([3])
+
+    reloaded = face_recognition_module.FaceRecognitionSystem()
+
+    assert reloaded.snapshot.id_to_user == gallery.snapshot.id_to_user
+    assert reloaded.user_to_faiss == gallery.user_to_faiss
+    assert_consistent(reloaded.snapshot)
+    assert reloaded.search_candidates([vectors[2]], 1)[0][0][0] == 2
+
+
+def test_readers_see_consistent_snapshots_during_writes(gallery):
+    vectors = random_embeddings(200)
+    gallery.add_user_embeddings(vectors[:20], range(20))
+    stop, errors = threading.Event(), []
+
+    def read():
+        while not stop.is_set():
+            try:
+                snapshot = gallery.snapshot
+                assert_consistent(snapshot)
+                search_index(snapshot.index, vectors[:4], 5, store=snapshot.store)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for i in range(20, 200, 10):
+        gallery.add_user_embeddings(vectors[i : i + 10], range(i, i + 10))
+        gallery.remove_users(range(i - 20, i - 15))
+    stop.set()
+    for reader in readers:
+        reader.join(10)
+
+    assert errors == []
+    assert_consistent(gallery.snapshot)
@@ -0,0 +1,133 @@
+import faiss
+import numpy as np
+import pytest
+
+from app.groups import (
+    GroupGalleries,
+    UnknownGateError,
+    normalize_groups,
+    parse_gate_groups,
+)
+from app.models import UserGroup
+from conftest import random_embeddings
+
+
+def test_parse_gate_groups():
+    assert parse_gate_groups(" portao1=site-a, portao2 = site-b,,ruim,=x") == {
+        "portao1": "site-a",
+        "portao2": "site-b",
+    }
+
+
+def test_normalize_groups():
+    assert normalize_groups([" a", "b", "a ", "", "  ", None]) == ["a", "b"]
+
+
+def test_resolve():
+    groups = GroupGalleries(gates={"portao1": "site-a"})
+
+    assert groups.resolve(gate="portao1") == "site-a"
+    assert groups.resolve(gate="portao1", group="site-b") == "site-b"
+    assert groups.resolve() is None
+    with pytest.raises(UnknownGateError):
+        groups.resolve(gate="portao9")
+
+
+@pytest.fixture
+def embeddings():
+    return random_embeddings(6)
+
+
+@pytest.fixture
+def groups(gallery, db, embeddings):
+    groups = GroupGalleries(gates={})
+    gallery.add_user_embeddings(embeddings, [1, 2, 3, 4, 5, 5])
+    gallery.attach_groups(groups)
+    groups.set_user_groups(db, gallery, 1, ["site-a", " site-b"])
+    groups.set_user_groups(db, gallery, 2, ["site-a"])
+    groups.set_user_groups(db, gallery, 5, ["site-b"])
+    return groups
+
+
+def recognize(gallery, vectors, group):
+    return [
+        user_id
+        for user_id, _ in gallery.recognize_faces(
+            list(vectors), adaptive_threshold=False, group=group
+        )
+    ]
+
+
+def test_group_search_only_sees_members(gallery, db, groups, embeddings):
+    assert recognize(gallery, embeddings, "site-a") == [1, 2, None, None, None, None]
+    assert recognize(gallery, embeddings, "site-b") == [1, None, None, None, 5, 5]
+    assert recognize(gallery, embeddings, "site-c") == [None] * 6
+    assert recognize(gallery, embeddings[2:4], None) == [3, 4]
+
+    assert db.query(UserGroup).filter(UserGroup.user_id == 1).count() == 2
+    assert {s["name"]: s["vectors"] for s in groups.stats()} == {
+        "site-a": 2,
+        "site-b": 3,
+    }
+
+
+def test_group_membership_changes(gallery, db, groups, embeddings):
+    groups.set_user_groups(db, gallery, 1, ["site-b"])
+    groups.set_user_groups(db, gallery, 2, [])
+    groups.forget_users(db, gallery, [5])
+
+    assert recognize(gallery, embeddings, "site-a") == [None] * 6
+    assert recognize(gallery, embeddings, "site-b")[:2] == [1, None]
+    assert groups.user_groups(1) == ["site-b"]
+    assert "site-a" not in groups.members
+    assert db.query(UserGroup).count() == 1
+
+
+def test_removed_and_added_templates_refresh_groups(gallery, groups, embeddings):
+    gallery.remove_users([2])
+    assert recognize(gallery, embeddings[:2], "site-a") == [1, None]
+
+    gallery.add_user_embedding(embeddings[1], 2)
+    assert recognize(gallery, embeddings[:2], "site-a") == [1, 2]
+
+
+def test_search_drops_results_on_generation_mismatch(gallery, groups, embeddings):
+    old = gallery.snapshot
+
+    similarities, ids = groups.search("site-a", embeddings[:1], 5, old.generation)
+    assert ids.shape == (1, 2)
+
+    # Reconstrução renumera os IDs (ordem invertida) e remonta os sub-índices
+    reordered = faiss.IndexFlatIP(embeddings.shape[1])
+    reordered.add(np.ascontiguousarray(embeddings[::-1]))
+    gallery.replace_index(reordered, {0: 5, 1: 5, 2: 4, 3: 3, 4: 2, 5: 1})
+
+    similarities, ids = groups.search("site-a", embeddings[:1], 5, old.generation)
+    assert ids.shape == (1, 0) and similarities.shape == (1, 0)
+    assert recognize(gallery, embeddings, "site-a") == [1, 2, None, None, None, None]
+
+
+def test_stale_subindexes_are_not_used_until_rebuilt(gallery, groups, embeddings):
+    # Renumeração sem remontar os sub-índices (ex.: grupos desligados)
+    gallery.attach_groups(None)
+    reordered = faiss.IndexFlatIP(embeddings.shape[1])
+    reordered.add(np.ascontiguousarray(embeddings[::-1]))
+    gallery.replace_index(reordered, {0: 5, 1: 5, 2: 4, 3: 3, 4: 2, 5: 1})
+    gallery.attach_groups(groups)
+
+    # IDs antigos apontariam para outros usuários: nenhum resultado
+    assert recognize(gallery, embeddings, "site-a") == [None] * 6
+
+    groups.rebuild(gallery)
+    assert recognize(gallery, embeddings, "site-a")[:2] == [1, 2]
+
+
+def test_load_reads_memberships(gallery, db, groups, embeddings):
+    loaded = GroupGalleries(gates={})
+    loaded.load(db, gallery)
+
+    assert loaded.members == {"site-a": {1, 2}, "site-b": {1, 5}}
+    similarities, ids = loaded.search(
+        "site-b", embeddings[4:5], 5, gallery.snapshot.generation
+    )
+    assert sorted(ids[0]) == [0, 4, 5]
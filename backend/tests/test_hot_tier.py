@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.hot_tier import HotTier
+from app.models import AccessLog, User
+
+
+def axis(*weights):
+    """Vetor unitário com os pesos dados nos primeiros eixos"""
+    vector = np.zeros(512, dtype=np.float32)
+    vector[: len(weights)] = weights
+    return vector / np.linalg.norm(vector)
+
+
+E0, E1, E2 = axis(1), axis(0, 1), axis(0, 0, 1)
+
+
+@pytest.fixture
+def hot_tier():
+    return HotTier(capacity=10, min_similarity=0.8, min_gap=0.1)
+
+
+def build(gallery, hot_tier, embeddings, user_ids, hot_users=None):
+    gallery.add_user_embeddings(np.vstack(embeddings), user_ids)
+    hot_tier.build(gallery, hot_users or sorted(set(user_ids)))
+
+
+def test_confident_hit(gallery, hot_tier):
+    build(gallery, hot_tier, [E0, E1, E2], [1, 2, 3])
+
+    (decision,) = hot_tier.identify(E0[None], gallery.snapshot)
+
+    assert decision[0] == 1
+    assert decision[1] == pytest.approx(0.0, abs=1e-6)
+    assert hot_tier.stats()["hits"] == 1
+
+
+def test_low_similarity_falls_through(gallery, hot_tier):
+    build(gallery, hot_tier, [E0, E1], [1, 2])
+
+    # Similaridade ~0.707 com o usuário 1, abaixo de min_similarity
+    assert hot_tier.identify(axis(1, 0, 0, 1)[None], gallery.snapshot) == [None]
+    assert hot_tier.stats()["fallthroughs"] == 1
+
+
+def test_ambiguous_match_falls_through(gallery, hot_tier):
+    # Usuário 4 a ~0.96 da consulta: folga de ~0.04 para o usuário 1
+    build(gallery, hot_tier, [E0, axis(1, 0, 0, 0.3), E1], [1, 4, 2])
+
+    assert hot_tier.identify(E0[None], gallery.snapshot) == [None]
+
+
+def test_gap_ignores_templates_of_the_same_user(gallery, hot_tier):
+    build(gallery, hot_tier, [E0, axis(1, 0, 0, 0, 0.1), E1], [1, 1, 2])
+
+    (decision,) = hot_tier.identify(E0[None], gallery.snapshot, k=5)
+
+    assert decision is not None and decision[0] == 1
+
+
+def test_gap_without_other_user_is_measured_against_kth_neighbor(gallery, hot_tier):
+    build(gallery, hot_tier, [E0, axis(1, 0, 0, 0, 0.1), E1], [1, 1, 2], [1])
+
+    # Só templates do usuário 1 entre os vizinhos: o k-ésimo (~0.995) é a
+    # referência, então não há folga suficiente
+    assert hot_tier.identify(E0[None], gallery.snapshot, k=5) == [None]
+
+    hot_tier.build(gallery, [1, 2])
+    assert hot_tier.identify(E0[None], gallery.snapshot, k=2) == [None]
+    assert hot_tier.identify(E0[None], gallery.snapshot, k=3)[0][0] == 1
+
+
+def test_removed_users_are_ignored_until_rebuild(gallery, hot_tier):
+    build(gallery, hot_tier, [E0, axis(1, 0, 0, 0.3), E1], [1, 4, 2])
+    gallery.remove_users([4])
+
+    (decision,) = hot_tier.identify(E0[None], gallery.snapshot)
+
+    assert decision is not None and decision[0] == 1
+    assert hot_tier.stats()["vectors"] == 3
+
+
+def test_generation_mismatch_falls_through(gallery, hot_tier):
+    build(gallery, hot_tier, [E0, E1], [1, 2])
+    renumbered = gallery.snapshot._replace(generation=gallery.snapshot.generation + 1)
+
+    assert hot_tier.identify(E0[None], renumbered) == [None]
+
+
+def test_recognize_faces_skips_full_search_on_hot_hit(gallery, hot_tier, monkeypatch):
+    gallery.add_user_embeddings(np.vstack([E0, E1, E2]), [1, 2, 3])
+    gallery.attach_hot_tier(hot_tier)
+    hot_tier.build(gallery, [1, 3])
+    searched = []
+    full_search = gallery._search
+
+    def search(snapshot, queries, k):
+        searched.append(len(queries))
+        return full_search(snapshot, queries, k)
+
+    monkeypatch.setattr(gallery, "_search", search)
+
+    decisions = gallery.recognize_faces([E0, E1], adaptive_threshold=False)
+
+    assert [user for user, _ in decisions] == [1, 2]
+    # Só a face que não é da galeria quente vai para a busca completa
+    assert searched == [1]
+
+
+def test_select_users_prefers_recent_passages(db):
+    now = datetime(2026, 1, 10)
+    for user_id, passages, active in [
+        (1, 50, True),
+        (2, 5, True),
+        (3, 0, True),
+        (4, 80, False),
+        (5, 10, True),
+    ]:
+        db.add(
+            User(
+                id=user_id,
+                name=f"U{user_id}",
+                email=f"u{user_id}@x",
+                embedding_hash=b"x",
+                faiss_id=0,
+                passage_count=passages,
+                is_active=active,
+            )
+        )
+    logs = [(3, 1), (3, 2), (3, 6), (5, 1), (5, 3), (2, 1), (4, 1), (1, 30)]
+    for user_id, days_ago in logs:
+        db.add(
+            AccessLog(
+                user_id=user_id,
+                access_granted=True,
+                liveness_passed=True,
+                timestamp=now - timedelta(days=days_ago),
+            )
+        )
+    db.add(AccessLog(user_id=5, access_granted=False, liveness_passed=True))
+    db.commit()
+
+    # Recentes (3, 5, 2) antes de passage_count (1); inativo (4) nunca entra
+    assert HotTier(capacity=10, recent_days=7).select_users(db, now) == [3, 5, 2, 1]
+    assert HotTier(capacity=2, recent_days=7).select_users(db, now) == [3, 5]
@@ -0,0 +1,69 @@
+import importlib.util
+
+import pytest
+
+from app.encryption import encryption_manager
+from app.index_rebuild import check_consistency, rebuild_index, update_faiss_ids
+from app.models import User
+from conftest import random_embeddings
+
+
+@pytest.fixture
+def users(db):
+    embeddings = random_embeddings(7)
+    for user_id, embedding in enumerate(embeddings, start=1):
+        db.add(
+            User(
+                id=user_id,
+                name=f"U{user_id}",
+                email=f"u{user_id}@x",
+                embedding_hash=encryption_manager.encrypt_embedding(embedding),
+                faiss_id=0,
+                is_active=user_id != 7,
+            )
+        )
+    db.commit()
+    return embeddings
+
+
+# Workers do pool ("spawn") reimportam o config, que pode ser o da raiz (torch)
+spawn_workers = pytest.param(
+    2,
+    marks=pytest.mark.skipif(
+        importlib.util.find_spec("torch") is None, reason="torch não instalado"
+    ),
+)
+
+
+@pytest.mark.parametrize("workers", [1, spawn_workers])
+def test_rebuild_index_from_db(gallery, db, session_factory, users, workers):
+    report = rebuild_index(gallery, session_factory, chunk_size=2, workers=workers)
+
+    assert report["indexed_users"] == 6 and report["failed_users"] == []
+    assert sorted(gallery.user_to_faiss) == [1, 2, 3, 4, 5, 6]
+    db.expire_all()
+    assert check_consistency(gallery, db)["consistent"]
+    (candidates,) = gallery.search_candidates([users[3]], 1)
+    assert candidates[0][0] == 4
+
+
+def test_rebuild_index_deactivates_unreadable_users(
+    gallery, db, session_factory, users
+):
+    db.query(User).filter(User.id == 2).update({User.embedding_hash: b"\x01" * 40})
+    db.commit()
+
+    report = rebuild_index(gallery, session_factory, workers=1, deactivate_failed=True)
+
+    assert report["failed_users"] == [2] and report["failed_users_deactivated"]
+    db.expire_all()
+    assert db.get(User, 2).is_active is False
+    assert check_consistency(gallery, db)["consistent"]
+
+
+def test_update_faiss_ids_keeps_latest_template(db, session_factory, users):
+    update_faiss_ids(session_factory, {1: (0, 4), 2: (2,)}, batch_size=1)
+
+    db.expire_all()
+    assert db.get(User, 1).faiss_id == 4
+    assert db.get(User, 2).faiss_id == 2
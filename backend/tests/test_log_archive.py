@@ -0,0 +1,128 @@
+import gzip
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.log_archive as log_archive
+from app.log_archive import AccessLogArchiver
+from app.models import AccessLog, User
+
+NOW = datetime(2024, 3, 10, 12, 0, 0)
+
+
+@pytest.fixture
+def archiver(tmp_path):
+    return AccessLogArchiver(archive_dir=tmp_path, retention_days=30, batch_size=4)
+
+
+@pytest.fixture
+def logs(db):
+    """10 logs antigos em 2 dias (além da retenção) e 3 recentes"""
+    db.add(User(id=1, name="Ana", email="ana@x", embedding_hash=b"x", faiss_id=0))
+    old_days = [NOW - timedelta(days=40), NOW - timedelta(days=35)]
+    for i in range(10):
+        db.add(
+            AccessLog(
+                user_id=1 if i % 2 else None,
+                access_granted=bool(i % 2),
+                liveness_passed=True,
+                timestamp=old_days[i % 2] + timedelta(minutes=i),
+            )
+        )
+    for i in range(3):
+        db.add(
+            AccessLog(
+                user_id=1,
+                access_granted=True,
+                liveness_passed=True,
+                timestamp=NOW - timedelta(days=1, minutes=i),
+            )
+        )
+    db.commit()
+    return db.query(AccessLog).order_by(AccessLog.id).all()
+
+
+def segment_lines(archiver):
+    lines = []
+    for segment in archiver.list_segments():
+        with gzip.open(archiver.archive_dir / segment["file"], "rt") as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+def test_archives_old_logs_into_daily_segments(archiver, session_factory, db, logs):
+    result = archiver.archive_old_logs(session_factory, now=NOW)
+
+    assert result["archived_logs"] == 10
+    assert result["segments"] == ["2024-01-30", "2024-02-04"]
+    assert [s["date"] for s in archiver.list_segments()] == result["segments"]
+    assert db.query(AccessLog).count() == 3
+
+    archived = list(archiver.iter_archived_logs())
+    assert sorted(log["id"] for log in archived) == [log.id for log in logs[:10]]
+    assert {log["user_name"] for log in archived} == {"Ana", None}
+
+    # Nada mais a arquivar: os segmentos não mudam
+    assert archiver.archive_old_logs(session_factory, now=NOW)["archived_logs"] == 0
+    assert len(segment_lines(archiver)) == 10
+
+
+def test_archived_log_filters(archiver, session_factory, logs):
+    archiver.archive_old_logs(session_factory, now=NOW)
+
+    granted = list(archiver.iter_archived_logs(access_granted=True, user_id=1))
+    assert sorted(log["id"] for log in granted) == [
+        log.id for log in logs[:10] if log.access_granted
+    ]
+
+    day = NOW - timedelta(days=35)
+    in_day = list(
+        archiver.iter_archived_logs(
+            start=day.replace(hour=0), end=day + timedelta(days=1)
+        )
+    )
+    assert {log["timestamp"][:10] for log in in_day} == {day.date().isoformat()}
+    assert len(in_day) == 5
+
+
+def test_rows_are_deleted_only_after_fsync(
+    archiver, session_factory, db, logs, monkeypatch
+):
+    def failing_fsync(fd):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(log_archive.os, "fsync", failing_fsync)
+    with pytest.raises(OSError):
+        archiver.archive_old_logs(session_factory, now=NOW)
+
+    assert db.query(AccessLog).count() == len(logs)
+
+
+def test_interrupted_run_duplicates_but_never_loses_logs(
+    archiver, session_factory, db, logs, monkeypatch
+):
+    # Segmento gravado, mas o processo cai antes do commit que remove as linhas
+    calls = {"commits": 0}
+
+    class CrashBeforeCommit:
+        def __init__(self):
+            self.session = session_factory()
+
+        def __getattr__(self, name):
+            return getattr(self.session, name)
+
+        def commit(self):
+            calls["commits"] += 1
+            raise RuntimeError("queda")
+
+    with pytest.raises(RuntimeError):
+        archiver.archive_old_logs(CrashBeforeCommit, now=NOW)
+    assert calls["commits"] == 1
+    assert db.query(AccessLog).count() == len(logs)
+
+    archiver.archive_old_logs(session_factory, now=NOW)
+
+    # O primeiro lote foi gravado duas vezes, mas a leitura não repete logs
+    assert len(segment_lines(archiver)) == 10 + archiver.batch_size
+    archived = [log["id"] for log in archiver.iter_archived_logs()]
+    assert sorted(archived) == [log.id for log in logs[:10]]
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.log_queries import (
+    LOG_FIELDS,
+    decode_cursor,
+    encode_cursor,
+    fetch_logs_page,
+    iter_csv,
+    iter_logs,
+)
+from app.models import AccessLog, User
+
+BASE_TIME = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def logs(db):
+    """30 logs de 3 usuários (e anônimos), com timestamps repetidos"""
+    db.add_all(
+        [
+            User(id=1, name="Ana", email="ana@x", embedding_hash=b"x", faiss_id=0),
+            User(id=2, name="Bia", email="bia@x", embedding_hash=b"x", faiss_id=1),
+        ]
+    )
+    for i in range(30):
+        db.add(
+            AccessLog(
+                user_id=[1, 2, None][i % 3],
+                access_granted=i % 3 != 2,
+                liveness_passed=True,
+                # Pares de logs com o mesmo timestamp: desempate pelo id
+                timestamp=BASE_TIME + timedelta(minutes=i // 2),
+            )
+        )
+    db.commit()
+    return db.query(AccessLog).all()
+
+
+def expected_order(logs):
+    return [
+        log.id for log in sorted(logs, key=lambda l: (l.timestamp, l.id), reverse=True)
+    ]
+
+
+def read_all_pages(db, limit, **filters):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page, cursor = fetch_logs_page(db, limit, cursor=cursor, **filters)
+        ids.extend(log["id"] for log in page)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+
+def test_invalid_cursor_raises_value_error():
+    with pytest.raises(ValueError):
+        decode_cursor("não-é-um-cursor")
+
+
+@pytest.mark.parametrize("limit", [1, 7, 30, 100])
+def test_pages_cover_every_log_once_in_order(db, logs, limit):
+    ids, pages = read_all_pages(db, limit)
+
+    assert ids == expected_order(logs)
+    assert pages == max(1, -(-len(logs) // limit))
+
+
+def test_filters(db, logs):
+    ids, _ = read_all_pages(db, 4, user_id=1)
+    assert ids == expected_order([log for log in logs if log.user_id == 1])
+
+    ids, _ = read_all_pages(db, 4, access_granted=False)
+    assert ids == expected_order([log for log in logs if not log.access_granted])
+
+    # Intervalo [start, end) com datetime em outro fuso
+    start = (BASE_TIME + timedelta(minutes=3)).replace(tzinfo=timezone.utc)
+    end = (
+        (BASE_TIME + timedelta(minutes=5))
+        .replace(tzinfo=timezone.utc)
+        .astimezone(timezone(timedelta(hours=-3)))
+    )
+    ids, _ = read_all_pages(db, 3, start=start, end=end)
+    assert ids == expected_order(
+        [
+            log
+            for log in logs
+            if BASE_TIME + timedelta(minutes=3)
+            <= log.timestamp
+            < BASE_TIME + timedelta(minutes=5)
+        ]
+    )
+
+
+def test_name_resolver_matches_join(db, logs):
+    joined, _ = fetch_logs_page(db, 30)
+    resolved, _ = fetch_logs_page(
+        db, 30, name_resolver=lambda ids: {1: "Ana", 2: "Bia"}
+    )
+    assert resolved == joined
+    assert {log["user_name"] for log in joined} == {"Ana", "Bia", None}
+
+
+def test_iter_logs_streams_all_filtered_logs(session_factory, logs):
+    exported = list(iter_logs(session_factory, chunk_size=4, user_id=2))
+    assert [log["id"] for log in exported] == expected_order(
+        [log for log in logs if log.user_id == 2]
+    )
+    assert {log["user_name"] for log in exported} == {"Bia"}
+
+
+def test_iter_csv_emits_header_and_all_rows(session_factory, logs):
+    chunks = list(iter_csv(iter_logs(session_factory, chunk_size=7), rows_per_chunk=8))
+    lines = "".join(chunks).splitlines()
+
+    assert lines[0] == ",".join(LOG_FIELDS)
+    assert len(lines) == 1 + len(logs)
+    assert len(chunks) == len(logs) // 8 + 1
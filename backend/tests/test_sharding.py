@@ -0,0 +1,206 @@
+import threading
+from multiprocessing import Pipe
+
+import faiss
+import numpy as np
+import pytest
+
+from app.sharding import (
+    GalleryPartition,
+    ShardError,
+    ShardedGallery,
+    serve_shard,
+    shard_for,
+)
+from conftest import random_embeddings
+
+DIM = 16
+
+
+def threaded_gallery(num_shards, connections=2, partition=GalleryPartition, dim=DIM):
+    """Shards no próprio processo: um thread por conexão, como serve_connections"""
+    lanes = [[] for _ in range(connections)]
+    for _ in range(num_shards):
+        state = partition(dim)
+        for lane in lanes:
+            parent_conn, child_conn = Pipe()
+            threading.Thread(
+                target=serve_shard, args=(child_conn, state), daemon=True
+            ).start()
+            lane.append(parent_conn)
+    return ShardedGallery(lanes)
+
+
+@pytest.fixture
+def shards():
+    shards = threaded_gallery(3)
+    yield shards
+    shards.close()
+
+
+@pytest.fixture
+def vectors():
+    return random_embeddings(400, DIM)
+
+
+@pytest.fixture
+def queries():
+    return random_embeddings(6, DIM, seed=1)
+
+
+def flat_reference(vectors, removed=()):
+    """IndexFlatIP com as mesmas posições e só os IDs ativos"""
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(DIM))
+    keep = np.setdiff1d(np.arange(len(vectors)), np.asarray(removed, dtype=np.int64))
+    index.add_with_ids(vectors[keep], keep)
+    return index
+
+
+def test_shard_for_is_stable():
+    assert [shard_for(u, 3) for u in range(6)] == [shard_for(u, 3) for u in range(6)]
+    assert {shard_for(u, 3) for u in range(100)} == {0, 1, 2}
+
+
+def test_search_matches_flat_index(shards, vectors, queries):
+    user_ids = np.arange(len(vectors)) // 2  # dois templates por usuário
+    shards.load(np.arange(200), user_ids[:200], vectors[:200])
+    shards.add_many(list(range(200, 399)), list(user_ids[200:399]), vectors[200:399])
+    shards.add(399, int(user_ids[399]), vectors[399])
+    removed = list(range(0, 400, 7))
+    shards.remove(removed)
+
+    similarities, ids = shards.search(queries, 10)
+    expected_similarities, expected_ids = flat_reference(vectors, removed).search(
+        queries, 10
+    )
+
+    assert sum(shards.sizes()) == 400 - len(removed)
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_allclose(similarities, expected_similarities, atol=1e-6)
+
+
+def test_search_with_k_above_gallery_size(shards, vectors, queries):
+    shards.load(np.arange(4), np.arange(4), vectors[:4])
+
+    similarities, ids = shards.search(queries, 10)
+
+    assert ids.shape == (len(queries), 4)
+    assert all(sorted(row) == [0, 1, 2, 3] for row in ids.tolist())
+    assert np.all(np.diff(similarities, axis=1) <= 0)
+
+
+def test_range_search_matches_flat_index(shards, vectors, queries):
+    shards.load(np.arange(400), np.arange(400), vectors)
+    shards.remove([3, 5, 8])
+
+    results = shards.range_search(queries, 0.4)
+    lims, _, expected_ids = flat_reference(vectors, [3, 5, 8]).range_search(
+        queries, float(np.nextafter(np.float32(0.4), np.float32(-1)))
+    )
+
+    for i, (ids, similarities) in enumerate(results):
+        assert sorted(ids.tolist()) == sorted(expected_ids[lims[i] : lims[i + 1]])
+        assert np.all(similarities >= 0.4)
+        assert np.all(np.diff(similarities) <= 0)
+
+
+def test_load_replaces_previous_content(shards, vectors):
+    shards.load(np.arange(100), np.arange(100), vectors[:100])
+    shards.load(np.arange(10), np.arange(10), vectors[:10])
+
+    assert sum(shards.sizes()) == 10
+    _, ids = shards.search(vectors[50:51], 1)
+    assert ids[0, 0] < 10
+
+
+def test_shard_errors_are_raised(shards):
+    with pytest.raises(ShardError, match="Comando desconhecido"):
+        shards._call({0: ("drop", ())})
+    # A lane volta para a fila mesmo após o erro
+    assert shards.sizes() == [0, 0, 0]
+
+    for lane in shards.lanes:
+        lane[1].close()
+    with pytest.raises(ShardError, match="shard 1"):
+        shards.sizes()
+
+
+class BarrierPartition(GalleryPartition):
+    """Busca que só termina quando outra busca estiver em andamento no shard"""
+
+    barrier = threading.Barrier(2, timeout=5)
+
+    def search(self, queries, k):
+        self.barrier.wait()
+        return super().search(queries, k)
+
+
+def test_concurrent_searches_run_in_parallel(vectors, queries):
+    # Com uma conexão por shard, a segunda busca esperaria a primeira e a
+    # barreira estouraria o tempo limite
+    shards = threaded_gallery(1, connections=2, partition=BarrierPartition)
+    shards.load(np.arange(50), np.arange(50), vectors[:50])
+    results, errors = [], []
+
+    def search():
+        try:
+            results.append(shards.search(queries, 5))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    shards.close()
+
+    assert errors == []
+    assert len(results) == 2
+    np.testing.assert_array_equal(results[0][1], results[1][1])
+
+
+def test_partition_remove_keeps_global_ids(vectors):
+    partition = GalleryPartition(DIM)
+    partition.add(np.array([10, 20, 30]), vectors[:3])
+
+    assert partition.remove(np.array([20, 99])) == 1
+    _, ids = partition.search(vectors[2:3], 2)
+    assert ids[0].tolist() == [30, 10]
+
+
+def test_gallery_search_with_shards_matches_local_index(gallery):
+    gallery.add_user_embeddings(random_embeddings(120), np.arange(120) // 2)
+    gallery.attach_shards(threaded_gallery(3, dim=512))
+    gallery.add_user_embeddings(random_embeddings(6, seed=3), [500, 501, 502] * 2)
+    gallery.remove_users([*range(0, 60, 3), 501])
+    queries = list(random_embeddings(4, seed=2))
+
+    try:
+        assert sum(gallery.shards.sizes()) == len(gallery.snapshot.id_to_user)
+        sharded = gallery.search_candidates(queries, 5)
+        shards, gallery.shards = gallery.shards, None
+        local = gallery.search_candidates(queries, 5)
+        gallery.shards = shards
+    finally:
+        gallery.detach_shards()
+    for sharded_row, local_row in zip(sharded, local):
+        assert [u for u, _ in sharded_row] == [u for u, _ in local_row]
+        np.testing.assert_allclose(
+            [s for _, s in sharded_row], [s for _, s in local_row], atol=1e-6
+        )
+
+
+def test_gallery_falls_back_to_local_index_when_shards_fail(gallery):
+    gallery.add_user_embeddings(random_embeddings(20), range(20))
+    queries = list(random_embeddings(2, seed=2))
+    expected = gallery.search_candidates(queries, 3)
+    shards = threaded_gallery(2, dim=512)
+    gallery.attach_shards(shards)
+
+    for lane in shards.lanes:
+        lane[0].close()
+
+    assert gallery.search_candidates(queries, 3) == expected
+    assert gallery.shards is None
+    assert "ShardError" in gallery.get_stats()["shards_error"]
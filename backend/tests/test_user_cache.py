@@ -0,0 +1,94 @@
+import pytest
+
+import app.pipeline as pipeline
+from app.models import User
+from app.user_cache import UserMetadata, UserMetadataCache
+
+
+def add_users(db, *specs):
+    for user_id, passage_count, is_active in specs:
+        db.add(
+            User(
+                id=user_id,
+                name=f"U{user_id}",
+                email=f"u{user_id}@x",
+                embedding_hash=b"x",
+                faiss_id=user_id,
+                passage_count=passage_count,
+                is_active=is_active,
+            )
+        )
+    db.commit()
+
+
+def test_lru_evicts_least_recently_used():
+    cache = UserMetadataCache(max_size=3)
+    for user_id in (1, 2, 3):
+        cache.put(user_id, f"U{user_id}", True, 0)
+
+    cache.get(1)  # 2 passa a ser o menos recente
+    cache.put(4, "U4", True, 0)
+
+    assert cache.get(2) is None
+    assert [cache.get(u) is not None for u in (1, 3, 4)] == [True, True, True]
+    assert cache.get_stats()["size"] == 3
+
+
+def test_set_active_updates_only_cached_users():
+    cache = UserMetadataCache(max_size=10)
+    cache.put(1, "U1", True, 5)
+
+    cache.set_active(1, False)
+    cache.set_active(2, False)
+
+    assert cache.get(1) == UserMetadata("U1", False, 5)
+    assert cache.get(2) is None
+
+
+def test_warm_keeps_most_frequent_active_users(db):
+    add_users(db, (1, 10, True), (2, 50, True), (3, 30, True), (4, 99, False))
+    cache = UserMetadataCache(max_size=2)
+
+    assert cache.warm(db) == 2
+    assert cache.get(1) is None
+    assert cache.get(4) is None
+
+    # O mais frequente é o último a sair da fila LRU
+    cache.put(5, "U5", True, 0)
+    assert cache.get(3) is None
+    assert cache.get(2) == UserMetadata("U2", True, 50)
+
+
+def test_get_or_load_and_get_names_fill_from_database(db):
+    add_users(db, (1, 3, True), (2, 0, False))
+    cache = UserMetadataCache(max_size=10)
+
+    assert cache.get_or_load(db, 1) == UserMetadata("U1", True, 3)
+    assert cache.get_or_load(db, 99) is None
+    assert cache.get_names(db, [1, 2, 99]) == {1: "U1", 2: "U2"}
+    assert cache.get(2) == UserMetadata("U2", False, 0)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = UserMetadataCache(max_size=10)
+    monkeypatch.setattr(pipeline, "user_cache", cache)
+    return cache
+
+
+def test_register_passage_counts_and_refreshes_cache(db, cache):
+    add_users(db, (1, 4, True))
+    cache.put(1, "nome antigo", True, 0)
+
+    assert pipeline.register_passage(db, 1) == ("U1", 5)
+    assert cache.get(1) == UserMetadata("U1", True, 5)
+
+
+def test_register_passage_drops_stale_cache_entry(db, cache):
+    # O cache ainda acha o usuário ativo, mas ele foi desativado no banco
+    add_users(db, (1, 4, False))
+    cache.put(1, "U1", True, 4)
+
+    assert pipeline.register_passage(db, 1) is None
+    assert cache.get(1) is None
+    assert db.get(User, 1).passage_count == 4
@@ -50,6 +50,9 @@ MAX_FACE_SIZE = 2000  # Tamanho máximo da face em pixels
 # Configurações de segurança
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", "facial_detect_demo_key_2024")  # Em produção, usar variável de ambiente
 AES_KEY_LENGTH = 32  # 256 bits
+EMBEDDING_STORAGE_DTYPE = os.getenv(
+    "EMBEDDING_STORAGE_DTYPE", "float32"
+)  # "float32" ou "float16" (metade do espaço)
 
 # Configurações do banco de dados
 DATABASE_URL = f"sqlite:///{DATA_DIR}/database.db"
@@ -60,6 +63,116 @@ API_PORT = 8000
 API_TITLE = "Sistema Reconhecimento Facial"
 API_VERSION = "1.0.0"
 
+# Tipo do índice FAISS: "flat" (float32 exato), "sq8" (8 bits, ~4x menos RAM)
+# ou "fp16" (~2x menos RAM). Nos comprimidos os candidatos são re-ordenados com
+# vetores float32 completos mapeados do disco (gallery_vectors.f32)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_RERANK_FACTOR = 4  # Candidatos re-ordenados = k * fator
+FAISS_SQ8_RANGE = 0.5  # Faixa [-r, r] da quantização sq8 (vetores normalizados)
+FAISS_RANGE_MARGIN = 0.02  # Folga do raio de busca em índices comprimidos
+
+# Reconstrução do índice FAISS a partir do banco
+FAISS_REBUILD_ON_START = os.getenv(
+    "FAISS_REBUILD_ON_START", "auto"
+)  # "auto" (se inconsistente), "always" ou "never"
+FAISS_REBUILD_WORKERS = int(os.getenv("FAISS_REBUILD_WORKERS", str(os.cpu_count() or 1)))
+FAISS_REBUILD_CHUNK_SIZE = 2000  # Usuários lidos/descriptografados por bloco
+# Compactação: remonta o índice só com os vetores ativos quando as remoções
+# (tombstones) passam desta fração do índice
+FAISS_COMPACT_TOMBSTONE_RATIO = float(os.getenv("FAISS_COMPACT_TOMBSTONE_RATIO", "0.3"))
+
+# Cache de metadados de usuários (caminho quente do reconhecimento)
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "100000"))  # Entradas (LRU)
+
+# Configurações de logs de acesso
+LOGS_PAGE_DEFAULT_LIMIT = 50  # Tamanho padrão da página em /api/logs
+LOGS_PAGE_MAX_LIMIT = 500  # Tamanho máximo da página em /api/logs
+LOGS_EXPORT_CHUNK_SIZE = 1000  # Registros lidos por bloco na exportação
+
+# Retenção e arquivamento de logs de acesso
+LOG_ARCHIVE_ENABLED = os.getenv("LOG_ARCHIVE_ENABLED", "true").lower() == "true"
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "90"))  # Dias na tabela
+LOG_ARCHIVE_INTERVAL_SECONDS = 3600  # Intervalo entre execuções do arquivamento
+LOG_ARCHIVE_BATCH_SIZE = 5000  # Logs movidos por transação
+LOG_ARCHIVE_DIR = LOGS_DIR / "archive"  # Segmentos diários .ndjson.gz
+
+# Controle de admissão da inferência em /api/validate
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))  # Threads de inferência
+INFERENCE_QUEUE_DEPTH = int(os.getenv("INFERENCE_QUEUE_DEPTH", "8"))  # Frames na fila
+INFERENCE_DEADLINE_SECONDS = float(os.getenv("INFERENCE_DEADLINE_SECONDS", "2.0"))
+ADMISSION_CLIENT_HEADER = "x-client-id"  # Identifica o cliente (último frame vence)
+# Proxies cujos X-Real-IP / X-Forwarded-For são aceitos (IPs ou redes, "a,b/24")
+ADMISSION_TRUSTED_PROXIES = os.getenv("ADMISSION_TRUSTED_PROXIES", "127.0.0.1,::1")
+
+# Modo multi-face em /api/validate ("multi_face": true no corpo da requisição)
+MULTI_FACE_MAX_FACES = int(os.getenv("MULTI_FACE_MAX_FACES", "5"))  # Faces por frame
+# Um AccessLog por face; desligado, só a melhor face do frame é registrada
+MULTI_FACE_LOG_EACH = os.getenv("MULTI_FACE_LOG_EACH", "true").lower() == "true"
+
+# Galeria particionada (app/sharding.py): 0 = índice único no processo da API
+GALLERY_SHARDS = int(os.getenv("GALLERY_SHARDS", "0"))  # Processos locais
+GALLERY_SHARD_ADDRESSES = os.getenv("GALLERY_SHARD_ADDRESSES", "")  # "host:porta,..."
+GALLERY_SHARD_AUTHKEY = os.getenv("GALLERY_SHARD_AUTHKEY", "")  # Shards remotos
+# Conexões com cada shard: buscas simultâneas atendidas em paralelo
+GALLERY_SHARD_CONNECTIONS = int(os.getenv("GALLERY_SHARD_CONNECTIONS", "4"))
+
+# Galeria quente (app/hot_tier.py): usuários frequentes ou vistos recentemente
+# são buscados primeiro; só misses e casos ambíguos vão à galeria completa.
+# 0 = desligada
+HOT_TIER_SIZE = int(os.getenv("HOT_TIER_SIZE", "0"))  # Usuários na galeria quente
+HOT_TIER_RECENT_DAYS = int(os.getenv("HOT_TIER_RECENT_DAYS", "7"))
+HOT_TIER_REBALANCE_SECONDS = int(os.getenv("HOT_TIER_REBALANCE_SECONDS", "3600"))
+# Acerto aceito sem consultar a galeria completa: similaridade mínima e folga
+# mínima para o segundo usuário mais parecido da galeria quente
+HOT_TIER_MIN_SIMILARITY = float(
+    os.getenv("HOT_TIER_MIN_SIMILARITY", str(1.0 - FACE_RECOGNITION_THRESHOLD_STRICT))
+)
+HOT_TIER_MIN_GAP = float(os.getenv("HOT_TIER_MIN_GAP", "0.1"))
+
+# Grupos de usuários (app/groups.py): /api/validate com "group" (ou "gate")
+# busca só os usuários do grupo. Portões mapeados em "portao1=sede,portao2=filial";
+# streams de câmera usam o próprio stream_id como portão
+GATE_GROUPS = os.getenv("GATE_GROUPS", "")
+
+# Cadastros duplicados (mesma face com outro usuário)
+# "reject" recusa o cadastro, "warn" cadastra e avisa, "off" não verifica
+DUPLICATE_ENROLLMENT_POLICY = os.getenv("DUPLICATE_ENROLLMENT_POLICY", "warn")
+DUPLICATE_SIMILARITY_THRESHOLD = 1.0 - FACE_RECOGNITION_THRESHOLD  # Mesma pessoa
+DUPLICATE_BATCH_SIZE = 2048  # Lado do bloco de similaridades na auto-junção
+
+# Verificação 1:1 (/api/verify): distância máxima ao template do usuário informado
+VERIFY_THRESHOLD = FACE_RECOGNITION_THRESHOLD
+
+# Busca de candidatos (/api/search)
+SEARCH_MAX_K = 50  # Candidatos por consulta
+SEARCH_MAX_QUERIES = 16  # Embeddings ou imagens por requisição
+
+# Streams de câmera processados pelo backend (RTSP ou arquivo de vídeo)
+STREAM_SOURCES = os.getenv("STREAM_SOURCES", "")  # "portao1=rtsp://...,portao2=..."
+STREAM_DEFAULT_FPS = float(os.getenv("STREAM_DEFAULT_FPS", "2.0"))  # Frames analisados/s
+STREAM_EVENT_COOLDOWN_SECONDS = 5.0  # Intervalo mínimo entre logs da mesma pessoa
+STREAM_RECONNECT_SECONDS = 5.0  # Espera antes de reconectar a um stream perdido
+
+# Logging da aplicação: mensagens por frame ficam em DEBUG (desligadas por padrão)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" ou "json"
+LOG_QUEUE_SIZE = 10000  # Registros pendentes antes de descartar
+
+# Observabilidade (endpoint /metrics no formato Prometheus)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Detalhamento por etapa em /api/validate e /api/register (header Server-Timing
+# e campo "timings"): sempre, ou só nas requisições com o header de debug = 1
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+SERVER_TIMING_HEADER = "x-debug-timings"
+
+# Endpoints administrativos (profiling, POST/DELETE /api/streams) exigem o header
+# X-Admin-Token igual a ADMIN_TOKEN (sem token configurado, negam tudo)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Profiling sob demanda (/api/admin/*): desligado por padrão
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_MAX_SECONDS = 120  # Duração máxima da amostragem
+PROFILING_MAX_REQUESTS = 1000  # Máximo de requisições perfiladas por sessão
+
 # Configurações de upload
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
@@ -18,6 +18,23 @@ interface ValidationStatus {
   message?: string;
 }
 
+// Identificador estável do terminal, enviado em X-Client-Id: o backend usa
+// para descartar frames antigos do mesmo cliente ainda na fila de inferência
+const CLIENT_ID_STORAGE_KEY = 'facial-detect-client-id';
+
+function getClientId(): string {
+  let clientId = window.localStorage.getItem(CLIENT_ID_STORAGE_KEY);
+  if (!clientId) {
+    // crypto.randomUUID só existe em contexto seguro (HTTPS ou localhost)
+    clientId =
+      typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function'
+        ? crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    window.localStorage.setItem(CLIENT_ID_STORAGE_KEY, clientId);
+  }
+  return clientId;
+}
+
 interface ValidationPanelProps {
   videoRef: React.RefObject<HTMLVideoElement>;
   canvasRef: React.RefObject<HTMLCanvasElement>;
@@ -104,6 +121,7 @@ export function ValidationPanel({ videoRef, canvasRef, webcam }: ValidationPanel
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Client-Id': getClientId(),
         },
         body: JSON.stringify({ image: imageData }),
       })
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Identificação em lote sobre pastas de imagens e arquivos de vídeo (offline)
+
+Roda detecção e reconhecimento do FaceRecognitionSystem sem passar pela API,
+então nada é gravado nos logs de acesso. Um pool de processos carrega os
+modelos e o índice FAISS uma vez por worker; os resultados são gravados em
+CSV ou NDJSON à medida que ficam prontos.
+
+Execuções são retomáveis: cada item concluído (imagem ou trecho de vídeo) é
+anotado em <saida>.done e pulado com --resume.
+
+Exemplos:
+    python scripts/batch_identify.py fotos/ -o resultado.csv --workers 4
+    python scripts/batch_identify.py camera_x.mp4 -o camera_x.ndjson --video-fps 2
+    python scripts/batch_identify.py fotos/ -o resultado.csv --resume
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mkv", ".mov", ".webm"}
+
+FIELDS = [
+    "item",
+    "source",
+    "frame",
+    "timestamp_s",
+    "face_index",
+    "bbox",
+    "det_score",
+    "quality_score",
+    "user_id",
+    "user_name",
+    "distance",
+    "confidence",
+    "error",
+]
+
+# Sistema de reconhecimento do worker (carregado uma vez por processo)
+_face_recognition = None
+_init_error = None
+
+
+def init_worker():
+    """Carrega modelos e índice no worker; erros são repassados em process_item
+
+    (uma exceção no initializer faria o Pool recriar workers indefinidamente)
+    """
+    global _face_recognition, _init_error
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    import config  # noqa: F401  (config do backend antes de app.*)
+    import faiss
+
+    # Cada processo usa um núcleo; o paralelismo vem do pool
+    faiss.omp_set_num_threads(1)
+
+    try:
+        from app.face_recognition import face_recognition
+    except Exception as e:
+        _init_error = f"Falha ao inicializar o reconhecimento: {e}"
+        return
+
+    if face_recognition.face_app is None:
+        _init_error = "Modelos InsightFace não carregados"
+        return
+    _face_recognition = face_recognition
+
+
+def identify_image(
+    image, source: str, item: str, frame=None, timestamp=None
+) -> list:
+    """Detecta e reconhece todas as faces de uma imagem BGR"""
+    from app.image_utils import fit_image
+
+    rows = []
+    faces = _face_recognition.detect_faces(fit_image(image))
+    # Todas as faces do frame em uma única busca no índice
+    decisions = _face_recognition.recognize_faces([f["embedding"] for f in faces])
+    for face_index, (face, (user_id, distance)) in enumerate(zip(faces, decisions)):
+        rows.append(
+            {
+                "item": item,
+                "source": source,
+                "frame": frame,
+                "timestamp_s": timestamp,
+                "face_index": face_index,
+                "bbox": [int(v) for v in face["bbox"]],
+                "det_score": round(float(face["det_score"]), 4),
+                "quality_score": round(float(face["quality_score"]), 4),
+                "user_id": int(user_id) if user_id is not None else None,
+                "distance": round(float(distance), 4),
+                "confidence": round(float(1.0 - distance), 4) if user_id else None,
+            }
+        )
+    return rows
+
+
+def process_item(task: tuple) -> tuple:
+    """Processa uma imagem ou um trecho de vídeo; retorna (item, linhas, frames)"""
+    if _face_recognition is None:
+        raise RuntimeError(_init_error)
+
+    kind, item, path = task[:3]
+    try:
+        if kind == "image":
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError("Imagem ilegível")
+            return item, identify_image(image, path, item), 1
+
+        start, end, step = task[3:]
+        capture = cv2.VideoCapture(path)
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        rows, frames = [], 0
+        for frame_index in range(start, end):
+            # grab() avança sem decodificar; só os frames amostrados são decodificados
+            if not capture.grab():
+                break
+            if (frame_index - start) % step:
+                continue
+            ok, image = capture.retrieve()
+            if not ok:
+                continue
+            frames += 1
+            rows += identify_image(
+                image, path, item, frame_index, round(frame_index / fps, 3)
+            )
+        capture.release()
+        return item, rows, frames
+
+    except Exception as e:
+        return item, [{"item": item, "source": path, "error": str(e)}], 0
+
+
+def build_tasks(input_path: Path, video_fps: float, segment_seconds: float) -> list:
+    """Lista de tarefas: uma por imagem, ou trechos de vídeo de segment_seconds"""
+    if input_path.is_dir():
+        return [
+            ("image", str(p.relative_to(input_path)), str(p))
+            for p in sorted(input_path.rglob("*"))
+            if p.suffix.lower() in IMAGE_EXTENSIONS
+        ]
+
+    if input_path.suffix.lower() in IMAGE_EXTENSIONS:
+        return [("image", input_path.name, str(input_path))]
+
+    if input_path.suffix.lower() not in VIDEO_EXTENSIONS:
+        raise SystemExit(f"❌ Entrada não suportada: {input_path}")
+
+    capture = cv2.VideoCapture(str(input_path))
+    if not capture.isOpened():
+        raise SystemExit(f"❌ Não foi possível abrir o vídeo: {input_path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+
+    step = max(1, round(fps / video_fps))
+    segment = max(step, int(fps * segment_seconds))
+    return [
+        (
+            "video",
+            f"{input_path.name}#{start}",
+            str(input_path),
+            start,
+            min(start + segment, total),
+            step,
+        )
+        for start in range(0, total, segment)
+    ]
+
+
+class ResultWriter:
+    """Grava linhas em CSV ou NDJSON e marca itens concluídos em <saida>.done"""
+
+    def __init__(self, output: Path, fmt: str, resume: bool):
+        self.fmt = fmt
+        self.done_path = output.with_name(output.name + ".done")
+        mode = "a" if resume else "w"
+        write_header = not (resume and output.exists() and output.stat().st_size > 0)
+
+        self.file = open(output, mode, newline="", encoding="utf-8")
+        self.done_file = open(self.done_path, mode, encoding="utf-8")
+        if fmt == "csv":
+            self.csv = csv.DictWriter(
+                self.file, fieldnames=FIELDS, extrasaction="ignore"
+            )
+            if write_header:
+                self.csv.writeheader()
+
+    def completed_items(self) -> set:
+        if not self.done_path.exists():
+            return set()
+        return set(self.done_path.read_text(encoding="utf-8").splitlines())
+
+    def write(self, item: str, rows: list):
+        for row in rows:
+            if self.fmt == "csv":
+                self.csv.writerow({**row, "bbox": json.dumps(row.get("bbox"))})
+            else:
+                self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+        # Item só conta como concluído depois que suas linhas foram gravadas
+        self.done_file.write(item + "\n")
+        self.done_file.flush()
+
+    def close(self):
+        self.file.close()
+        self.done_file.close()
+
+
+def load_user_names() -> dict:
+    """Nomes dos usuários para enriquecer o resultado (leitura única do banco)"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import config  # noqa: F401
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal()
+    try:
+        return dict(db.query(User.id, User.name).all())
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Identificação em lote (imagens ou vídeo)"
+    )
+    parser.add_argument("input", help="Pasta de imagens, imagem ou arquivo de vídeo")
+    parser.add_argument("-o", "--output", required=True, help="Arquivo .csv ou .ndjson")
+    parser.add_argument(
+        "--format", choices=["csv", "ndjson"], help="Padrão: pela extensão da saída"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2)
+    )
+    parser.add_argument(
+        "--video-fps", type=float, default=2.0, help="Frames analisados por segundo"
+    )
+    parser.add_argument(
+        "--segment-seconds",
+        type=float,
+        default=30.0,
+        help="Duração do trecho de vídeo entregue a cada worker",
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="Pular itens já concluídos"
+    )
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    output = Path(args.output)
+    fmt = args.format or ("csv" if output.suffix.lower() == ".csv" else "ndjson")
+
+    tasks = build_tasks(input_path, args.video_fps, args.segment_seconds)
+    writer = ResultWriter(output, fmt, args.resume)
+    if args.resume:
+        completed = writer.completed_items()
+        tasks = [task for task in tasks if task[1] not in completed]
+        print(f"Retomando: {len(completed)} itens já concluídos")
+
+    if not tasks:
+        print("Nada a processar")
+        writer.close()
+        return
+
+    user_names = load_user_names()
+    print(f"Processando {len(tasks)} itens com {args.workers} workers...")
+
+    started = time.perf_counter()
+    totals = {"items": 0, "frames": 0, "faces": 0, "identified": 0, "errors": 0}
+    context = mp.get_context("spawn")
+    with context.Pool(args.workers, initializer=init_worker) as pool:
+        for item, rows, frames in pool.imap_unordered(process_item, tasks):
+            for row in rows:
+                if row.get("error"):
+                    totals["errors"] += 1
+                    continue
+                totals["faces"] += 1
+                if row["user_id"] is not None:
+                    totals["identified"] += 1
+                    row["user_name"] = user_names.get(row["user_id"])
+            writer.write(item, rows)
+
+            totals["items"] += 1
+            totals["frames"] += frames
+            if totals["items"] % 50 == 0 or totals["items"] == len(tasks):
+                elapsed = time.perf_counter() - started
+                print(
+                    f"   {totals['items']}/{len(tasks)} itens, {totals['frames']} frames "
+                    f"({totals['frames'] / elapsed:.1f} frames/s)"
+                )
+
+    writer.close()
+    elapsed = time.perf_counter() - started
+    print("\nResumo:")
+    for key, value in totals.items():
+        print(f"   {key}: {value}")
+    print(f"   elapsed_s: {elapsed:.1f}")
+    print(f"   frames_per_second: {totals['frames'] / elapsed:.2f}")
+    print(f"Resultados em {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória e latência dos tipos de índice da galeria (flat, sq8, fp16)
+
+Usa galerias sintéticas de vetores unitários aleatórios (não precisa de modelos,
+banco ou rede). Para cada tipo mede o tamanho do índice em memória, a latência
+de busca por consulta (p50/p95/p99) e a concordância com o índice flat exato
+nos dois melhores resultados, que são os usados na decisão de recognize_face.
+
+Exemplo:
+    python scripts/benchmark_gallery.py --sizes 10000 100000 --queries 500
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.gallery_index import (
+    INDEX_TYPES,
+    FullPrecisionStore,
+    create_index,
+    search_index,
+)
+from config import EMBEDDING_DIMENSION, FAISS_RERANK_FACTOR
+
+
+def random_unit_vectors(count: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Gera vetores unitários aleatórios"""
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(gallery: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Consultas próximas de identidades da galeria (similaridade ~0.7)"""
+    picks = rng.integers(0, gallery.shape[0], count)
+    noise = random_unit_vectors(count, gallery.shape[1], rng)
+    queries = 0.7 * gallery[picks] + 0.7 * noise
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def percentiles(samples_ms: list) -> dict:
+    values = np.asarray(samples_ms)
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p95_ms": round(float(np.percentile(values, 95)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+    }
+
+
+def benchmark_type(index_type, gallery, queries, k, tmp_dir, reference=None) -> dict:
+    """Mede um tipo de índice; ``reference`` são os resultados do flat"""
+    index = create_index(index_type, gallery.shape[1])
+    index.add(gallery)
+
+    store = None
+    if index_type != "flat":
+        store = FullPrecisionStore(Path(tmp_dir) / f"{index_type}.f32", gallery.shape[1])
+        store.reset(gallery)
+
+    # Aquecimento (páginas do memmap, caches)
+    search_index(index, queries[:10], k, store=store)
+
+    latencies = []
+    all_sims, all_ids = [], []
+    for query in queries:
+        started = time.perf_counter()
+        sims, ids = search_index(index, query.reshape(1, -1), k, store=store)
+        latencies.append((time.perf_counter() - started) * 1000)
+        all_sims.append(sims[0])
+        all_ids.append(ids[0])
+
+    sims = np.vstack(all_sims)
+    ids = np.vstack(all_ids)
+    result = {
+        "index_type": index_type,
+        "index_bytes": len(faiss.serialize_index(index)),
+        "bytes_per_identity": round(len(faiss.serialize_index(index)) / gallery.shape[0], 1),
+        "disk_vectors_bytes": gallery.nbytes if store is not None else 0,
+        "searches_per_second": round(1000 / np.mean(latencies), 1),
+        **percentiles(latencies),
+    }
+
+    if reference is not None:
+        ref_sims, ref_ids = reference
+        result["top1_agreement"] = float(np.mean(ids[:, 0] == ref_ids[:, 0]))
+        result["max_top2_similarity_error"] = float(
+            np.max(np.abs(sims[:, :2] - ref_sims[:, :2]))
+        )
+
+    return result, (sims, ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    report = {
+        "dimension": EMBEDDING_DIMENSION,
+        "k": args.k,
+        "rerank_factor": FAISS_RERANK_FACTOR,
+        "faiss_threads": faiss.omp_get_max_threads(),
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            gallery = random_unit_vectors(size, EMBEDDING_DIMENSION, rng)
+            queries = make_queries(gallery, args.queries, rng)
+
+            reference = None
+            for index_type in INDEX_TYPES:
+                result, outcome = benchmark_type(
+                    index_type, gallery, queries, args.k, tmp_dir, reference
+                )
+                if index_type == "flat":
+                    reference = outcome
+                result["gallery_size"] = size
+                report["results"].append(result)
+
+                print(
+                    f"{size:>8} {index_type:>5}: {result['bytes_per_identity']:>7} B/id, "
+                    f"p50={result['p50_ms']:.3f}ms p95={result['p95_ms']:.3f}ms "
+                    f"top1={result.get('top1_agreement', 1.0):.4f}"
+                )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados salvos em {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
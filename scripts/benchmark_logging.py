@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Custo por frame do logging no caminho quente: print() antigo vs logger
+
+Reproduz as mensagens emitidas por frame em detect_faces e
+AdvancedLivenessDetector.add_frame e mede o tempo gasto só com logging em
+três cenários, escrevendo num pipe drenado por outro thread (como o stdout de
+um container lido pelo driver de logs do Docker):
+
+    print        f-strings com print() síncrono (comportamento anterior)
+    logger_info  logger em INFO (padrão): mensagens DEBUG descartadas sem formatar
+    logger_debug logger em DEBUG: formatação + QueueHandler, escrita em outro thread
+
+Exemplo:
+    python scripts/benchmark_logging.py --frames 20000 --unbuffered
+    python scripts/benchmark_logging.py --frames 2000 --pace-ms 5
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.logging_setup import setup_logging, stop_logging
+
+IMAGE_SHAPE = (450, 800, 3)
+
+
+def pipe_sink(line_buffered: bool):
+    """Arquivo de texto sobre um pipe drenado por um thread leitor"""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        while os.read(read_fd, 65536):
+            pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, "w", buffering=1 if line_buffered else -1, encoding="utf-8")
+
+
+def print_frame(i: int):
+    """Mensagens por frame como eram antes (print incondicional)"""
+    print(f"DEBUG DETECT: Processando imagem - Shape: {IMAGE_SHAPE}")
+    print(f"DEBUG DETECT: Faces detectadas: {1}")
+    print(f"DEBUG DETECT: Faces válidas finais: {1}")
+    print(f"DEBUG LIVENESS: Adicionando frame - Histórico atual: {i % 10}")
+    print(f"DEBUG LIVENESS: Textura score: {123.456 + i:.2f}")
+    print(f"DEBUG LIVENESS: Frames insuficientes ({i % 3} < {3})")
+
+
+def logger_frame(logger: logging.Logger, i: int):
+    """Mesmas mensagens com o logger (formatação adiada)"""
+    logger.debug("Processando imagem - Shape: %s", IMAGE_SHAPE)
+    logger.debug("Faces detectadas: %s", 1)
+    logger.debug("Faces válidas finais: %s", 1)
+    logger.debug("Adicionando frame - Histórico atual: %s", i % 10)
+    logger.debug("Textura score: %.2f", 123.456 + i)
+    logger.debug("Frames insuficientes (%s < %s)", i % 3, 3)
+
+
+def measure(frame_func, frames: int, pace_ms: float = 0.0) -> dict:
+    samples = []
+    for i in range(frames):
+        started = time.perf_counter_ns()
+        frame_func(i)
+        samples.append(time.perf_counter_ns() - started)
+        if pace_ms:
+            time.sleep(pace_ms / 1000)
+    samples.sort()
+    return {
+        "mean_us": round(sum(samples) / len(samples) / 1000, 3),
+        "p50_us": round(samples[len(samples) // 2] / 1000, 3),
+        "p99_us": round(samples[int(len(samples) * 0.99)] / 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo por frame do logging no caminho quente")
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument(
+        "--unbuffered",
+        action="store_true",
+        help="stdout com buffer de linha (equivalente a python -u / PYTHONUNBUFFERED)",
+    )
+    parser.add_argument(
+        "--pace-ms",
+        type=float,
+        default=0.0,
+        help="Pausa entre frames (ms); sem pausa o thread de escrita disputa o GIL",
+    )
+    parser.add_argument("--output", help="Salvar resultado JSON neste arquivo")
+    args = parser.parse_args()
+
+    sink = pipe_sink(args.unbuffered)
+    results = {}
+
+    with contextlib.redirect_stdout(sink):
+        results["print"] = measure(print_frame, args.frames, args.pace_ms)
+        sink.flush()
+
+    logger = logging.getLogger("app.benchmark")
+    app_logger = setup_logging(level="INFO", stream=sink)
+    results["logger_info"] = measure(lambda i: logger_frame(logger, i), args.frames, args.pace_ms)
+
+    app_logger.setLevel(logging.DEBUG)
+    results["logger_debug"] = measure(lambda i: logger_frame(logger, i), args.frames, args.pace_ms)
+    stop_logging()
+    dropped = app_logger.handlers[0].dropped
+
+    base = results["print"]["mean_us"]
+    for name, stats in results.items():
+        speedup = base / stats["mean_us"] if stats["mean_us"] else float("inf")
+        print(
+            f"{name:<13} média={stats['mean_us']:>9.3f}µs p50={stats['p50_us']:>9.3f}µs "
+            f"p99={stats['p99_us']:>9.3f}µs  ({speedup:.1f}x vs print)"
+        )
+    if dropped:
+        print(f"⚠️  {dropped} registros descartados com a fila cheia (logger_debug)")
+
+    if args.output:
+        report = {
+            "frames": args.frames,
+            "unbuffered": args.unbuffered,
+            "pace_ms": args.pace_ms,
+            "messages_per_frame": 6,
+            "dropped_records": dropped,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
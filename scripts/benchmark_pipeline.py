@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline do pipeline de reconhecimento, etapa por etapa
+
+Roda em máquina só com CPU e sem rede: usa imagens sintéticas, galerias de
+vetores unitários aleatórios e um banco SQLite temporário. Mede cada etapa
+separadamente e gera JSON com p50/p95/p99 e vazão, que pode ser salvo como
+baseline e comparado em execuções futuras.
+
+Etapas: decode, quality, search, encrypt, decrypt, decrypt_bulk, log_insert e,
+com --with-models (modelos buffalo_l já presentes em ~/.insightface), detect
+e embed.
+
+Exemplos:
+    python scripts/benchmark_pipeline.py --output bench.json
+    python scripts/benchmark_pipeline.py --baseline bench.json --fail-on-regression
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from config import EMBEDDING_DIMENSION, FAISS_INDEX_TYPE
+from app.encryption import encryption_manager
+from app.face_quality import is_face_quality_good, calculate_face_quality
+from app.gallery_index import FullPrecisionStore, create_index, search_index
+from app.image_utils import decode_base64_payload, bytes_to_bgr
+
+
+def summarize(samples_ms: list) -> dict:
+    """Resume amostras de latência (ms) em percentis e vazão"""
+    values = np.asarray(samples_ms, dtype=np.float64)
+    mean = float(values.mean())
+    return {
+        "iterations": int(values.size),
+        "mean_ms": round(mean, 4),
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p95_ms": round(float(np.percentile(values, 95)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "throughput_per_s": round(1000.0 / mean, 1) if mean > 0 else None,
+    }
+
+
+def time_stage(func, iterations: int, warmup: int = 3) -> dict:
+    """Executa ``func(i)`` repetidamente medindo cada chamada"""
+    for i in range(warmup):
+        func(i)
+
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def synthetic_frame(rng: np.random.Generator, width: int = 1280, height: int = 720) -> str:
+    """Gera frame JPEG sintético em data URL base64 (como o frontend envia)"""
+    image = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (9, 9), 0)
+    center = (width // 2, height // 2)
+    cv2.ellipse(image, center, (120, 160), 0, 0, 360, (150, 170, 200), -1)
+    cv2.circle(image, (center[0] - 45, center[1] - 40), 12, (30, 30, 30), -1)
+    cv2.circle(image, (center[0] + 45, center[1] - 40), 12, (30, 30, 30), -1)
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.tobytes()).decode()
+
+
+def random_unit_vectors(count: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((count, EMBEDDING_DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def bench_models(results: dict, image: np.ndarray, iterations: int):
+    """Etapas detect e embed com os modelos InsightFace locais"""
+    from insightface.app import FaceAnalysis
+    from insightface.app.common import Face
+
+    face_app = FaceAnalysis(
+        name="buffalo_l",
+        allowed_modules=["detection", "recognition"],
+        providers=["CPUExecutionProvider"],
+    )
+    face_app.prepare(ctx_id=-1, det_size=(640, 640))
+
+    results["detect"] = time_stage(
+        lambda i: face_app.det_model.detect(image, max_num=0, metric="default"),
+        iterations,
+    )
+
+    # Landmarks sintéticos (5 pontos) no centro do frame para o alinhamento
+    h, w = image.shape[:2]
+    kps = np.array(
+        [[-38, -40], [38, -40], [0, 0], [-30, 45], [30, 45]], dtype=np.float32
+    ) + np.array([w / 2, h / 2], dtype=np.float32)
+    face = Face(bbox=np.array([w / 2 - 100, h / 2 - 130, w / 2 + 100, h / 2 + 130]), kps=kps, det_score=0.9)
+    rec_model = face_app.models["recognition"]
+    results["embed"] = time_stage(lambda i: rec_model.get(image, face), iterations)
+
+
+def run_benchmark(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    results = {}
+
+    # decode: base64 -> bytes -> imagem BGR redimensionada (mesmo código da API)
+    frame = synthetic_frame(rng)
+    results["decode"] = time_stage(
+        lambda i: bytes_to_bgr(decode_base64_payload(frame)), args.iterations
+    )
+    image = bytes_to_bgr(decode_base64_payload(frame))
+
+    # quality: filtro e score de qualidade de uma face detectada
+    h, w = image.shape[:2]
+    bbox = np.array([w / 2 - 100, h / 2 - 130, w / 2 + 100, h / 2 + 130])
+    results["quality"] = time_stage(
+        lambda i: is_face_quality_good(bbox, image) and calculate_face_quality(bbox, image),
+        args.iterations,
+    )
+
+    if args.with_models:
+        try:
+            bench_models(results, image, args.iterations)
+        except Exception as e:
+            print(f"⚠️  Etapas detect/embed ignoradas: {e}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # search: galeria sintética com o tipo de índice configurado
+        gallery = random_unit_vectors(args.gallery_size, rng)
+        index = create_index(args.index_type)
+        index.add(gallery)
+        store = None
+        if args.index_type != "flat":
+            store = FullPrecisionStore(Path(tmp_dir) / "gallery.f32")
+            store.reset(gallery)
+        queries = random_unit_vectors(args.iterations + 3, rng)
+        results["search"] = time_stage(
+            lambda i: search_index(index, queries[i], 5, store=store), args.iterations
+        )
+
+        # encrypt/decrypt de embeddings
+        embeddings = random_unit_vectors(args.iterations + 3, rng)
+        encrypted = [encryption_manager.encrypt_embedding(e) for e in embeddings]
+        results["encrypt"] = time_stage(
+            lambda i: encryption_manager.encrypt_embedding(embeddings[i]), args.iterations
+        )
+        results["decrypt"] = time_stage(
+            lambda i: encryption_manager.decrypt_embedding(encrypted[i]), args.iterations
+        )
+        bulk = [encryption_manager.encrypt_embedding(e) for e in random_unit_vectors(1000, rng)]
+        results["decrypt_bulk"] = time_stage(
+            lambda i: encryption_manager.decrypt_embeddings(bulk), max(args.iterations // 20, 5)
+        )
+        results["decrypt_bulk"]["rows_per_call"] = len(bulk)
+
+        # log_insert: um AccessLog por commit, como em /api/validate
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.models import Base, AccessLog
+
+        engine = create_engine(f"sqlite:///{tmp_dir}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        def insert_log(i):
+            db.add(
+                AccessLog(
+                    user_id=i,
+                    confidence=0.8,
+                    access_granted=True,
+                    liveness_passed=True,
+                    ip_address="127.0.0.1",
+                    user_agent="benchmark",
+                )
+            )
+            db.commit()
+
+        results["log_insert"] = time_stage(insert_log, args.iterations)
+        db.close()
+        engine.dispose()
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+        },
+        "parameters": {
+            "iterations": args.iterations,
+            "gallery_size": args.gallery_size,
+            "index_type": args.index_type,
+            "seed": args.seed,
+        },
+        "stages": results,
+    }
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) -> list:
+    """Compara p50/p95 com o baseline; retorna etapas que pioraram além da tolerância"""
+    regressions = []
+    print(f"\n{'etapa':<14}{'p50 base':>10}{'p50 atual':>11}{'Δ%':>8}{'p95 base':>10}{'p95 atual':>11}{'Δ%':>8}")
+    for stage, current in report["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            continue
+        line = f"{stage:<14}"
+        for key in ("p50_ms", "p95_ms"):
+            change = (current[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+            line += f"{base[key]:>10.3f}{current[key]:>11.3f}{change:>+8.1f}"
+            if change > tolerance * 100:
+                regressions.append({"stage": stage, "metric": key, "change_pct": round(change, 1)})
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de reconhecimento")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--gallery-size", type=int, default=10000)
+    parser.add_argument("--index-type", default=FAISS_INDEX_TYPE, choices=["flat", "sq8", "fp16"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--with-models", action="store_true", help="Incluir detect/embed (modelos locais)")
+    parser.add_argument("--output", help="Salvar resultado JSON neste arquivo")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Piora relativa tolerada (0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+
+    for stage, stats in report["stages"].items():
+        print(
+            f"{stage:<14} p50={stats['p50_ms']:>9.3f}ms p95={stats['p95_ms']:>9.3f}ms "
+            f"p99={stats['p99_ms']:>9.3f}ms {stats['throughput_per_s']:>10}/s"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultados salvos em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        report["regressions"] = regressions
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} regressões acima de {args.tolerance:.0%}")
+            if args.fail_on_regression:
+                sys.exit(1)
+        else:
+            print("\n✅ Nenhuma regressão acima da tolerância")
+
+
+if __name__ == "__main__":
+    main()
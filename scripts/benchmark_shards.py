@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark da galeria particionada (app/sharding.py) contra o índice único
+
+Usa galerias sintéticas de vetores unitários aleatórios e shards em processos
+locais (não precisa de modelos, banco, rede ou nós remotos). Para cada número
+de shards mede a latência de um lote de consultas (p50/p95), a vazão e a
+concordância do top-k mesclado com o IndexFlatIP único, que deve ser total.
+
+Exemplo:
+    python scripts/benchmark_shards.py --size 200000 --shards 1 2 4 --batch 32
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from app.sharding import ShardedGallery
+from config import EMBEDDING_DIMENSION
+
+
+def random_unit_vectors(count: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Gera vetores unitários aleatórios"""
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def time_batches(search, queries: np.ndarray, batch: int) -> list:
+    """Latência (ms) de cada lote de consultas"""
+    latencies = []
+    for start in range(0, len(queries), batch):
+        began = time.perf_counter()
+        search(queries[start : start + batch])
+        latencies.append((time.perf_counter() - began) * 1000)
+    return latencies
+
+
+def summarize(latencies: list, queries: int) -> dict:
+    total = sum(latencies) / 1000
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "queries_per_second": round(queries / total, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da galeria particionada")
+    parser.add_argument("--size", type=int, default=100000, help="Vetores na galeria")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--batch", type=int, default=1, help="Consultas por busca")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", help="Salvar resultados em JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    gallery = random_unit_vectors(args.size, EMBEDDING_DIMENSION, rng)
+    queries = random_unit_vectors(args.queries, EMBEDDING_DIMENSION, rng)
+    faiss_ids = np.arange(args.size, dtype=np.int64)
+    # IDs de usuário distintos das posições, como na galeria real
+    user_ids = faiss_ids + 1000
+
+    single = faiss.IndexFlatIP(EMBEDDING_DIMENSION)
+    single.add(gallery)
+    _, expected = single.search(queries, args.k)
+
+    print(f"Galeria: {args.size} vetores, {args.queries} consultas (lote {args.batch})")
+    results = {
+        "single": summarize(
+            time_batches(lambda q: single.search(q, args.k), queries, args.batch),
+            args.queries,
+        )
+    }
+    print(f"   índice único: {results['single']}")
+
+    for num_shards in args.shards:
+        gallery_shards = ShardedGallery.local(num_shards)
+        try:
+            gallery_shards.load(faiss_ids, user_ids, gallery)
+            _, merged = gallery_shards.search(queries, args.k)
+            agreement = float(np.mean(np.sort(merged, 1) == np.sort(expected, 1)))
+
+            summary = summarize(
+                time_batches(
+                    lambda q: gallery_shards.search(q, args.k), queries, args.batch
+                ),
+                args.queries,
+            )
+            summary["shard_sizes"] = gallery_shards.sizes()
+            summary["topk_agreement"] = round(agreement, 4)
+            results[f"shards_{num_shards}"] = summary
+            print(f"   {num_shards} shards: {summary}")
+        finally:
+            gallery_shards.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
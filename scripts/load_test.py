@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Teste de carga HTTP para /api/validate com percentis de latência ao longo do tempo
+
+Reproduz uma pasta de frames JPEG contra /api/validate, em um servidor local
+(--url) ou na aplicação ASGI dentro do próprio processo (--in-process), e
+reporta vazão, taxa de erro, p50/p95/p99 por intervalo e CPU/RSS do processo
+servidor. O resultado final inclui a capacidade estimada por núcleo de CPU.
+
+Modos:
+    closed  N clientes concorrentes, cada um envia o próximo frame assim que
+            recebe a resposta (mede a capacidade máxima)
+    open    chegadas em taxa fixa (--rate), independentemente das respostas;
+            a latência é medida a partir do horário agendado, evitando
+            omissão coordenada (mede o comportamento sob uma carga dada)
+
+Exemplos:
+    python scripts/load_test.py --frames ./frames --url http://localhost:8000 \\
+        --mode closed --concurrency 8 --duration 60 --server-pid 1234
+    python scripts/load_test.py --synthetic 20 --in-process --mode open --rate 5
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import httpx
+except ImportError:
+    print("❌ httpx é necessário: pip install httpx")
+    sys.exit(1)
+
+try:
+    import psutil
+
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+    psutil = None
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+
+
+def load_frames(args) -> list:
+    """Carrega frames JPEG como payloads data URL (formato enviado pelo frontend)"""
+    payloads = []
+    if args.frames:
+        paths = sorted(
+            p
+            for p in Path(args.frames).iterdir()
+            if p.suffix.lower() in (".jpg", ".jpeg")
+        )
+        for path in paths:
+            encoded = base64.b64encode(path.read_bytes()).decode()
+            payloads.append(f"data:image/jpeg;base64,{encoded}")
+    elif args.synthetic:
+        sys.path.insert(0, str(Path(__file__).parent))
+        from benchmark_pipeline import synthetic_frame
+
+        rng = np.random.default_rng(42)
+        payloads = [synthetic_frame(rng) for _ in range(args.synthetic)]
+
+    if not payloads:
+        print("❌ Nenhum frame encontrado (use --frames DIR ou --synthetic N)")
+        sys.exit(1)
+    return payloads
+
+
+def latency_summary(latencies_ms: list) -> dict:
+    if not latencies_ms:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    values = np.asarray(latencies_ms)
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+    }
+
+
+class LoadTestRecorder:
+    """Acumula resultados por intervalo e no total"""
+
+    def __init__(self, process=None):
+        self.process = process
+        self.started = time.perf_counter()
+        self.intervals = []
+        self.all_latencies = []
+        self.total_requests = 0
+        self.total_errors = 0
+        self.status_counts = {}
+        self._reset_interval()
+        if self.process is not None:
+            self.process.cpu_percent(None)
+
+    def _reset_interval(self):
+        self.interval_started = time.perf_counter()
+        self.interval_latencies = []
+        self.interval_errors = 0
+
+    def record(self, latency_ms: float, status):
+        self.total_requests += 1
+        self.status_counts[str(status)] = self.status_counts.get(str(status), 0) + 1
+        if status != 200:
+            self.total_errors += 1
+            self.interval_errors += 1
+        self.interval_latencies.append(latency_ms)
+        self.all_latencies.append(latency_ms)
+
+    def flush_interval(self):
+        elapsed = time.perf_counter() - self.interval_started
+        count = len(self.interval_latencies)
+        entry = {
+            "t_s": round(time.perf_counter() - self.started, 1),
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+            "error_rate": round(self.interval_errors / count, 4) if count else 0.0,
+            **latency_summary(self.interval_latencies),
+        }
+        if self.process is not None:
+            entry["cpu_percent"] = self.process.cpu_percent(None)
+            entry["rss_mb"] = round(self.process.memory_info().rss / 1024**2, 1)
+        self.intervals.append(entry)
+        self._reset_interval()
+
+        print(
+            f"[{entry['t_s']:>6}s] {entry['throughput_rps']:>7.2f} req/s "
+            f"erros={entry['error_rate']:.2%} p50={entry['p50_ms']} p95={entry['p95_ms']} "
+            f"p99={entry['p99_ms']}"
+            + (
+                f" cpu={entry['cpu_percent']:.0f}% rss={entry['rss_mb']}MB"
+                if "cpu_percent" in entry
+                else ""
+            )
+        )
+
+
+async def send_frame(client, payload, headers, recorder, scheduled_at=None):
+    """Envia um frame e registra latência (a partir do agendamento, se houver)"""
+    started = scheduled_at if scheduled_at is not None else time.perf_counter()
+    try:
+        response = await client.post("/api/validate", json={"image": payload}, headers=headers)
+        status = response.status_code
+    except Exception as e:
+        status = type(e).__name__
+    recorder.record((time.perf_counter() - started) * 1000, status)
+
+
+async def run_closed_loop(client, frames, args, recorder, deadline):
+    async def worker(worker_id):
+        headers = {"X-Client-Id": f"load-test-{worker_id}"}
+        i = worker_id
+        while time.perf_counter() < deadline:
+            await send_frame(client, frames[i % len(frames)], headers, recorder)
+            i += args.concurrency
+
+    await asyncio.gather(*(worker(w) for w in range(args.concurrency)))
+
+
+async def run_open_loop(client, frames, args, recorder, deadline):
+    interval = 1.0 / args.rate
+    next_at = time.perf_counter()
+    tasks = set()
+    i = 0
+    while next_at < deadline:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if len(tasks) >= args.max_inflight:
+            # Limite local de requisições em voo: conta como erro do cliente
+            recorder.record((time.perf_counter() - next_at) * 1000, "client_overflow")
+        else:
+            headers = {"X-Client-Id": f"load-test-{i % args.clients}"}
+            task = asyncio.create_task(
+                send_frame(client, frames[i % len(frames)], headers, recorder, next_at)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        i += 1
+        next_at += interval
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def report_intervals(recorder, interval, stop_event):
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            recorder.flush_interval()
+
+
+def make_client(args):
+    if args.in_process:
+        sys.path.insert(0, str(BACKEND_DIR))
+        os.chdir(BACKEND_DIR)
+        import config  # noqa: F401  (config do backend antes de app.*)
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        return httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=args.timeout)
+
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_inflight))
+    return httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits)
+
+
+async def main_async(args):
+    frames = load_frames(args)
+
+    process = None
+    if PSUTIL_AVAILABLE:
+        pid = os.getpid() if args.in_process else args.server_pid
+        if pid:
+            process = psutil.Process(pid)
+    elif args.server_pid or args.in_process:
+        print("⚠️  psutil não instalado: CPU/RSS do servidor não serão medidos")
+
+    async with make_client(args) as client:
+        recorder = LoadTestRecorder(process)
+        stop_event = asyncio.Event()
+        reporter = asyncio.create_task(report_intervals(recorder, args.interval, stop_event))
+
+        deadline = time.perf_counter() + args.duration
+        if args.mode == "closed":
+            await run_closed_loop(client, frames, args, recorder, deadline)
+        else:
+            await run_open_loop(client, frames, args, recorder, deadline)
+
+        stop_event.set()
+        await reporter
+        if recorder.interval_latencies:
+            recorder.flush_interval()
+
+    elapsed = time.perf_counter() - recorder.started
+    throughput = recorder.total_requests / elapsed if elapsed > 0 else 0.0
+    summary = {
+        "mode": args.mode,
+        "target": "in-process" if args.in_process else args.url,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "rate": args.rate if args.mode == "open" else None,
+        "duration_s": round(elapsed, 1),
+        "frames": len(frames),
+        "requests": recorder.total_requests,
+        "throughput_rps": round(throughput, 2),
+        "error_rate": round(recorder.total_errors / recorder.total_requests, 4)
+        if recorder.total_requests
+        else 0.0,
+        "status_counts": recorder.status_counts,
+        **latency_summary(recorder.all_latencies),
+        "intervals": recorder.intervals,
+    }
+
+    cpu_samples = [i["cpu_percent"] for i in recorder.intervals if i.get("cpu_percent")]
+    if cpu_samples:
+        cores_used = float(np.mean(cpu_samples)) / 100.0
+        ok_throughput = throughput * (1 - summary["error_rate"])
+        summary["avg_cores_used"] = round(cores_used, 2)
+        summary["max_rss_mb"] = max(i["rss_mb"] for i in recorder.intervals)
+        summary["throughput_per_core_rps"] = (
+            round(ok_throughput / cores_used, 2) if cores_used > 0 else None
+        )
+
+    print("\nResumo:")
+    for key, value in summary.items():
+        if key != "intervals":
+            print(f"   {key}: {value}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Resultados salvos em {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga para /api/validate")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--frames", help="Pasta com frames JPEG")
+    source.add_argument("--synthetic", type=int, help="Gerar N frames sintéticos")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:8000", help="URL do backend")
+    target.add_argument("--in-process", action="store_true", help="Usar app ASGI no processo")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=4, help="Clientes (modo closed)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requisições/s (modo open)")
+    parser.add_argument("--clients", type=int, default=4, help="IDs de cliente distintos (modo open)")
+    parser.add_argument("--max-inflight", type=int, default=256, help="Limite de requisições em voo (modo open)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Duração em segundos")
+    parser.add_argument("--interval", type=float, default=5.0, help="Intervalo dos relatórios (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por requisição (s)")
+    parser.add_argument("--server-pid", type=int, help="PID do servidor para medir CPU/RSS")
+    parser.add_argument("--output", help="Salvar resumo JSON neste arquivo")
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()